@@ -0,0 +1,120 @@
+import time
+from threading import Lock
+from dataclasses import dataclass, replace
+from typing import Any, Mapping, Optional
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 按 GraphQL 响应头 x-rate-limit-* 控制时间线的请求速度
+# - 每个 endpoint（Likes、UserMedia）在一个窗口内有固定的请求额度，窗口在 reset（Unix 时间戳）时重置
+# - 剩余的额度平均分配到窗口的剩余时间内：两次请求的间隔是 (reset - now) / remaining
+# - 额度用完或收到 429 时等到 reset 之后再继续，不当作失败
+# - 响应没有这些头时不限速，只保留调用方自己的翻页间隔
+# - 同一个账号的所有时间线共用一个 pacer，额度是按账号计算的
+
+# 重置时间之后多等的秒数，避免本地时钟与服务端有偏差
+RESET_MARGIN = 1.0
+# 429 响应没有 reset 时等待的秒数
+DEFAULT_WAIT = 60.0
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    remaining: int
+    # 窗口重置的 Unix 时间戳（秒）
+    reset: float
+
+    @staticmethod
+    def from_headers(headers: Optional[Mapping[str, Any]]) -> Optional["RateLimit"]:
+        """从响应头读取额度，头不完整时返回 None"""
+        if not headers:
+            return None
+        values = {str(key).lower(): value for key, value in dict(headers).items()}
+        try:
+            return RateLimit(
+                limit=int(values["x-rate-limit-limit"]),
+                remaining=int(values["x-rate-limit-remaining"]),
+                reset=float(values["x-rate-limit-reset"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class RateLimitExceeded(Exception):
+    """收到 429，reset 是可以继续请求的 Unix 时间戳"""
+
+    def __init__(self, endpoint: str, reset: float):
+        super().__init__(f"{endpoint} 达到速率限制，{time.strftime('%H:%M:%S', time.localtime(reset))} 重置")
+        self.endpoint = endpoint
+        self.reset = reset
+
+    @property
+    def wait(self) -> float:
+        return max(0.0, self.reset - time.time())
+
+
+class RateLimitPacer:
+    def __init__(self):
+        self._lock = Lock()
+        self._limits: dict[str, RateLimit] = {}
+        # 每个 endpoint 下一次请求最早可以发出的时间
+        self._next_at: dict[str, float] = {}
+
+    def acquire(self, endpoint: str) -> float:
+        """等到可以发出下一次请求，返回等待的秒数"""
+        with self._lock:
+            now = time.time()
+            limit = self._limits.get(endpoint)
+            interval = 0.0
+            earliest = now
+            if limit is not None and now < limit.reset:
+                if limit.remaining <= 0:
+                    earliest = limit.reset + RESET_MARGIN
+                else:
+                    interval = (limit.reset - now) / limit.remaining
+                    # 先在本地扣减额度，并发请求的响应回来之前不会超出
+                    self._limits[endpoint] = replace(limit, remaining=limit.remaining - 1)
+            slot = max(earliest, self._next_at.get(endpoint, 0.0))
+            self._next_at[endpoint] = slot + interval
+
+        delay = slot - now
+        if delay > 0:
+            if delay >= 10:
+                logger.info("%s 请求额度已用完，等待 %.0f 秒后继续", endpoint, delay)
+            time.sleep(delay)
+        return max(0.0, delay)
+
+    def update(self, endpoint: str, limit: Optional[RateLimit]) -> None:
+        """用响应头中的额度覆盖本地的估计"""
+        if limit is None:
+            return
+        with self._lock:
+            current = self._limits.get(endpoint)
+            # 并发的响应可能乱序返回，同一个窗口内只接受更小的剩余额度
+            if current is not None and current.reset == limit.reset and current.remaining < limit.remaining:
+                return
+            self._limits[endpoint] = limit
+
+    def exceeded(self, endpoint: str, limit: Optional[RateLimit]) -> RateLimitExceeded:
+        """记录收到 429，之后的 acquire 会等到重置，返回应该抛出的异常"""
+        now = time.time()
+        reset = limit.reset if limit is not None and limit.reset > now else now + DEFAULT_WAIT
+        with self._lock:
+            self._limits[endpoint] = RateLimit(limit=limit.limit if limit else 0, remaining=0, reset=reset)
+        return RateLimitExceeded(endpoint, reset + RESET_MARGIN)
+
+    def get(self, endpoint: str) -> Optional[RateLimit]:
+        with self._lock:
+            return self._limits.get(endpoint)
+
+
+__all__ = [
+    "RESET_MARGIN",
+    "DEFAULT_WAIT",
+    "RateLimit",
+    "RateLimitExceeded",
+    "RateLimitPacer",
+]
@@ -0,0 +1,194 @@
+import json
+from typing import Any, Callable, Optional, Tuple
+
+from app.infra.logger import getLogger
+from app.twitter.models import MediaInfo, MediaTypes
+from app.twitter.variants import VideoVariant
+
+try:
+    # orjson 是可选依赖，安装后解析速度更快
+    import orjson
+
+    _loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+logger = getLogger(__name__)
+
+# 时间线响应的快速解析
+# - 直接解析 GraphQL 的原始 JSON，不构造 twitter-openapi 的模型
+# - 只读取下载需要的字段，结果与 extract_media 保持一致
+
+
+def _path(*keys: str) -> Callable[[Any], Any]:
+    """预先构造的取值函数，路径中任意一段不存在时返回 None"""
+
+    def getter(obj: Any) -> Any:
+        for key in keys:
+            if not isinstance(obj, dict):
+                return None
+            obj = obj.get(key)
+        return obj
+
+    return getter
+
+
+_get_user_result = _path("data", "user", "result")
+_get_item_content = _path("content", "itemContent")
+_get_module_item_content = _path("item", "itemContent")
+_get_tweet_result = _path("tweet_results", "result")
+_get_tweet_user = _path("core", "user_results", "result")
+_get_extended_media = _path("legacy", "extended_entities", "media")
+_get_entities_media = _path("legacy", "entities", "media")
+_get_video_variants = _path("video_info", "variants")
+_get_video_duration = _path("video_info", "duration_millis")
+
+
+def _timeline_instructions(payload: dict) -> list[dict]:
+    user = _get_user_result(payload)
+    timeline = None
+    if user is not None:
+        timeline = _path("timeline_v2", "timeline")(user) or _path("timeline", "timeline")(user)
+    if timeline is None:
+        errors = payload.get("errors") if isinstance(payload, dict) else None
+        raise ValueError(f"时间线响应中没有数据: {errors}")
+    return timeline.get("instructions") or []
+
+
+def _instruction_entries(instructions: list[dict]) -> list[dict]:
+    # 与 twitter-openapi 的 instruction_to_entry 一致，只处理新增与替换
+    entries = []
+    for instruction in instructions:
+        kind = instruction.get("type")
+        if kind == "TimelineAddEntries":
+            entries.extend(instruction.get("entries") or [])
+        elif kind == "TimelineReplaceEntry" and instruction.get("entry"):
+            entries.append(instruction["entry"])
+    return entries
+
+
+def _tweet_from_item(item_content: Optional[dict]) -> Optional[dict]:
+    if not item_content or item_content.get("__typename") != "TimelineTweet":
+        return None
+
+    result = _get_tweet_result(item_content)
+    if result is None:
+        return None
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet")
+    elif result.get("__typename") == "TweetTombstone":
+        return None
+
+    # 与 build_tweet_api_utils 一致，作者不可用的推文会被丢弃
+    user = _get_tweet_user(result) if result else None
+    if user is None or user.get("__typename") != "User":
+        return None
+    return result
+
+
+def _entry_tweets(entry: dict) -> list[dict]:
+    content = entry.get("content") or {}
+    kind = content.get("__typename") or content.get("entryType")
+
+    if kind == "TimelineTimelineItem":
+        tweet = _tweet_from_item(_get_item_content(entry))
+        return [tweet] if tweet is not None else []
+
+    if kind == "TimelineTimelineModule":
+        tweets = [tweet for tweet in map(_tweet_from_item, map(_get_module_item_content, content.get("items") or []))
+                  if tweet is not None]
+        # 网格展示时每一项都是独立的推文，否则后面的都是回复
+        if content.get("displayType") == "VerticalGrid":
+            return tweets
+        return tweets[:1]
+
+    return []
+
+
+def _entry_bottom_cursor(entry: dict) -> Optional[str]:
+    content = entry.get("content") or {}
+    if content.get("__typename") == "TimelineTimelineItem" or content.get("entryType") == "TimelineTimelineItem":
+        content = content.get("itemContent") or {}
+    if content.get("cursorType") == "Bottom":
+        return content.get("value")
+    return None
+
+
+def extract_media_raw(tweet: dict) -> list[MediaInfo]:
+    """extract_media 的原始 JSON 版本"""
+    result = []
+    medias = _get_extended_media(tweet) or _get_entities_media(tweet) or []
+    for m in medias:
+        mtype = m.get("type")
+        media_key = m.get("media_key") or m.get("id_str") or str(m.get("id"))
+
+        if mtype not in ["image", "video", "photo"]:
+            continue
+
+        url = None
+        bitrate = None
+        mimetype = None
+        duration = None
+        variants = []
+        width = None
+        height = None
+
+        if mtype == "photo":
+            url = m.get("media_url_https") or m.get("media_url")
+            if not url:
+                logger.debug("Skip media: missing image URL | key=%s type=%s", media_key, mtype)
+                continue
+
+            # 确保是高清图
+            url = url + "?name=orig"
+            original_info = m.get("original_info") or {}
+            width = original_info.get("width")
+            height = original_info.get("height")
+
+        elif mtype in {"video", "animated_gif"}:
+            mp4s = [v for v in _get_video_variants(m) or [] if v.get("content_type") == "video/mp4"]
+            best = max(mp4s, key=lambda v: v.get("bitrate") or -1, default=None)
+
+            if not best:
+                logger.debug("Skip media: no usable mp4 variant | key=%s type=%s", media_key, mtype)
+                continue
+
+            url = best.get("url")
+            mimetype = best.get("content_type")
+            bitrate = best.get("bitrate") or None
+            duration = _get_video_duration(m)
+            variants = [VideoVariant(url=v.get("url"), bitrate=v.get("bitrate") or None) for v in mp4s]
+
+        result.append(MediaInfo(
+            id=media_key,
+            url=url,
+            original_type=mtype,
+            type=MediaTypes.from_string(mtype),
+            bitrate=bitrate or None,
+            mimetype=mimetype or None,
+            duration=duration or None,
+            variants=variants,
+            width=width or None,
+            height=height or None,
+        ))
+
+    return result
+
+
+def parse_timeline_medias(raw: bytes) -> Tuple[list[MediaInfo], Optional[str]]:
+    """解析 Likes / UserMedia 时间线的原始响应，返回媒体列表与下一页的游标"""
+    entries = _instruction_entries(_timeline_instructions(_loads(raw)))
+
+    next_cursor = None
+    result: list[MediaInfo] = []
+    for entry in entries:
+        for tweet in _entry_tweets(entry):
+            result.extend(extract_media_raw(tweet))
+        cursor = _entry_bottom_cursor(entry)
+        if cursor is not None and next_cursor is None:
+            next_cursor = cursor
+
+    return result, next_cursor
+
+
+__all__ = ["extract_media_raw", "parse_timeline_medias"]
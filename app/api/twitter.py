@@ -2,12 +2,14 @@ import json
 import pydash
 
 from typing import Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from twitter_openapi_python_generated import models
+from twitter_openapi_python_generated.exceptions import ApiException
 from twitter_openapi_python import (
     TwitterOpenapiPython,
     TwitterOpenapiPythonClient
 )
+from twitter_openapi_python.utils import get_kwargs
 from twitter_openapi_python.models import (
     UserApiUtilsData,
     TweetApiUtilsData,
@@ -15,7 +17,10 @@ from twitter_openapi_python.models import (
 )
 
 from app.infra.logger import getLogger
+from app.api.ratelimit import RateLimit, RateLimitPacer
+from app.api.timeline import parse_timeline_medias
 from app.twitter.models import UserInfo, MediaInfo, MediaTypes
+from app.twitter.variants import VideoVariant
 
 logger = getLogger(__name__)
 
@@ -23,6 +28,10 @@ logger = getLogger(__name__)
 @dataclass
 class TwitterAPI:
     api: TwitterOpenapiPythonClient
+    # 时间线直接解析原始 JSON，不构造 twitter-openapi 的模型
+    fast_path: bool = False
+    # 按响应头中的额度控制时间线的请求速度，同一个账号的时间线共用
+    pacer: RateLimitPacer = field(default_factory=RateLimitPacer)
 
     def get_user_info(self, screen_name: str) -> UserInfo:
         res = self.api.get_user_api().get_user_by_screen_name(screen_name=screen_name)
@@ -36,7 +45,12 @@ class TwitterAPI:
         )
 
     def get_user_likes_medias(self, rest_id: str, count: int = 20, cursor: Optional[str] = None) -> Tuple[list[MediaInfo], str]:
-        res = self.api.get_tweet_api().get_likes(user_id=rest_id, count=count, cursor=cursor)
+        if self.fast_path:
+            return self._get_timeline_medias_raw("Likes", rest_id=rest_id, count=count, cursor=cursor)
+
+        tweet_api = self.api.get_tweet_api()
+        res = self._paced("Likes", lambda: tweet_api.get_likes(user_id=rest_id, count=count, cursor=cursor))
+        self.pacer.update("Likes", RateLimit.from_headers(res.header.raw))
         data: TimelineApiUtilsResponse[TweetApiUtilsData] = res.data
 
         next_cursor = data.cursor.bottom.value if data.cursor.bottom is not None else None
@@ -50,7 +64,12 @@ class TwitterAPI:
         return result, next_cursor
 
     def get_user_medias(self, rest_id: str, count: int = 20, cursor: Optional[str] = None) -> Tuple[list[MediaInfo], str]:
-        res = self.api.get_tweet_api().get_user_media(user_id=rest_id, count=count, cursor=cursor)
+        if self.fast_path:
+            return self._get_timeline_medias_raw("UserMedia", rest_id=rest_id, count=count, cursor=cursor)
+
+        tweet_api = self.api.get_tweet_api()
+        res = self._paced("UserMedia", lambda: tweet_api.get_user_media(user_id=rest_id, count=count, cursor=cursor))
+        self.pacer.update("UserMedia", RateLimit.from_headers(res.header.raw))
         data: TimelineApiUtilsResponse[TweetApiUtilsData] = res.data
 
         next_cursor = data.cursor.bottom.to_str() if data.cursor.bottom is not None else None
@@ -63,15 +82,49 @@ class TwitterAPI:
 
         return result, next_cursor
 
+    def _get_timeline_medias_raw(
+            self, key: str, rest_id: str, count: int, cursor: Optional[str]
+    ) -> Tuple[list[MediaInfo], Optional[str]]:
+        tweet_api = self.api.get_tweet_api()
+        fn = {
+            "Likes": tweet_api.api.get_likes_without_preload_content,
+            "UserMedia": tweet_api.api.get_user_media_without_preload_content,
+        }[key]
+
+        param = {"userId": rest_id, "count": count}
+        if cursor is not None:
+            param["cursor"] = cursor
+
+        self.pacer.acquire(key)
+        res = fn(**get_kwargs(flag=tweet_api.flag[key], additional=param))
+        # 不预读内容的接口返回 urllib3 的响应，直接读取 headers
+        limit = RateLimit.from_headers(res.headers)
+        if res.status == 429:
+            raise self.pacer.exceeded(key, limit)
+        self.pacer.update(key, limit)
+        if not 200 <= res.status <= 299:
+            raise ValueError(f"{key} 请求失败: HTTP {res.status}")
+        return parse_timeline_medias(res.data)
+
+    def _paced(self, key: str, call):
+        """等到额度允许时发出请求，429 转换为 RateLimitExceeded"""
+        self.pacer.acquire(key)
+        try:
+            return call()
+        except ApiException as e:
+            if e.status == 429:
+                raise self.pacer.exceeded(key, RateLimit.from_headers(e.headers)) from e
+            raise
+
     @staticmethod
-    def create(auth_token: str, ct0: str) -> "TwitterAPI":
+    def create(auth_token: str, ct0: str, fast_path: bool = False) -> "TwitterAPI":
         client = TwitterOpenapiPython()
         # 这个库cookies正确的应该不是这样传的，但是这样传也能拿到数据
         x = client.get_client_from_cookies(cookies={
             "ct0": ct0,
             "auth_token": auth_token,
         })
-        return TwitterAPI(api=x)
+        return TwitterAPI(api=x, fast_path=fast_path)
 
 
 def extract_media(tweet: models.Tweet) -> list[MediaInfo]:
@@ -97,6 +150,8 @@ def extract_media(tweet: models.Tweet) -> list[MediaInfo]:
 
             # 确保是高清图
             base["url"] = url + "?name=orig"
+            base["width"] = pydash.get(m, "original_info.width")
+            base["height"] = pydash.get(m, "original_info.height")
 
         elif mtype in {"video", "animated_gif"}:
             variants = pydash.get(m, "video_info.variants", [])
@@ -113,6 +168,7 @@ def extract_media(tweet: models.Tweet) -> list[MediaInfo]:
             base["mimetype"] = best.content_type
             base["bitrate"] = best.bitrate or None
             base["duration"] = pydash.get(m, "video_info.duration_millis")
+            base["variants"] = [VideoVariant(url=v.url, bitrate=v.bitrate or None) for v in mp4s]
 
         result.append(MediaInfo(
             id=media_key,
@@ -122,6 +178,9 @@ def extract_media(tweet: models.Tweet) -> list[MediaInfo]:
             bitrate=base.get("bitrate") or None,
             mimetype=base.get("mimetype") or None,
             duration=base.get("duration") or None,
+            variants=base.get("variants") or [],
+            width=base.get("width") or None,
+            height=base.get("height") or None,
         ))
 
     return result
@@ -0,0 +1,195 @@
+import os
+import random
+import asyncio
+from types import SimpleNamespace
+from dataclasses import dataclass
+from typing import Optional, Callable, Union
+
+from telethon.tl import types
+from telethon.errors import FloodWaitError
+
+# 离线模拟的 TelegramClient，只实现 DownloadService 与 link_parser 用到的接口
+# - 消息和媒体都是合成的，不会访问网络
+# - 下载时按配置的延迟与带宽 sleep，并写入稀疏文件，不占用实际磁盘空间
+# - FloodWait 的处理方式与 telethon 一致：小于 flood_sleep_threshold 时自动等待，否则抛出错误
+
+_CHUNK_SIZE = 512 * 1024
+_DC_ID = 4
+
+_EXTENSIONS = {
+    "photo": ".jpg",
+    "video": ".mp4",
+    "audio": ".mp3",
+    "document": ".zip",
+}
+
+_MIME_TYPES = {
+    "photo": "image/jpeg",
+    "video": "video/mp4",
+    "audio": "audio/mpeg",
+    "document": "application/zip",
+}
+
+
+@dataclass
+class FakeNetwork:
+    # 每次请求的往返延迟（秒）
+    latency: float = 0.05
+    # 单个传输的带宽（字节/秒），0 表示不限速
+    bandwidth: float = 20 * 1024 * 1024
+    # 每次请求触发 FloodWait 的概率
+    flood_wait_rate: float = 0.0
+    # 触发 FloodWait 时需要等待的秒数
+    flood_wait_seconds: int = 1
+    # 与 telethon 的 flood_sleep_threshold 含义相同
+    flood_sleep_threshold: int = 60
+    # 随机数种子，保证多次运行的结果可比较
+    seed: int = 0
+
+
+@dataclass
+class FakeStats:
+    requests: int = 0
+    downloads: int = 0
+    bytes_sent: int = 0
+    flood_waits: int = 0
+    flood_wait_seconds: float = 0.0
+
+
+def _fake_document(media_id: int, kind: str, size: int) -> types.Document:
+    attributes = []
+    if kind == "video":
+        attributes.append(types.DocumentAttributeVideo(duration=10, w=1280, h=720))
+    elif kind == "audio":
+        attributes.append(types.DocumentAttributeAudio(duration=180))
+    return types.Document(
+        id=media_id, access_hash=media_id, file_reference=b"", date=None,
+        mime_type=_MIME_TYPES.get(kind, "application/octet-stream"), size=size, dc_id=_DC_ID, attributes=attributes,
+    )
+
+
+def create_fake_message(
+        message_id: int,
+        kind: str,
+        size: int,
+        peer_id: int = 0,
+        grouped_id: Optional[int] = None,
+) -> SimpleNamespace:
+    """构造一个满足 MediaTypes.from_message / get_media_if 的合成消息，媒体本身是真实的 TL 对象"""
+    media_id = abs(peer_id) * 1_000_000 + message_id if peer_id else message_id
+    message = SimpleNamespace(
+        id=message_id,
+        peer_id=peer_id,
+        grouped_id=grouped_id,
+        photo=None,
+        video=None,
+        gif=None,
+        video_note=None,
+        audio=None,
+        voice=None,
+        document=None,
+        # 合成消息的附加信息，下载时使用
+        fake_kind=kind,
+        fake_size=size,
+    )
+    if kind == "photo":
+        photo = types.Photo(
+            id=media_id, access_hash=media_id, file_reference=b"", date=None,
+            sizes=[types.PhotoSize(type="y", w=1280, h=1280, size=size)], dc_id=_DC_ID,
+        )
+        message.photo = photo
+        message.media = types.MessageMediaPhoto(photo=photo)
+    else:
+        document = _fake_document(media_id, kind, size)
+        message.document = document
+        if kind == "video":
+            message.video = document
+        elif kind == "audio":
+            message.audio = document
+        message.media = types.MessageMediaDocument(document=document)
+    return message
+
+
+class FakeTelegramClient:
+    def __init__(self, network: Optional[FakeNetwork] = None):
+        self.network = network or FakeNetwork()
+        self.stats = FakeStats()
+        self._random = random.Random(self.network.seed)
+        # (peer_id, message_id) -> message
+        self._messages: dict[tuple[int, int], SimpleNamespace] = {}
+
+    def add_message(self, message: SimpleNamespace) -> None:
+        self._messages[(message.peer_id, message.id)] = message
+
+    @staticmethod
+    def link_for(message: SimpleNamespace) -> str:
+        # 私有频道链接：peer_id = -(1000000000000 + channel)
+        channel = -message.peer_id - 1000000000000
+        return f"https://t.me/c/{channel}/{message.id}"
+
+    async def _round_trip(self) -> None:
+        self.stats.requests += 1
+        if self.network.latency > 0:
+            await asyncio.sleep(self.network.latency)
+
+        if self.network.flood_wait_rate > 0 and self._random.random() < self.network.flood_wait_rate:
+            seconds = self.network.flood_wait_seconds
+            self.stats.flood_waits += 1
+            if seconds > self.network.flood_sleep_threshold:
+                raise FloodWaitError(request=None, capture=seconds)
+            self.stats.flood_wait_seconds += seconds
+            await asyncio.sleep(seconds)
+
+    async def get_input_entity(self, peer):
+        await self._round_trip()
+        return peer
+
+    async def get_entity(self, peer):
+        await self._round_trip()
+        return peer
+
+    async def get_messages(self, entity, ids: int):
+        await self._round_trip()
+        return self._messages.get((entity, ids))
+
+    async def _transfer(self, path: str, size: int, progress_callback: Optional[Callable[[int, int], None]]) -> str:
+        sent = 0
+        while sent < size:
+            chunk = min(_CHUNK_SIZE, size - sent)
+            if self.network.bandwidth > 0:
+                await asyncio.sleep(chunk / self.network.bandwidth)
+            sent += chunk
+            if progress_callback is not None:
+                progress_callback(sent, size)
+
+        # 稀疏文件：大小正确但不实际写入数据
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+        self.stats.downloads += 1
+        self.stats.bytes_sent += size
+        return path
+
+    async def download_media(
+            self,
+            message: SimpleNamespace,
+            file: str,
+            progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> Union[str, None]:
+        await self._round_trip()
+        path = os.path.join(file, f"{message.fake_kind}_{message.id}{_EXTENSIONS.get(message.fake_kind, '')}")
+        return await self._transfer(path, message.fake_size, progress_callback)
+
+    async def download_file(
+            self,
+            location,
+            file: str,
+            file_size: Optional[int] = None,
+            dc_id: Optional[int] = None,
+            progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> Union[str, None]:
+        await self._round_trip()
+        return await self._transfer(file, file_size or 0, progress_callback)
+
+
+__all__ = ["FakeNetwork", "FakeStats", "FakeTelegramClient", "create_fake_message"]
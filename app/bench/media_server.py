@@ -0,0 +1,140 @@
+import time
+import zlib
+import threading
+import mimetypes
+from dataclasses import dataclass
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 本地媒体服务器，替代 pbs.twimg.com / video.twimg.com 用于离线基准测试
+# - 文件大小由路径的哈希决定，同一个 URL 每次返回的大小相同
+# - 支持 GET 与 HEAD，可配置首字节延迟与单连接吞吐量
+# - 图片支持 format、name 参数，较小的尺寸返回较小的文件
+
+_CHUNK_SIZE = 64 * 1024
+_PAYLOAD = b"\0" * _CHUNK_SIZE
+
+
+@dataclass
+class MediaServerOptions:
+    # 首字节延迟（秒）
+    latency: float = 0.05
+    # 单个连接的吞吐量（字节/秒），0 表示不限速
+    throughput: float = 10 * 1024 * 1024
+    # 图片大小范围（字节）
+    image_size: tuple[int, int] = (200 * 1024, 2 * 1024 * 1024)
+    # 视频大小范围（字节）
+    video_size: tuple[int, int] = (2 * 1024 * 1024, 30 * 1024 * 1024)
+
+
+# 相对原图的大小比例
+_PHOTO_SCALES = {"orig": 1.0, "4096x4096": 0.9, "large": 0.5, "medium": 0.25, "small": 0.08}
+_FORMAT_SCALES = {"webp": 0.7}
+
+
+def _size_for(path: str, options: MediaServerOptions, query: dict[str, list[str]] = None) -> int:
+    low, high = options.video_size if path.endswith((".mp4", ".m3u8")) else options.image_size
+    size = low + zlib.crc32(path.split(".")[0].encode("utf-8")) % max(1, high - low + 1)
+    if query:
+        size *= _PHOTO_SCALES.get(query.get("name", ["orig"])[0], 1.0)
+        size *= _FORMAT_SCALES.get(query.get("format", [""])[0], 1.0)
+    return max(int(size), 1)
+
+
+def _content_type(path: str, query: dict[str, list[str]]) -> str:
+    if "format" in query:
+        path = f"{path}.{query['format'][0]}"
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+class _MediaRequestHandler(BaseHTTPRequestHandler):
+    server: "_MediaHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def _send_headers(self) -> int:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        size = _size_for(url.path, self.server.options, query)
+        self.send_response(200)
+        self.send_header("Content-Type", _content_type(url.path, query))
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        return size
+
+    def do_HEAD(self):
+        self.server.count_request()
+        self._send_headers()
+
+    def do_GET(self):
+        self.server.count_request()
+        options = self.server.options
+        if options.latency > 0:
+            time.sleep(options.latency)
+
+        size = self._send_headers()
+        sent = 0
+        while sent < size:
+            chunk = min(_CHUNK_SIZE, size - sent)
+            self.wfile.write(_PAYLOAD[:chunk])
+            sent += chunk
+            if options.throughput > 0:
+                time.sleep(chunk / options.throughput)
+        self.server.count_bytes(sent)
+
+    def log_message(self, format, *args):
+        # 不输出访问日志
+        pass
+
+
+class _MediaHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options: MediaServerOptions):
+        super().__init__(address, _MediaRequestHandler)
+        self.options = options
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_bytes(self, size: int):
+        with self._lock:
+            self.bytes_sent += size
+
+
+class LocalMediaServer:
+    def __init__(self, options: MediaServerOptions = None, host: str = "127.0.0.1", port: int = 0):
+        self._server = _MediaHTTPServer((host, port), options or MediaServerOptions())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._server.bytes_sent
+
+    def url_for(self, url: str) -> str:
+        """将 twimg 的 URL 改写为本地服务器的 URL，保留路径与参数"""
+        parsed = urlparse(url)
+        return f"{self.base_url}{parsed.path}" + (f"?{parsed.query}" if parsed.query else "")
+
+    def __enter__(self) -> "LocalMediaServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+__all__ = ["MediaServerOptions", "LocalMediaServer"]
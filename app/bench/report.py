@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+from typing import Any, Optional, Sequence
+
+from app.infra.utils import percentile
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上单位是字节，Linux 上单位是 KB
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def distribution(values: Sequence[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def create_report(benchmark: str, scenario: str, params: dict[str, Any], metrics: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "benchmark": benchmark,
+        "scenario": scenario,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": params,
+        "metrics": metrics,
+    }
+
+
+def write_report(report: dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def compare_reports(baseline_path: str, report: dict[str, Any]) -> str:
+    """与基线报告对比顶层的数值指标，返回可读的对比结果"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    lines = [f"对比基线 {baseline.get('commit')} -> {report.get('commit')} ({report.get('scenario')})"]
+    for key, value in report["metrics"].items():
+        base = baseline.get("metrics", {}).get(key)
+        if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+            continue
+        change = (value - base) / base * 100 if base else 0.0
+        lines.append(f"  {key:<24} {base:>14.3f} -> {value:>14.3f} ({change:+.1f}%)")
+    return "\n".join(lines)
+
+
+__all__ = ["peak_rss_mb", "git_commit", "distribution", "create_report", "write_report", "compare_reports"]
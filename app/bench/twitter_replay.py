@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+from typing import Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+import twitter_openapi_python_generated as twitter
+from twitter_openapi_python import TwitterOpenapiPythonClient
+
+from app.api.twitter import TwitterAPI
+
+# GraphQL 响应的录制与回放
+# - 录制：包装生成代码中 ApiClient 的 rest_client，把每个响应写入 cassette 目录
+# - 回放：按 GraphQL 操作名与 variables（忽略 count）匹配录制的响应，不访问网络
+# cassette 目录结构：
+#   placeholder.json   twitter-openapi 的请求参数模板
+#   responses.jsonl    每行一个响应
+
+PLACEHOLDER_FILE = "placeholder.json"
+RESPONSES_FILE = "responses.jsonl"
+
+
+def _request_key(url: str) -> tuple[str, str]:
+    parsed = urlparse(url)
+    operation = parsed.path.rstrip("/").split("/")[-1]
+    variables = parse_qs(parsed.query).get("variables", ["{}"])[0]
+    try:
+        data = json.loads(variables)
+    except ValueError:
+        data = {}
+    # 页大小不影响匹配，回放时可以用不同的 count
+    data.pop("count", None)
+    return operation, json.dumps(data, sort_keys=True)
+
+
+class _ReplayHTTPResponse:
+    """代替 urllib3 的响应，生成代码与快速路径会读取 status、reason、headers、data"""
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes):
+        self.status = status
+        self.reason = "OK" if 200 <= status <= 299 else "Error"
+        self.headers = headers
+        self.data = body
+
+
+class RecordingRestClient:
+    """透传请求并把 GraphQL 响应追加写入 cassette"""
+
+    def __init__(self, delegate, directory: str):
+        self._delegate = delegate
+        self._lock = threading.Lock()
+        self._path = os.path.join(directory, RESPONSES_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+    def request(self, method, url, headers=None, body=None, post_params=None, _request_timeout=None):
+        response = self._delegate.request(
+            method, url, headers=headers, body=body, post_params=post_params, _request_timeout=_request_timeout
+        )
+        data = response.read()
+        operation, key = _request_key(url)
+        record = {
+            "operation": operation,
+            "key": key,
+            "status": response.status,
+            "headers": dict(response.getheaders()),
+            "body": data.decode("utf-8", errors="replace"),
+        }
+        with self._lock:
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return response
+
+
+class ReplayRestClient:
+    """从 cassette 返回录制的响应，找不到时返回 404"""
+
+    def __init__(self, directory: str):
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._responses: dict[tuple[str, str], dict[str, Any]] = {}
+        with open(os.path.join(directory, RESPONSES_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._responses[(record["operation"], record["key"])] = record
+
+    def request(self, method, url, headers=None, body=None, post_params=None, _request_timeout=None):
+        # 延迟导入，rest 模块只有在使用回放时才需要
+        from twitter_openapi_python_generated.rest import RESTResponse
+
+        with self._lock:
+            self.requests += 1
+
+        record = self._responses.get(_request_key(url))
+        if record is None:
+            return RESTResponse(_ReplayHTTPResponse(404, {"content-type": "application/json"}, b"{}"))
+
+        response = RESTResponse(_ReplayHTTPResponse(
+            record["status"], record["headers"], record["body"].encode("utf-8")
+        ))
+        response.read()
+        return response
+
+
+def start_recording(api: TwitterAPI, directory: str) -> None:
+    """让已创建的 TwitterAPI 在请求时录制响应"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, PLACEHOLDER_FILE), "w", encoding="utf-8") as f:
+        json.dump(api.api.placeholder, f, ensure_ascii=False)
+    api_client = api.api.api
+    api_client.rest_client = RecordingRestClient(api_client.rest_client, directory)
+
+
+def create_replay_api(directory: str, rest_client: Optional[ReplayRestClient] = None) -> TwitterAPI:
+    """创建一个只从 cassette 读取响应的 TwitterAPI，不需要 cookie 也不访问网络"""
+    with open(os.path.join(directory, PLACEHOLDER_FILE), "r", encoding="utf-8") as f:
+        placeholder = json.load(f)
+
+    api_client = twitter.ApiClient(configuration=twitter.Configuration())
+    api_client.rest_client = rest_client or ReplayRestClient(directory)
+    return TwitterAPI(api=TwitterOpenapiPythonClient(api=api_client, placeholder=placeholder))
+
+
+__all__ = ["RecordingRestClient", "ReplayRestClient", "start_recording", "create_replay_api"]
@@ -0,0 +1,227 @@
+import os
+import json
+import base64
+import time
+import random
+from typing import Any
+
+from app.bench.twitter_replay import PLACEHOLDER_FILE, RESPONSES_FILE
+
+# 生成合成的 cassette，没有可录制的账号时也能运行基准测试
+# 生成的 JSON 满足 twitter-openapi 模型的必填字段，只包含下载流程需要的内容
+
+def _flag(variables: dict[str, Any]) -> dict[str, Any]:
+    return {"queryId": "synthetic", "variables": variables, "features": {}, "fieldToggles": {}}
+
+
+_PLACEHOLDER = {
+    "Likes": _flag({"includePromotedContent": False}),
+    "UserMedia": _flag({"includePromotedContent": False}),
+    "UserByScreenName": _flag({}),
+}
+
+
+def _headers(remaining: int) -> dict[str, str]:
+    return {
+        "content-type": "application/json;charset=utf-8",
+        "x-connection-hash": "synthetic",
+        "x-content-type-options": "nosniff",
+        "x-frame-options": "SAMEORIGIN",
+        "x-response-time": "100",
+        "x-transaction-id": "synthetic",
+        "x-twitter-response-tags": "BouncerCompliant",
+        "x-xss-protection": "0",
+        "x-rate-limit-limit": "500",
+        "x-rate-limit-remaining": str(remaining),
+        "x-rate-limit-reset": str(int(time.time()) + 900),
+    }
+
+
+def _user(rest_id: str, screen_name: str, media_count: int) -> dict[str, Any]:
+    return {
+        "__typename": "User",
+        "id": base64.b64encode(f"User:{rest_id}".encode("utf-8")).decode("ascii"),
+        "rest_id": rest_id,
+        "is_blue_verified": False,
+        "profile_image_shape": "Circle",
+        "legacy": {
+            "created_at": "Mon Jan 01 00:00:00 +0000 2018",
+            "default_profile": True,
+            "default_profile_image": False,
+            "description": "",
+            "entities": {},
+            "fast_followers_count": 0,
+            "favourites_count": media_count,
+            "followers_count": 0,
+            "friends_count": 0,
+            "has_custom_timelines": False,
+            "is_translator": False,
+            "listed_count": 0,
+            "location": "",
+            "media_count": media_count,
+            "name": screen_name,
+            "normal_followers_count": 0,
+            "pinned_tweet_ids_str": [],
+            "possibly_sensitive": False,
+            "profile_image_url_https": "https://pbs.twimg.com/profile_images/0/synthetic.jpg",
+            "profile_interstitial_type": "",
+            "screen_name": screen_name,
+            "statuses_count": 0,
+            "translator_type": "none",
+            "verified": False,
+        },
+    }
+
+
+def _media(media_id: int, rnd: random.Random) -> dict[str, Any]:
+    base = {
+        "id_str": str(media_id),
+        "media_key": f"3_{media_id}",
+        "display_url": "pic.x.com/synthetic",
+        "expanded_url": "https://x.com/synthetic",
+        "indices": [0, 23],
+        "url": "https://t.co/synthetic",
+        "original_info": {"height": 1080, "width": 1920},
+        "ext_media_availability": {"status": "Available"},
+        "sizes": {size: {"h": 1080, "w": 1920, "resize": "fit"} for size in ("large", "medium", "small", "thumb")},
+    }
+    if rnd.random() < 0.75:
+        return base | {
+            "type": "photo",
+            "media_url_https": f"https://pbs.twimg.com/media/synthetic{media_id}.jpg",
+        }
+
+    duration = rnd.randint(5_000, 180_000)
+    return base | {
+        "type": "video",
+        "media_key": f"7_{media_id}",
+        "media_url_https": f"https://pbs.twimg.com/ext_tw_video_thumb/{media_id}/pu/img/synthetic.jpg",
+        "video_info": {
+            "aspect_ratio": [16, 9],
+            "duration_millis": duration,
+            "variants": [
+                {"content_type": "application/x-mpegURL",
+                 "url": f"https://video.twimg.com/ext_tw_video/{media_id}/pu/pl/synthetic.m3u8"},
+                {"bitrate": 256000, "content_type": "video/mp4",
+                 "url": f"https://video.twimg.com/ext_tw_video/{media_id}/pu/vid/480x270/synthetic.mp4"},
+                {"bitrate": 2176000, "content_type": "video/mp4",
+                 "url": f"https://video.twimg.com/ext_tw_video/{media_id}/pu/vid/1280x720/synthetic.mp4"},
+            ],
+        },
+    }
+
+
+def _tweet_entry(tweet_id: int, author: dict[str, Any], rnd: random.Random) -> dict[str, Any]:
+    medias = [_media(tweet_id * 10 + i, rnd) for i in range(rnd.randint(1, 4))]
+    entities = {"hashtags": [], "symbols": [], "urls": [], "user_mentions": [], "media": medias}
+    return {
+        "entryId": f"tweet-{tweet_id}",
+        "sortIndex": str(tweet_id),
+        "content": {
+            "entryType": "TimelineTimelineItem",
+            "__typename": "TimelineTimelineItem",
+            "itemContent": {
+                "itemType": "TimelineTweet",
+                "__typename": "TimelineTweet",
+                "tweetDisplayType": "Tweet",
+                "tweet_results": {
+                    "result": {
+                        "__typename": "Tweet",
+                        "rest_id": str(tweet_id),
+                        "core": {"user_results": {"result": author}},
+                        "legacy": {
+                            "bookmark_count": 0,
+                            "bookmarked": False,
+                            "conversation_id_str": str(tweet_id),
+                            "created_at": "Mon Jan 01 00:00:00 +0000 2024",
+                            "display_text_range": [0, 0],
+                            "entities": entities,
+                            "extended_entities": {"media": medias},
+                            "favorite_count": 0,
+                            "favorited": True,
+                            "full_text": "",
+                            "id_str": str(tweet_id),
+                            "is_quote_status": False,
+                            "lang": "zxx",
+                            "quote_count": 0,
+                            "reply_count": 0,
+                            "retweet_count": 0,
+                            "retweeted": False,
+                            "user_id_str": author["rest_id"],
+                        },
+                    }
+                },
+            },
+        },
+    }
+
+
+def _cursor_entry(value: str, cursor_type: str) -> dict[str, Any]:
+    return {
+        "entryId": f"cursor-{cursor_type.lower()}-{value}",
+        "sortIndex": "0",
+        "content": {
+            "entryType": "TimelineTimelineCursor",
+            "__typename": "TimelineTimelineCursor",
+            "value": value,
+            "cursorType": cursor_type,
+        },
+    }
+
+
+def _record(operation: str, variables: dict[str, Any], body: dict[str, Any], remaining: int) -> dict[str, Any]:
+    key = json.dumps(_PLACEHOLDER[operation]["variables"] | variables, sort_keys=True)
+    return {
+        "operation": operation,
+        "key": key,
+        "status": 200,
+        "headers": _headers(remaining),
+        "body": json.dumps(body, ensure_ascii=False),
+    }
+
+
+def synthesize_cassette(directory: str, screen_name: str, pages: int, tweets_per_page: int, seed: int = 0) -> int:
+    """生成 pages 页点赞时间线，返回媒体总数"""
+    rnd = random.Random(seed)
+    rest_id = "1000000001"
+    os.makedirs(directory, exist_ok=True)
+
+    records = []
+    total_medias = 0
+    cursor = None
+    for page in range(pages):
+        entries = []
+        for index in range(tweets_per_page):
+            author = _user(str(2000000000 + rnd.randint(0, 1000)), f"author{index}", 0)
+            entry = _tweet_entry(10 ** 15 + page * tweets_per_page + index, author, rnd)
+            total_medias += len(entry["content"]["itemContent"]["tweet_results"]["result"]["legacy"]["entities"]["media"])
+            entries.append(entry)
+
+        next_cursor = f"synthetic-{page + 1}"
+        entries.append(_cursor_entry(f"top-{page}", "Top"))
+        entries.append(_cursor_entry(next_cursor, "Bottom"))
+        body = {"data": {"user": {"result": {"__typename": "User", "timeline_v2": {"timeline": {
+            "instructions": [{"type": "TimelineAddEntries", "entries": entries}],
+        }}}}}}
+        variables = {"userId": rest_id} | ({"cursor": cursor} if cursor else {})
+        records.append(_record("Likes", variables, body, remaining=max(0, 500 - page - 1)))
+        cursor = next_cursor
+
+    # 最后一页只有游标，没有推文，下载流程会在这里结束
+    empty = {"data": {"user": {"result": {"__typename": "User", "timeline_v2": {"timeline": {
+        "instructions": [{"type": "TimelineAddEntries", "entries": [_cursor_entry("end", "Bottom")]}],
+    }}}}}}
+    records.append(_record("Likes", {"userId": rest_id, "cursor": cursor}, empty, remaining=max(0, 500 - pages - 1)))
+
+    user = {"data": {"user": {"result": _user(rest_id, screen_name, total_medias)}}}
+    records.append(_record("UserByScreenName", {"screen_name": screen_name}, user, remaining=95))
+
+    with open(os.path.join(directory, PLACEHOLDER_FILE), "w", encoding="utf-8") as f:
+        json.dump(_PLACEHOLDER, f)
+    with open(os.path.join(directory, RESPONSES_FILE), "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return total_medias
+
+
+__all__ = ["synthesize_cassette"]
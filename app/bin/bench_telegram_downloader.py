@@ -0,0 +1,297 @@
+import gc
+import os
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from dataclasses import dataclass
+from typing import Callable, Union
+
+from app.infra.cache import CacheManager
+from app.infra.tracing import tracer
+from app.infra.postprocess import post_processor, shutdown_post_processor
+from app.bench.report import peak_rss_mb, distribution, create_report, write_report, compare_reports
+from app.bench.fake_telegram import FakeNetwork, FakeTelegramClient, create_fake_message
+
+# 离线基准测试：使用模拟的 TelegramClient 测量 DownloadService 的调度开销
+# 用法：python -m app.bin.bench_telegram_downloader --scenario small-photos --output outputs/bench.json
+
+_KB = 1024
+_MB = 1024 * 1024
+_CHANNEL = 1000
+
+Source = Union[str, SimpleNamespace]
+
+
+@dataclass
+class Scenario:
+    description: str
+    count: int
+    build: Callable[[FakeTelegramClient, int, random.Random], list[Source]]
+
+
+def _build_small_photos(client: FakeTelegramClient, count: int, rnd: random.Random) -> list[Source]:
+    # 转发给 bot 的小图片
+    return [create_fake_message(i + 1, "photo", rnd.randint(100 * _KB, 300 * _KB)) for i in range(count)]
+
+
+def _build_huge_videos(client: FakeTelegramClient, count: int, rnd: random.Random) -> list[Source]:
+    return [create_fake_message(i + 1, "video", rnd.randint(1024 * _MB, 2048 * _MB)) for i in range(count)]
+
+
+def _build_mixed_links(client: FakeTelegramClient, count: int, rnd: random.Random) -> list[Source]:
+    # 链接文件：需要先解析链接再下载
+    kinds = [("photo", 100 * _KB, 2 * _MB), ("video", 5 * _MB, 200 * _MB), ("document", 1 * _MB, 50 * _MB),
+             ("audio", 2 * _MB, 10 * _MB)]
+    peer_id = -(1000000000000 + _CHANNEL)
+    links = []
+    for i in range(count):
+        kind, low, high = rnd.choice(kinds)
+        message = create_fake_message(i + 1, kind, rnd.randint(low, high), peer_id=peer_id)
+        client.add_message(message)
+        links.append(client.link_for(message))
+    return links
+
+
+def _build_media_groups(client: FakeTelegramClient, count: int, rnd: random.Random) -> list[Source]:
+    # 转发给 bot 的相册，每组 10 个媒体
+    messages = []
+    for group in range(count):
+        for index in range(10):
+            kind = "photo" if rnd.random() < 0.7 else "video"
+            size = rnd.randint(100 * _KB, 3 * _MB) if kind == "photo" else rnd.randint(5 * _MB, 50 * _MB)
+            messages.append(create_fake_message(group * 10 + index + 1, kind, size, grouped_id=group + 1))
+    return messages
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "small-photos": Scenario("大量小图片（bot 转发）", 10_000, _build_small_photos),
+    "huge-videos": Scenario("少量超大视频（bot 转发）", 4, _build_huge_videos),
+    "mixed-links": Scenario("混合类型的链接文件", 2_000, _build_mixed_links),
+    "media-groups": Scenario("bot 相册（每组 10 个媒体）", 200, _build_media_groups),
+}
+
+
+def _build_real_message(message_id: int, rnd: random.Random):
+    # 与 bot 收到的转发消息结构相同：带文本、实体、转发信息与缩略图
+    from telethon.tl import types
+    from telethon.tl.patched import Message
+
+    size = rnd.randint(5 * _MB, 50 * _MB)
+    document = types.Document(
+        id=message_id, access_hash=rnd.getrandbits(63), file_reference=rnd.randbytes(24), date=None,
+        mime_type="video/mp4", size=size, dc_id=4,
+        attributes=[types.DocumentAttributeVideo(duration=30, w=1280, h=720),
+                    types.DocumentAttributeFilename(file_name=f"video_{message_id}.mp4")],
+        thumbs=[types.PhotoStrippedSize(type="i", bytes=rnd.randbytes(600)),
+                types.PhotoSize(type="m", w=320, h=180, size=12 * _KB)],
+    )
+    text = f"forwarded video #{message_id} https://example.com/{message_id}"
+    return Message(
+        id=message_id,
+        peer_id=types.PeerUser(user_id=_CHANNEL),
+        date=None,
+        message=text,
+        media=types.MessageMediaDocument(document=document),
+        entities=[types.MessageEntityUrl(offset=text.index("https"), length=len(text) - text.index("https"))],
+        fwd_from=types.MessageFwdHeader(date=None, from_id=types.PeerChannel(channel_id=_CHANNEL), channel_post=message_id),
+    )
+
+
+async def measure_queue_memory(count: int, seed: int) -> dict:
+    """只提交不启动下载，测量排队中每个任务占用的内存"""
+    from app.telegram.downloader import DownloadService, logger
+    logger.setLevel(logging.WARNING)
+
+    rnd = random.Random(seed)
+    service = DownloadService(FakeTelegramClient(), bot=FakeTelegramClient(), silent=True)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    messages = [_build_real_message(i + 1, rnd) for i in range(count)]
+    gc.collect()
+    message_bytes = tracemalloc.get_traced_memory()[0] - baseline
+
+    # submit 同步加入队列，返回时任务已经在排队
+    for message in messages:
+        service.submit(message)
+
+    # 消息只被排队的任务引用时，释放后内存不会下降
+    del messages, message
+    gc.collect()
+    queued_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    await service.shutdown()
+    return {
+        "tasks": count,
+        "queued": service._task_queue.qsize(),
+        "queued_bytes": queued_bytes,
+        "bytes_per_task": queued_bytes / count if count else 0.0,
+        "message_bytes_per_task": message_bytes / count if count else 0.0,
+    }
+
+
+def _use_storage(directory: str):
+    # 基准测试的文件与统计写入临时目录，不污染真实的下载目录与累计状态
+    from app.infra.persistent import open_storage
+    from app.infra.throughput import ThroughputRecorder
+    from app.telegram.singleton import registry, settings
+    from app.telegram.state import AppState
+    settings.storage_directory = directory
+    settings.catalog_file = os.path.join(directory, "catalog.db")
+    registry.override("appState", AppState(open_storage(os.path.join(directory, "state.txt"))))
+    registry.override("throughput", ThroughputRecorder(os.path.join(directory, "throughput.db")))
+    pipeline = post_processor()
+    if pipeline is not None:
+        pipeline.set_results_file(os.path.join(directory, "postprocess.jsonl"))
+
+
+def _close_storage():
+    # 临时目录删除前写入并关闭
+    from app.telegram import singleton
+    singleton.appState.close()
+    singleton.throughput.close()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # 在这里导入，避免 --help 时也要解析配置文件
+    from app.telegram.downloader import DownloadService, logger
+    logger.setLevel(logging.WARNING)
+
+    scenario = SCENARIOS[args.scenario]
+    count = args.count or scenario.count
+    network = FakeNetwork(
+        latency=args.latency,
+        bandwidth=args.bandwidth * _MB,
+        flood_wait_rate=args.flood_rate,
+        flood_wait_seconds=args.flood_seconds,
+        seed=args.seed,
+    )
+    client = FakeTelegramClient(network)
+    bot = FakeTelegramClient(network)
+    sources = scenario.build(client, count, random.Random(args.seed))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _use_storage(workdir)
+        service = DownloadService(
+            client,
+            bot=bot,
+            max_concurrent=args.concurrency,
+            silent=True,
+            history_size=len(sources),
+            cache_manager=CacheManager(cache_file=os.path.join(workdir, "caches.txt")),
+        )
+        service.throttle_delay = args.throttle
+        # 各阶段耗时写入报告，不在真实的 outputs 目录中导出 trace
+        service.export_trace = False
+        tracer.clear()
+
+        service_task = asyncio.create_task(service.start())
+        started = time.monotonic()
+        results = await asyncio.gather(*(service.submit_async(source) for source in sources), return_exceptions=True)
+        wall = time.monotonic() - started
+        stages = tracer.summary()
+
+        await service.shutdown()
+        await service_task
+        # 启用了后处理时，等待处理完成后再删除临时目录
+        shutdown_post_processor()
+        _close_storage()
+
+    records = service.history()
+    total_bytes = sum(record.downloaded_bytes for record in records)
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    queue_latency = distribution([record.queue_duration for record in records])
+    run_duration = distribution([record.run_duration for record in records])
+
+    metrics = {
+        "tasks": len(sources),
+        "succeeded": len(sources) - failed,
+        "failed": failed,
+        "wall_seconds": wall,
+        "tasks_per_second": len(sources) / wall if wall > 0 else 0.0,
+        "bytes": total_bytes,
+        "bytes_per_second": total_bytes / wall if wall > 0 else 0.0,
+        "queue_latency_p50": queue_latency["p50"],
+        "queue_latency_p95": queue_latency["p95"],
+        "queue_latency_p99": queue_latency["p99"],
+        "queue_latency_max": queue_latency["max"],
+        "run_duration_p50": run_duration["p50"],
+        "run_duration_p95": run_duration["p95"],
+        "peak_rss_mb": peak_rss_mb(),
+        "api_requests": client.stats.requests + bot.stats.requests,
+        "flood_waits": client.stats.flood_waits + bot.stats.flood_waits,
+        "flood_wait_seconds": client.stats.flood_wait_seconds + bot.stats.flood_wait_seconds,
+        "stages": stages,
+    }
+    params = {
+        "count": count,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "bandwidth_mb": args.bandwidth,
+        "flood_rate": args.flood_rate,
+        "flood_seconds": args.flood_seconds,
+        "throttle": args.throttle,
+        "seed": args.seed,
+    }
+    return create_report("telegram-download-service", args.scenario, params, metrics)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="DownloadService 离线基准测试")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="small-photos")
+    parser.add_argument("--count", type=int, default=0, help="任务数量（相册场景为组数），默认使用场景预设值")
+    parser.add_argument("--concurrency", type=int, default=8, help="DownloadService 最大并发数")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次请求的往返延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, default=20, help="单个传输的带宽（MB/s），0 表示不限速")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="每次请求触发 FloodWait 的概率")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="FloodWait 的等待秒数")
+    parser.add_argument("--throttle", type=float, default=0.0, help="每个任务传输前的等待时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON 报告的输出路径")
+    parser.add_argument("--compare", default=None, help="用于对比的基线 JSON 报告")
+    parser.add_argument("--queue-memory", action="store_true",
+                        help="只测量排队任务占用的内存（--count 默认 100000），不执行下载")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.queue_memory:
+        metrics = asyncio.run(measure_queue_memory(args.count or 100_000, args.seed))
+        print(
+            f"[queue-memory] tasks={metrics['tasks']} queued={metrics['queued']} "
+            f"total={metrics['queued_bytes'] / _MB:.1f}MB per_task={metrics['bytes_per_task']:.0f}B "
+            f"(Message 对象 {metrics['message_bytes_per_task']:.0f}B)"
+        )
+        return
+
+    report = asyncio.run(run(args))
+
+    # 先与基线对比，输出路径可能与基线相同
+    comparison = compare_reports(args.compare, report) if args.compare else None
+
+    output = args.output or os.path.join("outputs", f"bench-telegram-{args.scenario}.json")
+    write_report(report, output)
+
+    metrics = report["metrics"]
+    print(
+        f"[{args.scenario}] tasks={metrics['tasks']} failed={metrics['failed']} "
+        f"wall={metrics['wall_seconds']:.2f}s tasks/s={metrics['tasks_per_second']:.1f} "
+        f"MB/s={metrics['bytes_per_second'] / _MB:.1f} "
+        f"queue p95={metrics['queue_latency_p95']:.3f}s peak_rss={metrics['peak_rss_mb']:.1f}MB"
+    )
+    print(f"报告已写入 {output}")
+
+    if comparison:
+        print(comparison)
+
+
+if __name__ == "__main__":
+    main()
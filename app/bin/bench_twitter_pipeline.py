@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import dataclasses
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from app.api.twitter import TwitterAPI
+from app.infra.cache import CacheManager
+from app.infra.tracing import tracer
+from app.infra.http_pool import PooledTransport
+from app.infra.throughput import ThroughputRecorder
+from app.twitter.models import MediaInfo
+from app.bench.media_server import MediaServerOptions, LocalMediaServer
+from app.bench.twitter_synth import synthesize_cassette
+from app.bench.twitter_replay import start_recording, create_replay_api
+from app.bench.report import peak_rss_mb, distribution, create_report, write_report, compare_reports
+
+# Twitter 点赞下载流程的离线基准测试
+# 1. 录制：python -m app.bin.bench_twitter_pipeline record --pages 50 --cassette outputs/cassette
+#    或生成：python -m app.bin.bench_twitter_pipeline synthesize --pages 50 --cassette outputs/cassette
+# 2. 回放：python -m app.bin.bench_twitter_pipeline run --cassette outputs/cassette --workers 1,4,8,12
+# 3. 校验：python -m app.bin.bench_twitter_pipeline validate --cassette outputs/cassette
+#    对比模型解析与原始 JSON 快速解析的结果与 CPU 耗时
+# 回放时时间线来自 cassette，媒体文件来自本地媒体服务器，不访问 X 的任何接口
+
+_MB = 1024 * 1024
+
+_WORKER_STAGES = ("admission", "transfer", "finalize")
+
+
+@dataclass
+class LocalMediaTwitterAPI(TwitterAPI):
+    # 把媒体 URL 改写为本地媒体服务器的地址
+    server: Optional[LocalMediaServer] = None
+
+    def get_user_likes_medias(self, rest_id: str, count: int = 20, cursor: Optional[str] = None) -> tuple[list[MediaInfo], str]:
+        medias, next_cursor = super().get_user_likes_medias(rest_id=rest_id, count=count, cursor=cursor)
+        for media in medias:
+            media.url = self.server.url_for(media.url)
+            for variant in media.variants:
+                variant.url = self.server.url_for(variant.url)
+        return medias, next_cursor
+
+
+def record(args: argparse.Namespace):
+    from app.twitter.singleton import settings
+
+    api = TwitterAPI.create(auth_token=settings.auth_token, ct0=settings.ct0)
+    start_recording(api, args.cassette)
+
+    user_info = api.get_user_info(screen_name=args.screen_name or settings.username)
+    cursor = None
+    total = 0
+    for page in range(args.pages):
+        medias, cursor = api.get_user_likes_medias(rest_id=user_info.rest_id, count=args.count, cursor=cursor)
+        total += len(medias)
+        print(f"第 {page + 1} 页: {len(medias)} 个媒体")
+        if not medias or not cursor:
+            break
+        time.sleep(args.page_delay)
+
+    print(f"已录制 {total} 个媒体至 {args.cassette}")
+
+
+def synthesize(args: argparse.Namespace):
+    from app.twitter.singleton import settings
+
+    total = synthesize_cassette(
+        args.cassette, args.screen_name or settings.username, pages=args.pages, tweets_per_page=args.count, seed=args.seed
+    )
+    print(f"已生成 {args.pages} 页共 {total} 个媒体至 {args.cassette}")
+
+
+def _run_mode(args: argparse.Namespace, server: LocalMediaServer, screen_name: str, workers: int) -> dict:
+    from app.twitter.executor import ThreadedExecutor
+    from app.twitter.singleton import registry, settings
+    from app.twitter.downloader import TwitterLikesMediaDownloader
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # 基准测试的文件写入临时目录，不污染真实的下载目录
+        settings.storage_directory = workdir
+        # 每轮使用独立的临时目录，媒体索引只会创建一次，这里不写入
+        settings.use_catalog = False
+        # 模拟的传输不计入真实的吞吐量统计
+        throughput = ThroughputRecorder(os.path.join(workdir, "throughput.db"))
+        registry.override("throughput", throughput)
+
+        replay = create_replay_api(args.cassette)
+        api = LocalMediaTwitterAPI(api=replay.api, fast_path=args.fast_path, server=server)
+        downloader = TwitterLikesMediaDownloader(
+            api=api, cache_manager=CacheManager(cache_file=os.path.join(workdir, "caches.txt"))
+        )
+        downloader.user_info = api.get_user_info(screen_name=screen_name)
+        # 降级下载的视频与图片不写入真实的升级队列
+        downloader.video_policy = dataclasses.replace(downloader.video_policy, upgrade_later=False)
+        downloader.photo_policy = dataclasses.replace(downloader.photo_policy, upgrade_later=False)
+        # 每轮使用独立的连接池，连接池大小默认与本轮的线程数相同
+        transport = PooledTransport(dataclasses.replace(settings.transport, pool_size=args.pool_size), workers)
+        downloader.session = transport.session
+        if args.prewarm:
+            transport.prewarm([server.base_url])
+
+        executor = ThreadedExecutor(max_workers=workers)
+        executor.page_delay = args.page_delay
+        tracer.clear()
+        bytes_before = server.bytes_sent
+
+        started = time.monotonic()
+        executor.start_download(downloader=downloader, count=downloader.limit)
+        wall = time.monotonic() - started
+        executor.shutdown()
+        transport.session.close()
+        throughput.close()
+
+    spans = tracer.spans()
+    connections = transport.metrics.total()
+    pages = downloader.api_request_count
+    resolve_seconds = sum(span.duration for span in spans if span.name == "resolve")
+    busy_seconds = sum(span.duration for span in spans if span.name in _WORKER_STAGES)
+    pagination_seconds = resolve_seconds + pages * args.page_delay
+    downloaded = downloader.image_download_count + downloader.video_download_count
+    items = downloaded + len(downloader.failed_list)
+    total_bytes = server.bytes_sent - bytes_before
+    transfer = distribution([span.duration for span in spans if span.name == "transfer" and span.error is None])
+
+    return {
+        "workers": workers,
+        "pages": pages,
+        "items": items,
+        "downloaded": downloaded,
+        "failed": len(downloader.failed_list),
+        "wall_seconds": wall,
+        "items_per_second": items / wall if wall > 0 else 0.0,
+        "bytes": total_bytes,
+        "bytes_per_second": total_bytes / wall if wall > 0 else 0.0,
+        "pagination_seconds": pagination_seconds,
+        "pagination_overhead": pagination_seconds / wall if wall > 0 else 0.0,
+        "worker_utilisation": busy_seconds / (workers * wall) if wall > 0 else 0.0,
+        "transfer_p50": transfer["p50"],
+        "transfer_p95": transfer["p95"],
+        "connections": connections.connections,
+        "discarded_connections": connections.discarded,
+        "handshakes_per_request": connections.handshake_rate,
+    }
+
+
+def run(args: argparse.Namespace):
+    from app.twitter.singleton import settings
+    from app.twitter.downloader import logger as downloader_logger
+
+    downloader_logger.setLevel(logging.WARNING)
+    screen_name = args.screen_name or settings.username
+    options = MediaServerOptions(
+        latency=args.latency,
+        throughput=args.throughput * _MB,
+        image_size=(int(args.image_size[0] * _MB), int(args.image_size[1] * _MB)),
+        video_size=(int(args.video_size[0] * _MB), int(args.video_size[1] * _MB)),
+    )
+
+    modes = []
+    with LocalMediaServer(options) as server:
+        for workers in args.workers:
+            result = _run_mode(args, server, screen_name, workers)
+            modes.append(result)
+            print(
+                f"[workers={workers}] items={result['items']} pages={result['pages']} "
+                f"wall={result['wall_seconds']:.2f}s items/s={result['items_per_second']:.2f} "
+                f"MB/s={result['bytes_per_second'] / _MB:.1f} "
+                f"pagination={result['pagination_overhead'] * 100:.1f}% "
+                f"utilisation={result['worker_utilisation'] * 100:.1f}% "
+                f"connections={result['connections']} discarded={result['discarded_connections']}"
+            )
+
+    # 报告中的指标展开为一层，便于与基线逐项对比
+    metrics = {f"w{mode['workers']}_{key}": value for mode in modes for key, value in mode.items() if key != "workers"}
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    params = {
+        "workers": args.workers,
+        "latency": args.latency,
+        "throughput_mb": args.throughput,
+        "image_size_mb": args.image_size,
+        "video_size_mb": args.video_size,
+        "page_delay": args.page_delay,
+        "fast_path": args.fast_path,
+        "pool_size": args.pool_size,
+        "prewarm": args.prewarm,
+    }
+    report = create_report("twitter-likes-pipeline", os.path.basename(os.path.abspath(args.cassette)), params, metrics)
+
+    comparison = compare_reports(args.compare, report) if args.compare else None
+    output = args.output or os.path.join("outputs", "bench-twitter.json")
+    write_report(report, output)
+    print(f"报告已写入 {output}")
+    if comparison:
+        print(comparison)
+
+
+def validate(args: argparse.Namespace):
+    from app.twitter.singleton import settings
+
+    model_api = create_replay_api(args.cassette)
+    raw_api = create_replay_api(args.cassette)
+    raw_api.fast_path = True
+    user_info = model_api.get_user_info(screen_name=args.screen_name or settings.username)
+
+    pages = 0
+    medias = 0
+    mismatches = 0
+    model_cpu = 0.0
+    raw_cpu = 0.0
+    cursor = None
+    while True:
+        started = time.process_time()
+        expected, expected_cursor = model_api.get_user_likes_medias(rest_id=user_info.rest_id, cursor=cursor)
+        model_cpu += time.process_time() - started
+
+        started = time.process_time()
+        actual, actual_cursor = raw_api.get_user_likes_medias(rest_id=user_info.rest_id, cursor=cursor)
+        raw_cpu += time.process_time() - started
+
+        pages += 1
+        medias += len(expected)
+        if expected != actual or expected_cursor != actual_cursor:
+            mismatches += 1
+            print(f"第 {pages} 页结果不一致: 模型解析 {len(expected)} 个，快速解析 {len(actual)} 个")
+            for left, right in zip(expected, actual):
+                if left != right:
+                    print(f"  - {left}\n  + {right}")
+
+        if not expected or not expected_cursor:
+            break
+        cursor = expected_cursor
+
+    print(
+        f"共 {pages} 页 {medias} 个媒体，不一致 {mismatches} 页；"
+        f"模型解析 {model_cpu / pages * 1000:.2f}ms/页，快速解析 {raw_cpu / pages * 1000:.2f}ms/页"
+    )
+    if mismatches:
+        sys.exit(1)
+
+
+def _float_pair(value: str) -> tuple[float, float]:
+    low, high = value.split(",")
+    return float(low), float(high)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Twitter 点赞下载流程的离线基准测试")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recorder = commands.add_parser("record", help="使用 configure.yml 中的账号录制时间线响应")
+    recorder.add_argument("--cassette", required=True, help="录制结果的目录")
+    recorder.add_argument("--pages", type=int, default=20, help="最多录制的页数")
+    recorder.add_argument("--count", type=int, default=20, help="每页请求的推文数量")
+    recorder.add_argument("--screen-name", default=None, help="默认使用配置中的 screen_name")
+    recorder.add_argument("--page-delay", type=float, default=0.5, help="录制时每页之间的等待时间（秒）")
+    recorder.set_defaults(handler=record)
+
+    synthesizer = commands.add_parser("synthesize", help="生成合成的时间线响应，不需要账号")
+    synthesizer.add_argument("--cassette", required=True, help="输出目录")
+    synthesizer.add_argument("--pages", type=int, default=50, help="页数")
+    synthesizer.add_argument("--count", type=int, default=20, help="每页的推文数量")
+    synthesizer.add_argument("--screen-name", default=None, help="默认使用配置中的 screen_name")
+    synthesizer.add_argument("--seed", type=int, default=0)
+    synthesizer.set_defaults(handler=synthesize)
+
+    runner = commands.add_parser("run", help="回放录制的时间线并从本地媒体服务器下载")
+    runner.add_argument("--cassette", required=True, help="录制结果的目录")
+    runner.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 8, 12],
+                        help="逗号分隔的线程数，每个值运行一轮")
+    runner.add_argument("--screen-name", default=None, help="录制时使用的 screen_name，默认使用配置中的值")
+    runner.add_argument("--latency", type=float, default=0.05, help="媒体服务器首字节延迟（秒）")
+    runner.add_argument("--throughput", type=float, default=10, help="媒体服务器单连接吞吐量（MB/s），0 表示不限速")
+    runner.add_argument("--image-size", type=_float_pair, default=(0.2, 2), help="图片大小范围（MB），如 0.2,2")
+    runner.add_argument("--video-size", type=_float_pair, default=(2, 30), help="视频大小范围（MB），如 2,30")
+    runner.add_argument("--page-delay", type=float, default=0.5, help="每页之间的等待时间（秒）")
+    runner.add_argument("--fast-path", action="store_true", help="使用原始 JSON 快速解析时间线")
+    runner.add_argument("--pool-size", type=int, default=0,
+                        help="每个 host 的连接数，0 表示与线程数相同，10 相当于 requests 的默认值")
+    runner.add_argument("--prewarm", action="store_true", help="开始前预先建立到媒体服务器的连接")
+    runner.add_argument("--output", default=None, help="JSON 报告的输出路径")
+    runner.add_argument("--compare", default=None, help="用于对比的基线 JSON 报告")
+    runner.set_defaults(handler=run)
+
+    validator = commands.add_parser("validate", help="对比两种时间线解析方式的结果与耗时")
+    validator.add_argument("--cassette", required=True, help="录制结果的目录")
+    validator.add_argument("--screen-name", default=None, help="录制时使用的 screen_name，默认使用配置中的值")
+    validator.set_defaults(handler=validate)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.infra.yml import parse_from
+from app.infra.path import resolve_path
+from app.infra.catalog import CatalogEntry, MediaCatalog, entry_to_dict
+from app.infra.storage_layout import StoredFile, iter_stored_files
+
+# 媒体索引的查询工具
+# 用法：
+#   python -m app.bin.catalog find --source twitter --account xxx --type video --since 2025-01-01
+#   python -m app.bin.catalog get x-1234567890
+#   python -m app.bin.catalog path ./downloads/telegram/videos/t-123.mp4
+#   python -m app.bin.catalog stats
+#   python -m app.bin.catalog backfill   # 把索引建立之前下载的文件加入索引
+
+_BATCH_SIZE = 1000
+
+
+def _configure() -> dict:
+    path = resolve_path("./configure.yml")
+    return (parse_from(path=path) or {}) if os.path.exists(path) else {}
+
+
+def _open(args: argparse.Namespace) -> MediaCatalog:
+    db = args.db or resolve_path(_configure().get("catalog_file", "./catalog.db").strip())
+    if not os.path.exists(db):
+        sys.exit(f"媒体索引不存在: {db}")
+    return MediaCatalog(db)
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _print(entries: list[CatalogEntry], as_json: bool) -> None:
+    for entry in entries:
+        if as_json:
+            print(json.dumps(entry_to_dict(entry), ensure_ascii=False))
+            continue
+        downloaded_at = datetime.fromtimestamp(entry.downloaded_at).strftime("%Y-%m-%d %H:%M:%S")
+        owner = entry.account or (str(entry.chat_id) if entry.chat_id is not None else "-")
+        print(f"{entry.key}\t{entry.source}\t{owner}\t{entry.media_type}\t{entry.size}\t{downloaded_at}\t{entry.path}")
+
+
+def find(args: argparse.Namespace) -> None:
+    catalog = _open(args)
+    entries = catalog.find(
+        source=args.source,
+        account=args.account,
+        media_type=args.type,
+        chat_id=args.chat_id,
+        since=_timestamp(args.since),
+        until=_timestamp(args.until),
+        limit=args.limit or None,
+    )
+    _print(entries, args.json)
+
+
+def get(args: argparse.Namespace) -> None:
+    entry = _open(args).get(args.key)
+    if entry is None:
+        sys.exit(f"没有找到: {args.key}")
+    _print([entry], args.json)
+
+
+def path(args: argparse.Namespace) -> None:
+    entry = _open(args).find_by_path(resolve_path(args.path))
+    if entry is None:
+        sys.exit(f"没有找到: {args.path}")
+    _print([entry], args.json)
+
+
+def stats(args: argparse.Namespace) -> None:
+    rows = _open(args).summary()
+    total_count = sum(row["count"] for row in rows)
+    total_size = sum(row["size"] or 0 for row in rows)
+    for row in rows:
+        print(f"{row['source']}\t{row['account'] or '-'}\t{row['media_type']}\t"
+              f"{row['count']}\t{(row['size'] or 0) / 1024 / 1024:.1f} MB")
+    print(f"总计\t{total_count}\t{total_size / 1024 / 1024:.1f} MB")
+
+
+def _entry(file: StoredFile) -> CatalogEntry:
+    stat = file.path.stat()
+    return CatalogEntry(
+        key=file.key,
+        source=file.source,
+        path=str(file.path),
+        size=stat.st_size,
+        media_type=file.media_type,
+        account=file.account,
+        mode=file.mode,
+        downloaded_at=stat.st_mtime,
+    )
+
+
+def backfill(args: argparse.Namespace) -> None:
+    configure = _configure()
+    db = args.db or resolve_path(configure.get("catalog_file", "./catalog.db").strip())
+    storage = Path(args.storage or resolve_path(configure.get("storage_directory", "./downloads").strip()))
+    catalog = MediaCatalog(db)
+
+    scanned = added = 0
+    batch: list[CatalogEntry] = []
+    for file in iter_stored_files(storage):
+        batch.append(_entry(file))
+        scanned += 1
+        if len(batch) >= _BATCH_SIZE:
+            # 已有的记录来自下载时写入，信息更完整，不覆盖
+            added += catalog.record_many(batch, replace=False)
+            batch.clear()
+    if batch:
+        added += catalog.record_many(batch, replace=False)
+
+    print(f"扫描 {scanned} 个文件，新增 {added} 条记录: {db}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="已下载媒体的索引查询")
+    parser.add_argument("--db", default=None, help="索引数据库路径，默认使用配置中的 catalog_file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    finder = commands.add_parser("find", help="按条件查询，按下载时间倒序")
+    finder.add_argument("--source", choices=["twitter", "telegram"], default=None)
+    finder.add_argument("--account", default=None, help="twitter 账号")
+    finder.add_argument("--type", default=None, help="媒体类型，如 image、video、photo、document")
+    finder.add_argument("--chat-id", type=int, default=None, help="telegram 会话 id")
+    finder.add_argument("--since", default=None, help="下载时间下限，ISO 格式，如 2025-01-01")
+    finder.add_argument("--until", default=None, help="下载时间上限，ISO 格式")
+    finder.add_argument("--limit", type=int, default=100, help="最多输出的数量，0 表示不限制")
+    finder.add_argument("--json", action="store_true", help="以 JSON Lines 输出")
+    finder.set_defaults(handler=find)
+
+    getter = commands.add_parser("get", help="按 key 查询，key 与 caches.txt 中的相同")
+    getter.add_argument("key")
+    getter.add_argument("--json", action="store_true", help="以 JSON 输出")
+    getter.set_defaults(handler=get)
+
+    by_path = commands.add_parser("path", help="按文件路径查询")
+    by_path.add_argument("path")
+    by_path.add_argument("--json", action="store_true", help="以 JSON 输出")
+    by_path.set_defaults(handler=path)
+
+    summary = commands.add_parser("stats", help="按来源、账号与类型统计")
+    summary.set_defaults(handler=stats)
+
+    filler = commands.add_parser("backfill", help="扫描存储目录，把没有索引的文件加入索引")
+    filler.add_argument("--storage", default=None, help="存储目录，默认使用配置中的 storage_directory")
+    filler.set_defaults(handler=backfill)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
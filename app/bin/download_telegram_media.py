@@ -1,20 +1,32 @@
 import asyncio
+import argparse
 from typing import Optional
 
+from app.infra.logger import configure_logging
+from app.infra.planning import report_plan
+from app.infra.postprocess import shutdown_post_processor
 from app.telegram.downloader import logger
 from app.telegram.singleton import settings
-from app.telegram.downloader import DownloadService
+from app.telegram.downloader import DownloadService, DownloadException, DownloadErrorCode
 from app.telegram.client import create_telegram_client
 from app.telegram.input import get_links_for_configure_or_raise
+from app.telegram.planner import TelegramPlanner
 
 
 async def submit_task_wrap(downloader: DownloadService, url: str) -> Optional[str]:
     try:
         result = await downloader.submit_async(url)
-        logger.debug(f"{url} 下载成功，已存储至 {result}")
+        logger.debug("%s 下载成功，已存储至 %s", url, result)
         return None
+    except DownloadException as e:
+        # 被过滤的媒体不算失败，原因记录在 outputs/telegram-filtered.jsonl
+        if e.error_code == DownloadErrorCode.Filtered:
+            logger.info("%s 已过滤：%s", url, e.message)
+            return None
+        logger.error("%s 下载失败：%s", url, e, exc_info=True)
+        return url
     except Exception as e:
-        logger.error(f"{url} 下载失败：{e}", exc_info=True)
+        logger.error("%s 下载失败：%s", url, e, exc_info=True)
         return url
 
 
@@ -26,6 +38,18 @@ async def bulk_submit_task(downloader: DownloadService, batch_urls: list[str]) -
     return [url for url in results if url is not None]
 
 
+async def plan(args: argparse.Namespace):
+    urls = list(get_links_for_configure_or_raise())
+    client = create_telegram_client(settings.api_id, settings.api_hash, proxy=settings.proxy_tuple)
+    await client.start(phone=settings.phone)
+
+    summary = await TelegramPlanner(client).run(urls)
+    bandwidth = args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    report_plan(summary, settings.outputs, settings.storage_directory, trace_prefix="download", bandwidth=bandwidth)
+
+    await client.disconnect()
+
+
 # 无法复用 Telegram Desktop App 的 session 访问权限是受限的
 async def main():
     urls = list(get_links_for_configure_or_raise())
@@ -35,7 +59,7 @@ async def main():
     await client.start(phone=settings.phone)
 
     me = await client.get_me()
-    logger.info(f'Logged in as {me.username}')
+    logger.info('Logged in as %s', me.username)
 
     # 批量处理 urls，每次最多处理 4 条
     batch_size = 4
@@ -60,19 +84,30 @@ async def main():
         if batch_results:
             failed_urls.extend(batch_results)
 
-        logger.debug(f"第 {i // batch_size + 1} 批处理完成")
+        logger.debug("第 %s 批处理完成", i // batch_size + 1)
 
     # 输出失败统计
     if failed_urls:
-        logger.warning(f"共有 {len(failed_urls)} 条链接下载失败")
+        logger.warning("共有 %s 条链接下载失败", len(failed_urls))
         for idx, failed_url in enumerate(failed_urls):
-            logger.warning(f"失败链接 {idx + 1}: {failed_url}")
+            logger.warning("失败链接 %s: %s", idx + 1, failed_url)
     else:
         logger.info("所有链接下载成功")
 
     await downloader.shutdown()
     await client.disconnect()
+    shutdown_post_processor()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="下载 Telegram 消息链接中的媒体")
+    parser.add_argument("--plan", action="store_true", help="只解析链接读取媒体大小，估算下载量，不下载文件")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="计划模式下估算耗时使用的带宽（MB/s），默认使用上一次运行测得的带宽")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    configure_logging()
+    asyncio.run(plan(args) if args.plan else main())
@@ -1,10 +1,41 @@
-from app.infra.logger import getLogger
-from app.twitter.singleton import threaded_pool
-from app.twitter.downloader import TwitterLikesMediaDownloader
+import argparse
+
+from app.infra.logger import getLogger, configure_logging
+from app.infra.planning import report_plan
+from app.infra.postprocess import shutdown_post_processor
+from app.twitter.singleton import threaded_pool, settings, transport
+from app.twitter.crawler import CrawlOrchestrator
+from app.twitter.planner import TwitterPlanner
 
 logger = getLogger(__name__)
 
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="下载 Twitter 点赞与发布的媒体")
+    parser.add_argument("--plan", action="store_true", help="只翻页并发送 HEAD 请求，估算下载量，不下载文件")
+    parser.add_argument("--max-pages", type=int, default=None, help="计划模式下每条时间线最多获取的页数")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="计划模式下估算耗时使用的带宽（MB/s），默认使用上一次运行测得的带宽")
+    return parser.parse_args()
+
+
+def plan(args: argparse.Namespace):
+    planner = TwitterPlanner(accounts=settings.accounts, max_pages=args.max_pages, page_delay=threaded_pool.page_delay)
+    summary = planner.run()
+    bandwidth = args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    report_plan(summary, settings.outputs, settings.storage_directory, trace_prefix="twitter", bandwidth=bandwidth)
+
+
 if __name__ == '__main__':
-    TwitterLikesMediaDownloader().start()
+    args = parse_args()
+    configure_logging()
+    if args.plan:
+        plan(args)
+    else:
+        if settings.transport.prewarm:
+            # 翻页获取第一批媒体时，到 CDN 的连接已经建立好
+            transport.prewarm()
+        CrawlOrchestrator(accounts=settings.accounts, executor=threaded_pool).run()
 
     threaded_pool.shutdown()
+    shutdown_post_processor()
@@ -0,0 +1,123 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from app.infra.yml import parse_from
+from app.infra.path import resolve_path
+from app.infra.catalog import MediaCatalog
+from app.infra.storage_layout import MAX_SHARD_LEVELS, StoredFile, ensure_dir, shard_dir, iter_stored_files
+
+# 把存储目录中已有的文件移动到配置的分片布局（也可以从分片改回不分片）
+# 用法：python -m app.bin.migrate_storage [--shards 2] [--dry-run]
+# - 同一个文件系统内使用 rename 移动，每个文件的移动是原子的
+# - 可以随时中断，再次运行时已经在目标位置的文件会跳过，从中断的地方继续
+# - 存在媒体索引时同步修改索引中的路径：每批移动文件后只修改实际移动了的文件，出错或 Ctrl+C 中断时也会先写入索引
+# - 下载程序运行时也可以迁移，新下载的文件已经按新的布局存储
+
+_BATCH_SIZE = 1000
+
+
+def _configure() -> dict:
+    path = resolve_path("./configure.yml")
+    return (parse_from(path=path) or {}) if os.path.exists(path) else {}
+
+
+class Migration:
+    def __init__(self, storage: Path, shards: int, catalog: Optional[MediaCatalog], dry_run: bool = False):
+        self.storage = storage
+        self.shards = shards
+        self.catalog = catalog
+        self.dry_run = dry_run
+        self.scanned = 0
+        self.moved = 0
+        self.conflicts = 0
+        # 移动后可能变空的旧目录
+        self._sources: set[tuple[Path, Path]] = set()
+
+    def run(self) -> None:
+        batch: list[tuple[StoredFile, Path]] = []
+        for file in iter_stored_files(self.storage):
+            self.scanned += 1
+            target = Path(shard_dir(str(file.base), file.key, self.shards)) / file.path.name
+            if file.path == target:
+                continue
+            batch.append((file, target))
+            if len(batch) >= _BATCH_SIZE:
+                self._move(batch)
+                batch = []
+        if batch:
+            self._move(batch)
+
+        if not self.dry_run:
+            self._remove_empty_dirs()
+
+    def _move(self, batch: list[tuple[StoredFile, Path]]) -> None:
+        if self.dry_run:
+            for file, target in batch:
+                print(f"{file.path} -> {target}")
+            self.moved += len(batch)
+            return
+
+        # 只有实际移动了的文件才修改索引，跳过的冲突与中途出错之后的文件保持原来的路径
+        moves: list[tuple[str, str]] = []
+        try:
+            for file, target in batch:
+                if target.exists():
+                    # 不覆盖已有的文件，保留原文件由用户处理
+                    print(f"目标文件已存在，跳过: {file.path} -> {target}", file=sys.stderr)
+                    self.conflicts += 1
+                    continue
+                ensure_dir(str(target.parent))
+                os.rename(file.path, target)
+                moves.append((str(file.path), str(target)))
+                self._sources.add((file.path.parent, file.base))
+                self.moved += 1
+        finally:
+            if self.catalog is not None and moves:
+                self.catalog.update_paths(moves)
+
+        print(f"已扫描 {self.scanned} 个文件，已移动 {self.moved} 个")
+
+    def _remove_empty_dirs(self) -> None:
+        # 从分片目录向上删除空目录，不删除类型目录本身
+        for directory, base in self._sources:
+            while directory != base and base in directory.parents:
+                try:
+                    directory.rmdir()
+                except OSError:
+                    break
+                directory = directory.parent
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="把已下载的文件迁移到配置的分片布局")
+    parser.add_argument("--storage", default=None, help="存储目录，默认使用配置中的 storage_directory")
+    parser.add_argument("--shards", type=int, choices=range(MAX_SHARD_LEVELS + 1), default=None,
+                        help="目标分片层级，默认使用配置中的 storage_shards")
+    parser.add_argument("--db", default=None, help="媒体索引路径，默认使用配置中的 catalog_file")
+    parser.add_argument("--dry-run", action="store_true", help="只输出需要移动的文件，不实际移动")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure = _configure()
+    storage = Path(args.storage or resolve_path(configure.get("storage_directory", "./downloads").strip()))
+    shards = args.shards if args.shards is not None else int(configure.get("storage_shards", 0))
+    db = args.db or resolve_path(configure.get("catalog_file", "./catalog.db").strip())
+    if not storage.is_dir():
+        sys.exit(f"存储目录不存在: {storage}")
+
+    catalog = MediaCatalog(db) if os.path.exists(db) else None
+    migration = Migration(storage, shards=shards, catalog=catalog, dry_run=args.dry_run)
+    migration.run()
+    print(
+        f"完成: 扫描 {migration.scanned} 个文件，{'需要移动' if args.dry_run else '移动'} {migration.moved} 个，"
+        f"冲突 {migration.conflicts} 个"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from app.infra.yml import parse_from
+from app.infra.path import resolve_path
+from app.infra.catalog import MediaCatalog
+from app.infra.storage_layout import TypeDir, iter_type_dirs, is_shard_dir, parse_stored_name
+
+# 按存储目录中的文件校验或重建去重缓存（caches.txt）
+# 用法：
+#   python -m app.bin.reconcile_cache              # 只校验，输出两个方向的差异
+#   python -m app.bin.reconcile_cache --rebuild    # 按磁盘上的文件重新生成缓存文件
+# - 每个类型目录与分片目录是一个任务，多个线程并行 os.scandir，百万级文件几分钟内完成
+# - 从文件名恢复 key：t-<id>.<ext> -> t-<id>，x-<mode>-<id>.<ext> -> x-<id>
+# - 下载中断残留的 .tmp 文件与空文件不算已下载；存在媒体索引时同时核对文件大小
+# - 重建时一次写入临时文件再替换，原来的缓存文件保留为 .bak；重建前需要停止下载程序
+
+_SAMPLE_SIZE = 20
+
+
+def _configure() -> dict:
+    path = resolve_path("./configure.yml")
+    return (parse_from(path=path) or {}) if os.path.exists(path) else {}
+
+
+@dataclass
+class ScanResult:
+    # key -> 其中一个文件的路径（twitter 同一个媒体可能在多个账号、时间线下各有一个文件）
+    keys: dict[str, str] = field(default_factory=dict)
+    # 路径 -> 文件大小
+    sizes: dict[str, int] = field(default_factory=dict)
+    files: int = 0
+    bytes: int = 0
+    temp_files: list[str] = field(default_factory=list)
+    empty_files: list[str] = field(default_factory=list)
+    # 类型目录中无法识别的文件
+    unknown_files: list[str] = field(default_factory=list)
+
+
+def _scan_dir(item: TypeDir, directory: str) -> tuple[list[tuple[str, str, int]], list[str], list[str], list[str]]:
+    """扫描单个目录，返回 (已下载的文件, 临时文件, 无法识别的文件, 分片子目录)"""
+    files: list[tuple[str, str, int]] = []
+    temp_files: list[str] = []
+    unknown: list[str] = []
+    subdirs: list[str] = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if is_shard_dir(entry.name):
+                    subdirs.append(entry.path)
+                continue
+            if entry.name.endswith(".tmp"):
+                temp_files.append(entry.path)
+                continue
+            parsed = parse_stored_name(item.source, entry.name)
+            if parsed is None:
+                unknown.append(entry.path)
+                continue
+            files.append((parsed[0], entry.path, entry.stat(follow_symlinks=False).st_size))
+    return files, temp_files, unknown, subdirs
+
+
+def scan(storage: Path, workers: int, source: Optional[str] = None) -> ScanResult:
+    result = ScanResult()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: dict[Future, TypeDir] = {}
+        for item in iter_type_dirs(storage):
+            if source is None or item.source == source:
+                pending[executor.submit(_scan_dir, item, str(item.base))] = item
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                files, temp_files, unknown, subdirs = future.result()
+                for subdir in subdirs:
+                    pending[executor.submit(_scan_dir, item, subdir)] = item
+                for key, path, size in files:
+                    result.files += 1
+                    result.bytes += size
+                    result.sizes[path] = size
+                    if size == 0:
+                        result.empty_files.append(path)
+                        continue
+                    result.keys.setdefault(key, path)
+                result.temp_files.extend(temp_files)
+                result.unknown_files.extend(unknown)
+    return result
+
+
+def load_cache(cache_file: str) -> list[str]:
+    if not os.path.exists(cache_file):
+        return []
+    with open(cache_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def write_cache(cache_file: str, keys: list[str]) -> None:
+    """一次写入临时文件再替换，原来的缓存文件保留为 .bak"""
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    temp = cache_file + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write("".join(key + "\n" for key in keys))
+    if os.path.exists(cache_file):
+        os.replace(cache_file, cache_file + ".bak")
+    os.replace(temp, cache_file)
+
+
+def _report(title: str, items: list[str], verbose: bool) -> None:
+    print(f"{title}: {len(items)}")
+    shown = items if verbose else items[:_SAMPLE_SIZE]
+    for item in shown:
+        print(f"  {item}")
+    if len(shown) < len(items):
+        print(f"  ... 还有 {len(items) - len(shown)} 个，使用 --verbose 查看全部")
+
+
+def _size_mismatches(catalog: MediaCatalog, result: ScanResult, source: Optional[str]) -> tuple[list[str], list[str]]:
+    recorded = catalog.sizes(source)
+    mismatched = [f"{path}: 索引 {size}，磁盘 {result.sizes[path]}"
+                  for path, size in recorded.items() if path in result.sizes and result.sizes[path] != size]
+    missing = [path for path in recorded if path not in result.sizes]
+    return sorted(mismatched), sorted(missing)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="按存储目录中的文件校验或重建去重缓存")
+    parser.add_argument("--storage", default=None, help="存储目录，默认使用配置中的 storage_directory")
+    parser.add_argument("--cache-file", default=None, help="缓存文件，默认使用配置中的 cache_file")
+    parser.add_argument("--db", default=None, help="媒体索引路径，默认使用配置中的 catalog_file，不存在时不核对大小")
+    parser.add_argument("--source", choices=["twitter", "telegram"], default=None,
+                        help="只处理一个来源，重建时另一个来源的 key 保持不变")
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4), help="扫描线程数")
+    parser.add_argument("--rebuild", action="store_true", help="按磁盘上的文件重新生成缓存文件")
+    parser.add_argument("--drop-missing", action="store_true",
+                        help="重建时删除磁盘上没有文件的 key，默认保留（手动删除的文件不会被重新下载）")
+    parser.add_argument("--remove-temp", action="store_true", help="删除下载中断残留的 .tmp 文件")
+    parser.add_argument("--verbose", action="store_true", help="输出全部差异，默认每项最多输出 20 个")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure = _configure()
+    storage = Path(args.storage or resolve_path(configure.get("storage_directory", "./downloads").strip()))
+    cache_file = args.cache_file or resolve_path(configure.get("cache_file", "./caches.txt").strip())
+    db = args.db or resolve_path(configure.get("catalog_file", "./catalog.db").strip())
+    if not storage.is_dir():
+        sys.exit(f"存储目录不存在: {storage}")
+
+    prefix = {"twitter": "x-", "telegram": "t-"}.get(args.source, "")
+
+    started = time.monotonic()
+    result = scan(storage, workers=max(args.workers, 1), source=args.source)
+    elapsed = time.monotonic() - started
+    print(f"扫描 {result.files} 个文件（{result.bytes / 1024 / 1024:.1f} MB），{len(result.keys)} 个 key，"
+          f"耗时 {elapsed:.2f} 秒（{result.files / max(elapsed, 1e-6):.0f} 个/秒）")
+
+    cached = load_cache(cache_file)
+    cached_keys = {key for key in cached if key.startswith(prefix)}
+    on_disk = set(result.keys)
+    print(f"缓存文件 {cache_file}: {len(cached)} 行，{len(cached_keys)} 个 key")
+
+    _report("缓存中有但磁盘上没有的 key", sorted(cached_keys - on_disk), args.verbose)
+    _report("磁盘上有但缓存中没有的文件", sorted(result.keys[key] for key in on_disk - cached_keys), args.verbose)
+    _report("下载中断残留的临时文件", sorted(result.temp_files), args.verbose)
+    _report("空文件（不算已下载）", sorted(result.empty_files), args.verbose)
+    _report("无法识别的文件", sorted(result.unknown_files), args.verbose)
+
+    if os.path.exists(db):
+        catalog = MediaCatalog(db)
+        mismatched, missing = _size_mismatches(catalog, result, args.source)
+        catalog.close()
+        _report("与索引记录大小不一致的文件", mismatched, args.verbose)
+        _report("索引中有但磁盘上没有的文件", missing, args.verbose)
+
+    if args.remove_temp:
+        for path in result.temp_files:
+            os.remove(path)
+        print(f"已删除 {len(result.temp_files)} 个临时文件")
+
+    if args.rebuild:
+        keys = on_disk if args.drop_missing else on_disk | cached_keys
+        # 只处理一个来源时保留另一个来源的 key
+        others = [key for key in dict.fromkeys(cached) if not key.startswith(prefix)] if prefix else []
+        write_cache(cache_file, others + sorted(keys))
+        print(f"已重建缓存文件 {cache_file}: {len(others) + len(keys)} 个 key")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import asyncio
 import contextlib
 
+from app.infra.logger import configure_logging
+from app.infra.postprocess import shutdown_post_processor
 from app.telegram.bot import TelegramBotService
 from app.infra.graceful import shutdown_event, add_signal_handler
 
@@ -18,5 +20,8 @@ async def main():
     with contextlib.suppress(asyncio.CancelledError):
         await bot_task
 
+    shutdown_post_processor()
+
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import asdict
+
+from app.infra.path import resolve_path
+from app.infra.throughput import HOUR, MINUTE, ThroughputRecorder, format_trend, parse_window
+
+# 下载吞吐量的趋势报告，数据由 twitter 与 telegram 下载时写入 outputs/throughput.db
+# 用法：
+#   python -m app.bin.throughput_stats                  # 最近 24 小时，按小时
+#   python -m app.bin.throughput_stats --window 90m     # 最近 90 分钟，按分钟
+#   python -m app.bin.throughput_stats --window 7d --source twitter --resolution hour --json
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="下载吞吐量的趋势报告")
+    parser.add_argument("--db", default=None, help="统计数据库路径，默认 outputs/throughput.db")
+    parser.add_argument("--window", default="24h", help="时间范围，如 90m、24h、7d，默认 24h")
+    parser.add_argument("--source", choices=["twitter", "telegram"], default=None, help="只统计一个来源")
+    parser.add_argument("--resolution", choices=["minute", "hour"], default=None,
+                        help="聚合粒度，默认 3 小时以内按分钟，之外按小时")
+    parser.add_argument("--rows", type=int, default=0, help="最多输出的明细行数（保留最近的），0 表示不限制")
+    parser.add_argument("--json", action="store_true", help="以 JSON Lines 输出每个桶")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    db = args.db or resolve_path("./outputs/throughput.db")
+    if not os.path.exists(db):
+        sys.exit(f"统计数据库不存在: {db}")
+
+    try:
+        seconds, resolution = parse_window(args.window)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.resolution is not None:
+        resolution = MINUTE if args.resolution == "minute" else HOUR
+
+    recorder = ThroughputRecorder(db)
+    try:
+        now = time.time()
+        buckets = recorder.query(since=now - seconds, until=now, resolution=resolution, source=args.source)
+    finally:
+        recorder.close()
+
+    if args.json:
+        for bucket in buckets:
+            print(json.dumps({**asdict(bucket), "avg_speed": bucket.avg_speed, "rate": bucket.rate},
+                             ensure_ascii=False))
+        return
+    print(format_trend(buckets, max_rows=args.rows or None))
+
+
+if __name__ == "__main__":
+    main()
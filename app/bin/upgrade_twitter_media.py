@@ -0,0 +1,141 @@
+import os
+import argparse
+import mimetypes
+import dataclasses
+from typing import Optional
+
+import requests
+
+from app.infra.logger import getLogger, configure_logging
+from app.twitter.upgrades import UpgradeEntry
+from app.twitter.variants import in_window
+from app.twitter import singleton
+
+logger = getLogger(__name__)
+
+# 下载降级视频的最高码率版本、非原图图片的原图，并替换原文件
+# 用法：python -m app.bin.upgrade_twitter_media [--force] [--limit 100]
+# - 视频与图片分别只在 video_policy、photo_policy 的 upgrade_window 时段内升级，不在时段内的条目留到下次，适合用定时任务调用
+# - 文件位置以媒体索引中的路径为准（迁移存储布局后路径会变化）
+
+_TIMEOUT = 120.0
+_CHUNK_SIZE = 64 * 1024
+
+
+def _current_path(entry: UpgradeEntry) -> Optional[str]:
+    catalog = singleton.catalog
+    record = catalog.get(entry.key) if catalog is not None else None
+    path = record.path if record is not None else entry.path
+    return path if os.path.exists(path) else None
+
+
+def _window(entry: UpgradeEntry) -> Optional[str]:
+    # 只有图片的条目有 rendition
+    settings = singleton.settings
+    return (settings.photo_policy if entry.rendition else settings.video_policy).upgrade_window
+
+
+def upgrade(session: requests.Session, entry: UpgradeEntry) -> bool:
+    """返回 False 表示文件已经不存在，不需要升级"""
+    path = _current_path(entry)
+    if path is None:
+        logger.info("文件不存在，跳过: %s", entry.key)
+        return False
+
+    temp = path + ".upgrade.tmp"
+    target = path
+    written = 0
+    try:
+        with session.get(entry.url, stream=True, timeout=_TIMEOUT) as res:
+            res.raise_for_status()
+            with open(temp, "wb") as f:
+                for chunk in res.iter_content(chunk_size=_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+
+        # 图片的格式可能变化（例如 webp -> jpg），扩展名跟随新的格式
+        ctype = res.headers.get("Content-Type", "").split(";")[0]
+        ext = mimetypes.guess_extension(ctype) if ctype else None
+        if ext == ".jpe":
+            ext = ".jpg"
+        if ext and ext != ".bin":
+            target = os.path.splitext(path)[0] + ext
+
+        # 下载完成后才替换，失败时保留原来的文件
+        os.replace(temp, target)
+        if target != path:
+            os.remove(path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    catalog = singleton.catalog
+    record = catalog.get(entry.key) if catalog is not None else None
+    if record is not None:
+        catalog.record(dataclasses.replace(
+            record,
+            path=target,
+            size=written,
+            mime=ctype or record.mime,
+            bitrate=entry.bitrate,
+            origin=entry.url,
+            rendition="orig" if entry.rendition else None,
+        ))
+
+    if entry.rendition:
+        logger.info("已升级 %s: %s -> orig, %.2f MB", entry.key, entry.rendition, written / 1024 / 1024)
+    else:
+        logger.info("已升级 %s: %s -> %s bps, %.2f MB", entry.key, entry.downloaded_bitrate, entry.bitrate,
+                    written / 1024 / 1024)
+    return True
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="下载降级视频的最高码率版本与非原图图片的原图")
+    parser.add_argument("--force", action="store_true", help="忽略视频与图片的 upgrade_window，立即运行")
+    parser.add_argument("--limit", type=int, default=0, help="本次最多升级的数量，0 表示不限制")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_logging()
+
+    settings = singleton.settings
+    windows = {settings.video_policy.upgrade_window, settings.photo_policy.upgrade_window}
+    if not args.force and not any(in_window(window) for window in windows):
+        logger.info("当前不在升级时段 %s，退出", "、".join(sorted(window for window in windows if window)))
+        return
+
+    entries = singleton.upgrade_queue.load()
+    logger.info("升级队列中有 %s 个媒体", len(entries))
+
+    session = requests.Session()
+    done: set[str] = set()
+    failed = 0
+    skipped = 0
+    try:
+        for entry in entries:
+            if args.limit and len(done) >= args.limit:
+                break
+            if not args.force and not in_window(_window(entry)):
+                # 另一种媒体的时段可能还没有结束，跳过这个条目留到下次
+                skipped += 1
+                continue
+            try:
+                upgrade(session, entry)
+                done.add(entry.key)
+            except Exception as e:
+                failed += 1
+                logger.error("升级 %s 失败: %s", entry.key, e)
+    finally:
+        singleton.upgrade_queue.remove(done)
+
+    if skipped:
+        logger.info("%s 个媒体不在各自的升级时段内，留到下次", skipped)
+    logger.info("升级完成: %s 个，失败 %s 个，剩余 %s 个", len(done), failed, len(entries) - len(done))
+
+
+if __name__ == "__main__":
+    main()
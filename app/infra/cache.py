@@ -1,14 +1,16 @@
 import os
-from typing import Set
+from typing import Set, Optional
 from threading import RLock
 
 
 # twitter 的媒体的 key 带有 x- 前缀
 # telegram 的媒体的 key 带有 t- 前缀
+# 两者默认共用一个缓存文件，指定 prefix 时只加载对应前缀的 key，内存占用与另一方的缓存大小无关
 
 class CacheManager:
-    def __init__(self, cache_file: str):
+    def __init__(self, cache_file: str, prefix: Optional[str] = None):
         self._cache_file = cache_file
+        self._prefix = prefix
         self._lock = RLock()
         self._makedirs()
         self._cache = self._load_from_file()
@@ -44,6 +46,6 @@ class CacheManager:
         with open(self._cache_file, "r", encoding="utf-8") as f:
             for line in f.readlines():
                 trimmed = line.strip()
-                if trimmed:
+                if trimmed and (self._prefix is None or trimmed.startswith(self._prefix)):
                     result.add(trimmed)
         return result
@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+from threading import Lock
+from dataclasses import dataclass, field, asdict, fields
+from typing import Any, Optional
+
+# 已下载媒体的索引
+# - 每个文件在下载完成（finalize）时写入一条记录，key 与 caches.txt 中的 key 相同
+# - 查找、统计都走索引，不需要遍历存储目录
+# - 连接在多个线程间共用，写入时加锁；使用 WAL 模式，读取不会被写入阻塞
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    media_type TEXT,
+    mime TEXT,
+    account TEXT,
+    mode TEXT,
+    duration INTEGER,
+    bitrate INTEGER,
+    origin TEXT,
+    chat_id INTEGER,
+    message_id INTEGER,
+    downloaded_at REAL NOT NULL,
+    rendition TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_media_path ON media (path);
+CREATE INDEX IF NOT EXISTS idx_media_source_account ON media (source, account, media_type);
+CREATE INDEX IF NOT EXISTS idx_media_type ON media (media_type);
+CREATE INDEX IF NOT EXISTS idx_media_downloaded_at ON media (downloaded_at);
+CREATE INDEX IF NOT EXISTS idx_media_chat ON media (chat_id, message_id);
+"""
+
+
+@dataclass(slots=True)
+class CatalogEntry:
+    # 与缓存相同的 key，例如 x-123、t-456
+    key: str
+    # twitter / telegram
+    source: str
+    path: str
+    size: int = 0
+    media_type: Optional[str] = None
+    mime: Optional[str] = None
+    # twitter 的账号与时间线
+    account: Optional[str] = None
+    mode: Optional[str] = None
+    # 视频的时长（毫秒）与码率
+    duration: Optional[int] = None
+    bitrate: Optional[int] = None
+    # 媒体的来源地址，twitter 为媒体 url，telegram 为消息链接
+    origin: Optional[str] = None
+    # telegram 消息所在的会话与消息 id
+    chat_id: Optional[int] = None
+    message_id: Optional[int] = None
+    downloaded_at: float = field(default_factory=time.time)
+    # 下载的图片版本，例如 orig、large.webp
+    rendition: Optional[str] = None
+
+
+_COLUMNS = [f.name for f in fields(CatalogEntry)]
+
+# 建表之后增加的列
+_ADDED_COLUMNS = {"rendition": "TEXT"}
+
+
+class MediaCatalog:
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._add_missing_columns()
+            self._conn.commit()
+
+    def _add_missing_columns(self) -> None:
+        # 旧版本创建的数据库缺少后来增加的列
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(media)")}
+        for name, column in _ADDED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE media ADD COLUMN {name} {column}")
+
+    def record(self, entry: CatalogEntry) -> None:
+        self.record_many([entry])
+
+    def record_many(self, entries: list[CatalogEntry], replace: bool = True) -> int:
+        """同一个 key 再次下载时覆盖原来的记录，replace 为 False 时保留已有的记录，返回写入的数量"""
+        sql = (f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO media ({', '.join(_COLUMNS)}) "
+               f"VALUES ({', '.join('?' for _ in _COLUMNS)})")
+        rows = [tuple(getattr(entry, name) for name in _COLUMNS) for entry in entries]
+        with self._lock:
+            cursor = self._conn.executemany(sql, rows)
+            self._conn.commit()
+        return cursor.rowcount
+
+    def update_paths(self, moves: list[tuple[str, str]]) -> None:
+        """文件移动后批量修改路径，moves 为 (原路径, 新路径)"""
+        with self._lock:
+            self._conn.executemany("UPDATE media SET path = ? WHERE path = ?", [(new, old) for old, new in moves])
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM media WHERE key = ?", (key,)).fetchone()
+        return _to_entry(row) if row else None
+
+    def find_by_path(self, path: str) -> Optional[CatalogEntry]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM media WHERE path = ?", (path,)).fetchone()
+        return _to_entry(row) if row else None
+
+    def find(
+            self,
+            source: Optional[str] = None,
+            account: Optional[str] = None,
+            media_type: Optional[str] = None,
+            chat_id: Optional[int] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+            limit: Optional[int] = 100,
+    ) -> list[CatalogEntry]:
+        """按条件查询，结果按下载时间倒序"""
+        conditions = {
+            "source = ?": source,
+            "account = ?": account,
+            "media_type = ?": media_type,
+            "chat_id = ?": chat_id,
+            "downloaded_at >= ?": since,
+            "downloaded_at < ?": until,
+        }
+        where = [condition for condition, value in conditions.items() if value is not None]
+        params: list[Any] = [value for value in conditions.values() if value is not None]
+
+        sql = "SELECT * FROM media"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY downloaded_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_to_entry(row) for row in rows]
+
+    def sizes(self, source: Optional[str] = None) -> dict[str, int]:
+        """所有记录的路径与文件大小，用于和磁盘上的文件批量核对"""
+        sql = "SELECT path, size FROM media" + (" WHERE source = ?" if source else "")
+        with self._lock:
+            rows = self._conn.execute(sql, (source,) if source else ()).fetchall()
+        return {row["path"]: row["size"] for row in rows}
+
+    def summary(self) -> list[dict[str, Any]]:
+        """按来源、账号与类型统计文件数量与大小"""
+        sql = ("SELECT source, account, media_type, COUNT(*) AS count, SUM(size) AS size FROM media "
+               "GROUP BY source, account, media_type ORDER BY source, account, media_type")
+        with self._lock:
+            rows = self._conn.execute(sql).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _to_entry(row: sqlite3.Row) -> CatalogEntry:
+    return CatalogEntry(**{name: row[name] for name in _COLUMNS})
+
+
+def entry_to_dict(entry: CatalogEntry) -> dict[str, Any]:
+    return asdict(entry)
+
+
+__all__ = ["CatalogEntry", "MediaCatalog", "entry_to_dict"]
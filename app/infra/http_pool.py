@@ -0,0 +1,318 @@
+import time
+import socket
+import requests
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 下载使用的 HTTP 连接池
+# - requests 默认每个 host 只保留 10 个连接，下载线程更多时，用完的连接放不回池子会被关闭，下一次请求重新握手
+# - 这里按下载线程数设置每个 host 的连接数，并开启 TCP keep-alive，空闲的连接不会被中间设备断开
+# - 可以缓存 DNS 解析结果，启动时可以预先建立到 CDN 的连接
+# - 统计每个 host 的请求数、新建连接数（即 TCP/TLS 握手次数）与连接池满时丢弃的连接数
+
+# CDN 的 host，预热时使用
+DEFAULT_PREWARM_HOSTS = ("pbs.twimg.com", "video.twimg.com")
+
+
+@dataclass
+class TransportSettings:
+    # 每个 host 的连接数，0 表示与下载线程数相同
+    pool_size: int = 0
+    # DNS 解析结果的缓存时间（秒），0 表示不缓存
+    dns_cache_ttl: float = 300.0
+    # 启动时是否预先建立连接
+    prewarm: bool = True
+    prewarm_hosts: list[str] = field(default_factory=lambda: list(DEFAULT_PREWARM_HOSTS))
+    # TCP keep-alive：空闲多少秒后开始探测，探测的间隔与次数
+    keepalive_idle: int = 60
+    keepalive_interval: int = 15
+    keepalive_count: int = 4
+
+    @staticmethod
+    def parse(data: Optional[dict]) -> "TransportSettings":
+        data = data or {}
+        default = TransportSettings()
+        hosts = data.get("prewarm_hosts", None)
+        if isinstance(hosts, str):
+            hosts = [hosts]
+        return TransportSettings(
+            pool_size=max(0, int(data.get("pool_size", default.pool_size))),
+            dns_cache_ttl=max(0.0, float(data.get("dns_cache_ttl", default.dns_cache_ttl))),
+            prewarm=bool(data.get("prewarm", default.prewarm)),
+            prewarm_hosts=[str(host).strip() for host in hosts] if hosts else default.prewarm_hosts,
+            keepalive_idle=int(data.get("keepalive_idle", default.keepalive_idle)),
+            keepalive_interval=int(data.get("keepalive_interval", default.keepalive_interval)),
+            keepalive_count=int(data.get("keepalive_count", default.keepalive_count)),
+        )
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    # 建立的连接数，每个连接一次 TCP（与 TLS）握手
+    connections: int = 0
+    # 连接池已满，用完后被关闭的连接数，持续增长说明连接池太小
+    discarded: int = 0
+
+    @property
+    def handshake_rate(self) -> float:
+        """每个请求的握手次数，连接都被复用时接近 0"""
+        return self.connections / self.requests if self.requests else 0.0
+
+
+class TransportMetrics:
+    def __init__(self):
+        self._lock = Lock()
+        self._hosts: dict[str, HostMetrics] = {}
+
+    def add(self, host: str, requests: int = 0, connections: int = 0, discarded: int = 0) -> None:
+        with self._lock:
+            metrics = self._hosts.get(host)
+            if metrics is None:
+                metrics = self._hosts[host] = HostMetrics()
+            metrics.requests += requests
+            metrics.connections += connections
+            metrics.discarded += discarded
+
+    def snapshot(self) -> dict[str, HostMetrics]:
+        with self._lock:
+            return {host: HostMetrics(**asdict(metrics)) for host, metrics in self._hosts.items()}
+
+    def total(self) -> HostMetrics:
+        total = HostMetrics()
+        for metrics in self.snapshot().values():
+            total.requests += metrics.requests
+            total.connections += metrics.connections
+            total.discarded += metrics.discarded
+        return total
+
+
+class DNSCache:
+    """
+    按 (host, port) 缓存解析出的全部地址
+    - 连接时按顺序尝试每个地址，与 urllib3 不使用缓存时的行为相同
+    - 连接失败的地址移到最后，之后的连接先尝试其他地址；全部失败时清除缓存，下次重新解析
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: dict[tuple[str, int], tuple[list[str], float]] = {}
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[1] > now:
+                return list(entry[0])
+
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        # 同一个地址可能以不同的协议出现多次，保留第一次出现的顺序
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (addresses, now + self.ttl)
+        return list(addresses)
+
+    def failed(self, host: str, port: int, address: str) -> None:
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and address in entry[0]:
+                addresses = [item for item in entry[0] if item != address] + [address]
+                self._entries[(host, port)] = (addresses, entry[1])
+
+    def invalidate(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+def _pool_classes(metrics: TransportMetrics, dns: Optional[DNSCache]) -> dict[str, type]:
+    # 连接与连接池的实例由 urllib3 创建，不能传入额外的参数，统计与 DNS 缓存由闭包带入，每个 transport 一组类
+    class MeteredConnectionMixin:
+        # 这次连接使用的缓存地址，只在 _new_conn 中使用
+        _dial_address: Optional[str] = None
+
+        def connect(self):
+            # host 由 urllib3 的 _dns_host 提供，不能修改：TLS 的 SNI 与证书校验都使用 host
+            host, port = self.host, self.port
+            if dns is None or self.proxy is not None:
+                super().connect()
+                metrics.add(host, connections=1)
+                return
+
+            addresses = dns.resolve(host, port)
+            for index, address in enumerate(addresses):
+                self._dial_address = address
+                try:
+                    super().connect()
+                    break
+                except ConnectTimeoutError:
+                    # 建立 TCP 连接失败（包括超时）时尝试下一个地址，TLS 等之后的错误直接抛出
+                    dns.failed(host, port, address)
+                    if index == len(addresses) - 1:
+                        dns.invalidate(host, port)
+                        raise
+                finally:
+                    self._dial_address = None
+            metrics.add(host, connections=1)
+
+        def _new_conn(self):
+            if self._dial_address is None:
+                return super()._new_conn()
+            # 只在建立 TCP 连接时使用缓存的地址，之后恢复为原来的 host
+            host = self._dns_host
+            self._dns_host = self._dial_address
+            try:
+                return super()._new_conn()
+            finally:
+                self._dns_host = host
+
+    class MeteredPoolMixin:
+        def urlopen(self, method, url, *args, **kwargs):
+            metrics.add(self.host, requests=1)
+            return super().urlopen(method, url, *args, **kwargs)
+
+        def _put_conn(self, conn):
+            if conn is not None and self.pool is not None and self.pool.full():
+                metrics.add(self.host, discarded=1)
+            super()._put_conn(conn)
+
+        def prewarm(self, count: int, executor: ThreadPoolExecutor, timeout: float) -> int:
+            """预先建立 count 个连接放入连接池，返回成功建立的数量"""
+            conns = [self._get_conn() for _ in range(min(count, self.pool.qsize()))]
+            idle = [conn for conn in conns if not conn.is_connected]
+            for conn in idle:
+                conn.timeout = timeout
+            futures = [executor.submit(conn.connect) for conn in idle]
+            connected = 0
+            for conn, future in zip(idle, futures):
+                try:
+                    future.result()
+                    connected += 1
+                except Exception as e:
+                    logger.debug("预热连接失败: %s, %s", self.host, e)
+                    conn.close()
+            for conn in conns:
+                # 之后的请求会按各自的超时设置连接的超时
+                self._put_conn(conn)
+            return connected
+
+    class Connection(MeteredConnectionMixin, HTTPConnection):
+        pass
+
+    class SecureConnection(MeteredConnectionMixin, HTTPSConnection):
+        pass
+
+    class Pool(MeteredPoolMixin, HTTPConnectionPool):
+        ConnectionCls = Connection
+
+    class SecurePool(MeteredPoolMixin, HTTPSConnectionPool):
+        ConnectionCls = SecureConnection
+
+    return {"http": Pool, "https": SecurePool}
+
+
+def _socket_options(settings: TransportSettings) -> list[tuple[int, int, int]]:
+    options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # 不同平台支持的选项不同
+    for name, value in (("TCP_KEEPIDLE", settings.keepalive_idle),
+                        ("TCP_KEEPINTVL", settings.keepalive_interval),
+                        ("TCP_KEEPCNT", settings.keepalive_count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, pool_size: int, metrics: TransportMetrics, dns: Optional[DNSCache],
+                 socket_options: list[tuple[int, int, int]]):
+        self._pool_classes = _pool_classes(metrics, dns)
+        self._socket_options = socket_options
+        # 连接池满时不阻塞，超出的连接用完后关闭并计入 discarded
+        super().__init__(pool_connections=16, pool_maxsize=pool_size, pool_block=False)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, socket_options=self._socket_options, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+
+class PooledTransport:
+    """多个下载器共用的 requests.Session，连接池按下载线程数设置"""
+
+    def __init__(self, settings: TransportSettings, workers: int):
+        self.settings = settings
+        self.pool_size = settings.pool_size or workers
+        self.metrics = TransportMetrics()
+        dns = DNSCache(settings.dns_cache_ttl) if settings.dns_cache_ttl > 0 else None
+        self.adapter = PooledAdapter(self.pool_size, self.metrics, dns, _socket_options(settings))
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def prewarm(self, urls: Optional[list[str]] = None, count: Optional[int] = None, timeout: float = 5.0) -> int:
+        """
+        预先建立到 CDN 的连接，返回建立的连接数
+        - urls 默认使用配置中的 prewarm_hosts（https），count 默认是连接池大小
+        - 只建立连接，不发送请求；失败时只记录日志，下载时会重新连接
+        """
+        urls = urls if urls is not None else [f"https://{host}/" for host in self.settings.prewarm_hosts]
+        count = count or self.pool_size
+        if not urls:
+            return 0
+
+        started = time.monotonic()
+        connected = 0
+        with ThreadPoolExecutor(max_workers=count * len(urls), thread_name_prefix="http-prewarm") as executor:
+            for url in urls:
+                try:
+                    connected += self._pool_for(url).prewarm(count, executor, timeout)
+                except Exception as e:
+                    logger.warning("预热连接失败: %s, %s", urlsplit(url).netloc, e)
+        logger.info("已预先建立 %s 个连接，耗时 %.2f秒", connected, time.monotonic() - started)
+        return connected
+
+    def _pool_for(self, url: str):
+        # 与请求时使用同一个连接池：连接池的 key 包含证书、代理等设置，按 session 的方式合并环境变量中的设置
+        request = requests.Request("GET", url).prepare()
+        options = self.session.merge_environment_settings(url, {}, None, None, None)
+        if hasattr(self.adapter, "get_connection_with_tls_context"):
+            return self.adapter.get_connection_with_tls_context(
+                request, verify=options["verify"], proxies=options["proxies"], cert=options["cert"]
+            )
+        return self.adapter.get_connection(url, proxies=options["proxies"])
+
+    def report(self) -> list[str]:
+        """每个 host 一行连接统计"""
+        lines = []
+        for host, metrics in sorted(self.metrics.snapshot().items()):
+            lines.append(
+                f"{host}: 请求 {metrics.requests}，新建连接 {metrics.connections}"
+                f"（每个请求 {metrics.handshake_rate:.2f} 次握手），连接池满丢弃 {metrics.discarded}"
+            )
+        return lines
+
+    def to_dict(self) -> dict[str, Any]:
+        return {host: {**asdict(metrics), "handshake_rate": metrics.handshake_rate}
+                for host, metrics in self.metrics.snapshot().items()}
+
+
+__all__ = [
+    "DEFAULT_PREWARM_HOSTS",
+    "TransportSettings",
+    "HostMetrics",
+    "TransportMetrics",
+    "DNSCache",
+    "PooledAdapter",
+    "PooledTransport",
+]
@@ -1,5 +1,167 @@
+import os
+import atexit
 import logging
-from rich.logging import RichHandler
+import logging.handlers
+from queue import SimpleQueue
+from threading import Lock
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from app.infra.yml import parse_from
+from app.infra.path import resolve_path
+
+# 日志通过队列交给后台线程写入
+# - 业务线程（包括 asyncio 的事件循环）只把日志记录放入队列，不做任何 I/O
+# - 处理器（控制台、文件）在第一次写日志时才创建，导入模块没有副作用
+# - 日志文件按大小或时间轮转
+# - 可以在 configure.yml 的 logging 中按模块配置日志级别
+
+HandlerFactory = Callable[[], logging.Handler]
+
+# 可以原样交给后台线程的参数类型，之后不会被修改
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+@dataclass
+class LoggingSettings:
+    # app 日志的默认级别
+    level: str = "INFO"
+
+    # 日志文件按大小轮转的阈值（字节），0 表示不轮转
+    max_bytes: int = 10 * 1024 * 1024
+
+    # 保留的历史日志文件数量
+    backup_count: int = 5
+
+    # 按时间轮转（可选），取值同 TimedRotatingFileHandler 的 when，例如 midnight
+    # - 设置后忽略 max_bytes
+    when: Optional[str] = None
+
+    # 各模块的日志级别，key 为 logger 的名称，例如 downloadService: INFO
+    levels: dict[str, str] = field(default_factory=dict)
+
+    @staticmethod
+    def create() -> "LoggingSettings":
+        path = resolve_path("./configure.yml")
+        data = (parse_from(path=path) or {}) if os.path.exists(path) else {}
+        section = data.get("logging", None) or {}
+        return LoggingSettings(
+            level=str(section.get("level", "INFO")).upper(),
+            max_bytes=int(section.get("max_bytes", 10 * 1024 * 1024)),
+            backup_count=int(section.get("backup_count", 5)),
+            when=section.get("when", None),
+            levels={name: str(level).upper() for name, level in (section.get("levels", None) or {}).items()},
+        )
+
+
+_settings: Optional[LoggingSettings] = None
+_settings_lock = Lock()
+
+# 已经启动的后台线程，退出时逐个停止以写完队列中的日志
+_listeners: list[logging.handlers.QueueListener] = []
+_listeners_lock = Lock()
+
+
+def logging_settings() -> LoggingSettings:
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = LoggingSettings.create()
+    return _settings
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """第一次写日志时才创建真正的处理器并启动后台线程"""
+
+    def __init__(self, factories: list[HandlerFactory]):
+        super().__init__(SimpleQueue())
+        self._factories = factories
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._start_lock = Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._listener is None:
+            self._start()
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 默认的 prepare 会在调用方线程执行 format，并把 exc_info 转换为字符串
+        # 这里不格式化，由后台线程中的处理器格式化，Rich 处理器也能拿到 exc_info 输出完整的 traceback
+        # 参数可能在之后被调用方修改，只有不可变的参数原样传递，其他情况先在这里拼接消息
+        args = record.args
+        if not isinstance(record.msg, str) or (
+                args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args))
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            handlers = [factory() for factory in self._factories]
+            listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            with _listeners_lock:
+                if not _listeners:
+                    atexit.register(stop_logging)
+                _listeners.append(listener)
+            self._listener = listener
+
+
+def attach_handlers(logger: logging.Logger, *factories: HandlerFactory, level: int = logging.DEBUG) -> None:
+    """给 logger 挂上队列处理器，factories 在后台线程启动前调用"""
+    logger.addHandler(LazyQueueHandler(list(factories)))
+    # 已经读取过配置时使用配置的级别，否则等 configure_logging 时再覆盖
+    configured = _settings.levels.get(logger.name) if _settings is not None else None
+    logger.setLevel(configured or level)
+
+
+# 创建写入日志文件的处理器，第一次写入时才打开文件
+def create_file_handler(directory: str, filename: str) -> logging.FileHandler:
+    os.makedirs(directory, exist_ok=True)
+    settings = logging_settings()
+    path = os.path.join(directory, filename)
+    if settings.when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=settings.when, backupCount=settings.backup_count, encoding="utf-8", delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, mode='a', maxBytes=settings.max_bytes, backupCount=settings.backup_count, encoding="utf-8", delay=True
+    )
+
+
+def file_handler_factory(directory: str, filename: str, level: int = logging.DEBUG,
+                         formatter: Optional[logging.Formatter] = None) -> HandlerFactory:
+    def factory() -> logging.Handler:
+        handler = create_file_handler(directory, filename)
+        handler.setLevel(level)
+        if formatter is not None:
+            handler.setFormatter(formatter)
+        return handler
+
+    return factory
+
+
+def configure_logging() -> LoggingSettings:
+    """入口脚本启动时调用，读取配置并设置各模块的日志级别"""
+    settings = logging_settings()
+    set_level(settings.level)
+    for name, level in settings.levels.items():
+        logging.getLogger(name).setLevel(level)
+    return settings
+
+
+def stop_logging() -> None:
+    """停止后台线程，写完队列中剩余的日志"""
+    with _listeners_lock:
+        listeners = list(_listeners)
+        _listeners.clear()
+    for listener in listeners:
+        listener.stop()
+
 
 # 默认日志级别
 _default_level = logging.INFO
@@ -16,11 +178,8 @@ _console_handler.setLevel(_default_level)
 _formatter = logging.Formatter('%(name)-15s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 _console_handler.setFormatter(_formatter)
 
-# 设置默认日志级别
-_logger.setLevel(_default_level)
-
-# 添加处理器到日志记录器
-_logger.addHandler(_console_handler)
+# 添加处理器到日志记录器，并设置默认日志级别
+attach_handlers(_logger, lambda: _console_handler, level=_default_level)
 
 # 禁用传播，避免重复日志
 _logger.propagate = False
@@ -1,8 +1,17 @@
+import os
 import abc
+import json
+import atexit
+import sqlite3
 import pickledb
 
+from threading import Event, Lock, Thread
 from typing import Any, Optional, Callable, TypeVar, Generic
 
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
 T = TypeVar("T")
 
 
@@ -25,16 +34,47 @@ class BasePersistentStorage:
         """Set the value associated with the given key."""
         pass
 
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add amount to the integer stored at key and return the new value."""
+        # 默认实现不是原子的，子类应该覆盖
+        value = (self.get(key) or 0) + amount
+        self.set(key, value)
+        return value
+
+    def flush(self):
+        """Write pending changes to disk."""
+        pass
+
+    def close(self):
+        self.flush()
+
+
+def _cache_attr(key: str) -> str:
+    return f"_cache_{key}"
+
 
 # 基础的持久化类
 class BasePersistent:
     def __init__(self, store: BasePersistentStorage):
         self._store = store
 
+    def _incr(self, key: str, amount: int = 1) -> int:
+        """原子地累加 persisted 的整数属性，同时更新属性的缓存"""
+        value = self._store.incr(key, amount)
+        if hasattr(self, _cache_attr(key)):
+            setattr(self, _cache_attr(key), value)
+        return value
+
+    def flush(self):
+        self._store.flush()
+
+    def close(self):
+        self._store.close()
+
 
 # 内部实现了缓存，但是使用时需要确保 persisted 必定是全局唯一的修改入口，否则缓存可能会不一致
 def persisted(key: str, default: T, *, use_cache: bool = True, serializer: Optional[Serializer[T]] = None) -> property:
-    attr_name = f"_cache_{key}"
+    attr_name = _cache_attr(key)
 
     def getter(self):
         if use_cache:
@@ -75,7 +115,7 @@ def persisted(key: str, default: T, *, use_cache: bool = True, serializer: Optio
     return property(getter, setter)
 
 
-# 默认的存储基于 pickle
+# 基于 pickle 的存储，每次写入都会重写整个文件，只适合很少修改的数据
 class DefaultStorage(BasePersistentStorage):
     def __init__(self, storage: pickledb.PickleDB):
         # pickle 是线程安全的
@@ -90,4 +130,171 @@ class DefaultStorage(BasePersistentStorage):
         self._store.dump()
 
 
-__all__ = ["persisted", "DefaultStorage", "BasePersistent", "BasePersistentStorage", "Serializer"]
+# 延迟写入的文件存储
+# - 读写都在内存中完成，修改后由后台线程每隔 flush_interval 秒写入一次，没有修改时不写入
+# - 写入临时文件后原子替换，进程中途退出不会留下写了一半的文件
+# - 进程正常退出时写入剩余的修改；异常退出最多丢失最近 flush_interval 秒的修改
+# - 文件格式是 JSON 对象，与 pickledb 的文件相同，可以直接读取原来的 state.txt
+class WriteBehindStorage(BasePersistentStorage):
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        # 串行化写文件，写文件期间不阻塞读写
+        self._flush_lock = Lock()
+        self._data: dict[str, Any] = self._load()
+        # 修改计数，与最后写入文件时的计数相同说明没有需要写入的修改
+        self._version = 0
+        self._flushed_version = 0
+        self._closed = Event()
+        self._thread = Thread(target=self._run, name="persistent-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _load(self) -> dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning("读取持久化文件失败，使用空状态: %s, %s", self.path, e)
+            return {}
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._version += 1
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = (self._data.get(key) or 0) + amount
+            self._data[key] = value
+            self._version += 1
+            return value
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._version == self._flushed_version:
+                    return
+                version = self._version
+                content = json.dumps(self._data, ensure_ascii=False)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp = f"{self.path}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+            self._flushed_version = version
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("写入持久化文件失败: %s, %s", self.path, e)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+
+# 基于 SQLite 的存储
+# - 每个 key 一行，值以 JSON 保存；修改只写入对应的行，代价与数据量无关
+# - 累加在一条 SQL 中完成，多个进程共用同一个文件时也不会丢失计数
+class SqliteStorage(BasePersistentStorage):
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value "
+                "RETURNING value",
+                (key, str(amount)),
+            ).fetchone()
+            self._conn.commit()
+        return int(row[0])
+
+    def import_json(self, path: str) -> int:
+        """数据库为空时导入 JSON 文件（state.txt）中的数据，返回导入的 key 数量"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("读取持久化文件失败，不导入: %s, %s", path, e)
+            return 0
+        if not isinstance(data, dict) or not data:
+            return 0
+
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM kv LIMIT 1").fetchone() is not None:
+                return 0
+            self._conn.executemany(
+                "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT (key) DO NOTHING",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in data.items()],
+            )
+            self._conn.commit()
+        logger.info("已从 %s 导入 %s 个 key 至 %s", path, len(data), self.path)
+        return len(data)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_storage(path: str, backend: str = "file", flush_interval: float = 5.0) -> BasePersistentStorage:
+    """按名称创建存储：file 为延迟写入的 JSON 文件，sqlite 为 SQLite 数据库"""
+    if backend == "file":
+        return WriteBehindStorage(path, flush_interval=flush_interval)
+    if backend == "sqlite":
+        return SqliteStorage(path)
+    raise ValueError(f"不支持的存储类型 {backend}，可选值: file, sqlite")
+
+
+__all__ = [
+    "persisted",
+    "DefaultStorage",
+    "WriteBehindStorage",
+    "SqliteStorage",
+    "open_storage",
+    "BasePersistent",
+    "BasePersistentStorage",
+    "Serializer",
+]
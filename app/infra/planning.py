@@ -0,0 +1,173 @@
+import os
+import glob
+import json
+import time
+import shutil
+from dataclasses import dataclass, field, asdict
+from typing import Any, Optional
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 下载计划（dry-run）的汇总
+# - 只获取元数据（时间线、消息、HEAD 请求），不下载文件
+# - 预计耗时按上一次运行导出的 trace 中 transfer 阶段的总吞吐量估算，也可以手动指定带宽
+# - 大小未知的媒体按已知媒体的平均大小估算
+
+
+@dataclass
+class TypeTotal:
+    count: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class PlanSummary:
+    source: str
+    # 需要下载的媒体数量与大小
+    items: int = 0
+    bytes: int = 0
+    # 已缓存，运行时会跳过
+    cache_hits: int = 0
+    # 同一次运行中重复出现的媒体（例如同时出现在点赞与发布的媒体中），只会下载一次
+    duplicates: int = 0
+    # 没有获取到大小的媒体
+    unknown_size: int = 0
+    # 不支持或无法解析，运行时会失败
+    skipped: int = 0
+    # 被下载前的过滤规则排除
+    filtered: int = 0
+    by_type: dict[str, TypeTotal] = field(default_factory=dict)
+
+    def add(self, media_type: str, size: Optional[int]) -> None:
+        self.items += 1
+        total = self.by_type.setdefault(media_type, TypeTotal())
+        total.count += 1
+        if size:
+            self.bytes += size
+            total.bytes += size
+        else:
+            self.unknown_size += 1
+
+    @property
+    def estimated_bytes(self) -> int:
+        known = self.items - self.unknown_size
+        if not known:
+            return self.bytes
+        return self.bytes + self.bytes // known * self.unknown_size
+
+    def estimated_seconds(self, bandwidth: Optional[float]) -> Optional[float]:
+        if not bandwidth:
+            return None
+        return self.estimated_bytes / bandwidth
+
+    def to_dict(self, bandwidth: Optional[float] = None, free_bytes: Optional[int] = None) -> dict[str, Any]:
+        return {
+            **asdict(self),
+            "estimated_bytes": self.estimated_bytes,
+            "bandwidth": bandwidth,
+            "estimated_seconds": self.estimated_seconds(bandwidth),
+            "free_bytes": free_bytes,
+        }
+
+
+def measured_bandwidth(outputs: str, prefix: str) -> Optional[float]:
+    """
+    最近一次运行的下载带宽（字节/秒），没有 trace 时返回 None
+    - 读取 outputs 目录中最新的 trace-<prefix>-*.jsonl
+    - 按 transfer 阶段的总字节数除以第一个开始到最后一个结束的时间，包含了并发的效果
+    """
+    files = sorted(glob.glob(os.path.join(outputs, f"trace-{prefix}-*.jsonl")))
+    if not files:
+        return None
+
+    total = 0
+    start: Optional[float] = None
+    end: Optional[float] = None
+    with open(files[-1], "r", encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if span.get("name") != "transfer" or span.get("error") or span.get("end") is None:
+                continue
+            total += span.get("attributes", {}).get("bytes", 0) or 0
+            start = span["start"] if start is None else min(start, span["start"])
+            end = span["end"] if end is None else max(end, span["end"])
+
+    if not total or start is None or end is None or end <= start:
+        return None
+    return total / (end - start)
+
+
+def free_space(directory: str) -> Optional[int]:
+    # 存储目录可能还没有创建，向上找到存在的目录
+    path = os.path.abspath(directory)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    return shutil.disk_usage(path).free
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _format_duration(seconds: float) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def format_plan(summary: PlanSummary, bandwidth: Optional[float], free_bytes: Optional[int]) -> str:
+    lines = [
+        f"需要下载: {summary.items} 个，{_format_bytes(summary.bytes)}"
+        + (f"（{summary.unknown_size} 个大小未知，估算共 {_format_bytes(summary.estimated_bytes)}）"
+           if summary.unknown_size else ""),
+        f"已缓存跳过: {summary.cache_hits}，重复: {summary.duplicates}，过滤: {summary.filtered}，"
+        f"无法下载: {summary.skipped}",
+    ]
+    for media_type, total in sorted(summary.by_type.items()):
+        lines.append(f"  {media_type}: {total.count} 个，{_format_bytes(total.bytes)}")
+
+    seconds = summary.estimated_seconds(bandwidth)
+    if seconds is None:
+        lines.append("预计耗时: 未知（没有上一次运行的 trace，可以用 --bandwidth 指定带宽）")
+    else:
+        lines.append(f"预计耗时: {_format_duration(seconds)}（带宽 {_format_bytes(bandwidth)}/s）")
+
+    if free_bytes is not None:
+        enough = free_bytes >= summary.estimated_bytes
+        lines.append(f"磁盘剩余空间: {_format_bytes(free_bytes)}" + ("" if enough else "，空间不足"))
+    return "\n".join(lines)
+
+
+def report_plan(summary: PlanSummary, outputs: str, storage_directory: str, trace_prefix: str,
+                bandwidth: Optional[float] = None) -> str:
+    """输出计划并写入 outputs/plan-<source>-<时间>.json，返回写入的路径"""
+    if bandwidth is None:
+        bandwidth = measured_bandwidth(outputs, trace_prefix)
+    free_bytes = free_space(storage_directory)
+    logger.info("下载计划:\n%s", format_plan(summary, bandwidth, free_bytes))
+
+    path = os.path.join(outputs, f"plan-{summary.source}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(outputs, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary.to_dict(bandwidth, free_bytes), f, ensure_ascii=False, indent=2)
+    logger.info("计划已写入 %s", path)
+    return path
+
+
+__all__ = [
+    "TypeTotal",
+    "PlanSummary",
+    "measured_bandwidth",
+    "free_space",
+    "format_plan",
+    "report_plan",
+]
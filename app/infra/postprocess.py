@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import struct
+import functools
+from threading import Lock, BoundedSemaphore
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.infra.yml import parse_from
+from app.infra.path import resolve_path
+from app.infra.logger import getLogger
+
+try:
+    # Pillow 是可选依赖，安装后才能生成缩略图
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = getLogger(__name__)
+
+# 下载完成后的文件处理（哈希、媒体信息、缩略图等）
+# - 下载线程只把文件路径放入有界队列，处理在独立的进程池中进行，CPU 密集的工作可以用满多核
+# - 队列满时提交会等待（背压），避免下载速度远快于处理速度时积压无限增长
+# - 处理器是模块级函数 (path) -> dict，需要能被 pickle 传给子进程
+# - 处理结果以 JSON Lines 追加写入结果文件
+
+Processor = Callable[[str], dict[str, Any]]
+
+_READ_SIZE = 1024 * 1024
+
+
+def sha256(path: str) -> dict[str, Any]:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_READ_SIZE):
+            digest.update(chunk)
+    return {"sha256": digest.hexdigest()}
+
+
+def probe(path: str) -> dict[str, Any]:
+    """只读取文件头，识别格式与图片尺寸"""
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+
+    result: dict[str, Any] = {"size": os.path.getsize(path), "format": None}
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+        width, height = struct.unpack(">II", head[16:24])
+        result.update(format="png", width=width, height=height)
+    elif head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        width, height = struct.unpack("<HH", head[6:10])
+        result.update(format="gif", width=width, height=height)
+    elif head.startswith(b"\xff\xd8"):
+        result.update(format="jpeg", **_jpeg_size(head))
+    elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        result.update(format="webp")
+    elif head[4:8] == b"ftyp":
+        result.update(format="mp4", brand=head[8:12].decode("ascii", errors="replace").strip())
+    return result
+
+
+def _jpeg_size(head: bytes) -> dict[str, int]:
+    # 在 SOF 段中读取尺寸，文件头不够长时放弃
+    offset = 2
+    while offset + 9 < len(head):
+        if head[offset] != 0xFF:
+            break
+        marker = head[offset + 1]
+        length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return {"width": width, "height": height}
+        offset += 2 + length
+    return {}
+
+
+def thumbnail(path: str, directory: str, size: int = 320) -> dict[str, Any]:
+    """图片生成 JPEG 缩略图，其他文件跳过"""
+    try:
+        with Image.open(path) as image:
+            image.thumbnail((size, size))
+            os.makedirs(directory, exist_ok=True)
+            target = os.path.join(directory, f"{os.path.splitext(os.path.basename(path))[0]}.jpg")
+            image.convert("RGB").save(target, "JPEG", quality=80)
+    except Image.UnidentifiedImageError:
+        return {}
+    return {"thumbnail": target}
+
+
+def _available_processors() -> dict[str, Processor]:
+    processors: dict[str, Processor] = {"sha256": sha256, "probe": probe}
+    if Image is not None:
+        processors["thumbnail"] = functools.partial(thumbnail, directory=resolve_path("./outputs/thumbnails"))
+    return processors
+
+
+def _run_processors(processors: list[tuple[str, Processor]], path: str) -> tuple[dict, dict, dict]:
+    # 在子进程中执行，单个处理器失败不影响其他处理器
+    results: dict[str, Any] = {}
+    durations: dict[str, float] = {}
+    errors: dict[str, str] = {}
+    for name, processor in processors:
+        started = time.perf_counter()
+        try:
+            results.update(processor(path))
+        except Exception as e:
+            errors[name] = f"{type(e).__name__}: {e}"
+        durations[name] = time.perf_counter() - started
+    return results, durations, errors
+
+
+@dataclass
+class PostProcessSettings:
+    # 启用的处理器，按顺序执行，为空时不启用后处理
+    # - 可选: sha256, probe, thumbnail（需要安装 Pillow）
+    processors: list[str] = field(default_factory=list)
+
+    # 进程数，默认为 CPU 核数
+    workers: Optional[int] = None
+
+    # 等待处理的文件数上限，超过后提交会等待
+    max_pending: int = 64
+
+    # 处理结果的输出文件（JSON Lines）
+    results_file: str = resolve_path("./outputs/postprocess.jsonl")
+
+    @staticmethod
+    def create() -> "PostProcessSettings":
+        path = resolve_path("./configure.yml")
+        data = (parse_from(path=path) or {}) if os.path.exists(path) else {}
+        section = data.get("postprocess", None) or {}
+        return PostProcessSettings(
+            processors=list(section.get("processors", None) or []),
+            workers=section.get("workers", None),
+            max_pending=max(int(section.get("max_pending", 64)), 1),
+            results_file=resolve_path(section.get("results_file", "./outputs/postprocess.jsonl")),
+        )
+
+
+@dataclass
+class ProcessorMetrics:
+    count: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "seconds": self.seconds,
+            "avg_seconds": self.seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class PostProcessor:
+    """
+    下载完成后的处理阶段
+    - submit 在线程中调用，队列满时阻塞；asyncio 中使用 submit_async，等待时不阻塞事件循环
+    - 处理结果在进程池的回调线程中写入结果文件并汇总各处理器的指标
+    """
+
+    def __init__(
+            self,
+            processors: list[tuple[str, Processor]],
+            workers: Optional[int] = None,
+            max_pending: int = 64,
+            results_file: Optional[str] = None,
+    ):
+        self.processors = processors
+        self.max_pending = max_pending
+        self.results_file = results_file
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._slots = BoundedSemaphore(max_pending)
+        self._lock = Lock()
+        self._output = None
+        self._metrics: dict[str, ProcessorMetrics] = {name: ProcessorMetrics() for name, _ in processors}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        # 因为队列已满而等待的总时间
+        self.blocked_seconds = 0.0
+
+    @staticmethod
+    def from_settings(settings: PostProcessSettings) -> Optional["PostProcessor"]:
+        available = _available_processors()
+        processors = []
+        for name in settings.processors:
+            if name in available:
+                processors.append((name, available[name]))
+            elif name == "thumbnail":
+                logger.warning("未安装 Pillow，跳过缩略图处理")
+            else:
+                logger.warning("未知的后处理器: %s", name)
+        if not processors:
+            return None
+        return PostProcessor(
+            processors, workers=settings.workers, max_pending=settings.max_pending, results_file=settings.results_file
+        )
+
+    @property
+    def pending(self) -> int:
+        return self.submitted - self.completed - self.failed
+
+    def submit(self, path: str, key: Optional[str] = None) -> None:
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            self._slots.acquire()
+            self._add_blocked(time.monotonic() - started)
+        self._dispatch(path, key)
+
+    async def submit_async(self, path: str, key: Optional[str] = None) -> None:
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            # 线程中的 acquire 无法取消：等待的任务被取消时，线程之后拿到的名额要还回去
+            acquire = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                acquire.add_done_callback(lambda _: self._slots.release())
+                raise
+            self._add_blocked(time.monotonic() - started)
+        self._dispatch(path, key)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": self.pending,
+                "blocked_seconds": self.blocked_seconds,
+                "processors": {name: metrics.to_dict() for name, metrics in self._metrics.items()},
+            }
+
+    def set_results_file(self, results_file: Optional[str]) -> None:
+        """更换结果文件，之后的处理结果写入新的文件"""
+        with self._lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+            self.results_file = results_file
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        with self._lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+
+    def _add_blocked(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def _dispatch(self, path: str, key: Optional[str]) -> None:
+        with self._lock:
+            self.submitted += 1
+        try:
+            future = self._executor.submit(_run_processors, self.processors, path)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self.failed += 1
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, path, key))
+
+    def _on_done(self, future: Future, path: str, key: Optional[str]) -> None:
+        self._slots.release()
+        try:
+            results, durations, errors = future.result()
+        except Exception as e:
+            # 进程池异常（例如子进程崩溃），整个文件记为失败
+            logger.error("后处理失败: %s, %s", path, e)
+            with self._lock:
+                self.failed += 1
+            return
+
+        for name, error in errors.items():
+            logger.warning("后处理器 %s 处理 %s 失败: %s", name, path, error)
+
+        with self._lock:
+            self.completed += 1
+            for name, seconds in durations.items():
+                metrics = self._metrics[name]
+                metrics.count += 1
+                metrics.seconds += seconds
+                metrics.max_seconds = max(metrics.max_seconds, seconds)
+                if name in errors:
+                    metrics.failures += 1
+            self._write({"path": path, "key": key, **results, **({"errors": errors} if errors else {})})
+
+    def _write(self, record: dict[str, Any]) -> None:
+        if self.results_file is None:
+            return
+        if self._output is None:
+            os.makedirs(os.path.dirname(self.results_file), exist_ok=True)
+            self._output = open(self.results_file, "a", encoding="utf-8")
+        self._output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._output.flush()
+
+
+_post_processor: Optional[PostProcessor] = None
+_post_processor_created = False
+_post_processor_lock = Lock()
+
+
+def post_processor() -> Optional[PostProcessor]:
+    """按 configure.yml 的 postprocess 配置创建，没有启用任何处理器时返回 None"""
+    global _post_processor, _post_processor_created
+    if not _post_processor_created:
+        with _post_processor_lock:
+            if not _post_processor_created:
+                _post_processor = PostProcessor.from_settings(PostProcessSettings.create())
+                _post_processor_created = True
+    return _post_processor
+
+
+def shutdown_post_processor() -> None:
+    """入口脚本退出前调用，等待剩余的文件处理完成"""
+    with _post_processor_lock:
+        pipeline = _post_processor
+    if pipeline is None:
+        return
+    if pipeline.pending:
+        logger.info("等待 %s 个文件后处理完成", pipeline.pending)
+    pipeline.close(wait=True)
+    metrics = pipeline.metrics()
+    logger.info(
+        "后处理完成: %s 个文件, 失败 %s, 队列等待 %.2f 秒",
+        metrics["completed"], metrics["failed"], metrics["blocked_seconds"],
+    )
+    for name, item in metrics["processors"].items():
+        logger.info("  %s: %s 次, 失败 %s, 平均 %.3f 秒", name, item["count"], item["failures"], item["avg_seconds"])
+
+
+__all__ = [
+    "Processor",
+    "PostProcessSettings",
+    "PostProcessor",
+    "post_processor",
+    "shutdown_post_processor",
+    "sha256",
+    "probe",
+    "thumbnail",
+]
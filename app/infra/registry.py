@@ -0,0 +1,54 @@
+from threading import RLock
+from typing import Any, Callable
+
+
+class LazyRegistry:
+    """
+    全局对象的注册表
+    - 注册时只保存工厂函数，第一次访问时才创建并缓存
+    - 工厂函数中可以访问注册表中的其他对象，所以使用可重入锁
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._instances: dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                factory = self._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"未注册的全局对象: {name}")
+                self._instances[name] = factory()
+            return self._instances[name]
+
+    def override(self, name: str, instance: Any) -> None:
+        """直接指定全局对象，基准测试用来替换写入真实数据的对象"""
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"未注册的全局对象: {name}")
+            self._instances[name] = instance
+
+    def created(self, name: str) -> bool:
+        return name in self._instances
+
+    def getattr(self, module: str, name: str) -> Any:
+        # 给模块的 __getattr__ 使用
+        if name in self:
+            return self.get(name)
+        raise AttributeError(f"module {module!r} has no attribute {name!r}")
+
+
+__all__ = ["LazyRegistry"]
@@ -116,7 +116,7 @@ class BracketedBarColumn(BarColumn):
         return result
 
 
-def create_download_progress():
+def create_download_progress(auto_refresh: bool = True):
     return Progress(
         CustomSpinnerColumn(),
         TextColumn("[progress.description]{task.description}", justify="left"),
@@ -126,6 +126,7 @@ def create_download_progress():
         DownloadColumn(),
         CustomTimeColumn(),
         transient=False,
+        auto_refresh=auto_refresh,
     )
 
 
@@ -0,0 +1,88 @@
+import asyncio
+from threading import Lock
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+# 合并同时进行的重复任务（single-flight）
+# - 同一个 key 同时只执行一次，之后到达的调用等待第一个调用的结果，成功与失败都共享
+# - 执行结束后立即移除，之后的调用重新执行（已下载的媒体由缓存判断）
+# - AsyncSingleFlight 中执行的一方被取消时，等待的一方不会收到 CancelledError，而是由其中一个重新执行
+# - SingleFlight 用于线程池，AsyncSingleFlight 用于事件循环，后者只能在同一个事件循环中使用
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self):
+        self._lock = Lock()
+        self._flights: dict[str, Future] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def run(self, key: str, fn: Callable[[], T]) -> tuple[T, bool]:
+        """返回 (结果, 是否共享了其他调用的结果)"""
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+
+class AsyncSingleFlight(Generic[T]):
+    def __init__(self):
+        self._flights: dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: str) -> bool:
+        """key 是否正在执行，之后的 run 会共享它的结果（中间没有 await 时）"""
+        return key in self._flights
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """返回 (结果, 是否共享了其他调用的结果)"""
+        while (future := self._flights.get(key)) is not None:
+            try:
+                # 等待的一方被取消时不影响正在执行的任务
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # 执行的一方被取消不代表等待的一方也被取消：重新执行，第一个恢复的调用成为新的执行者
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await factory()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有等待者时不输出 "exception was never retrieved"
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._flights.pop(key, None)
+
+
+__all__ = ["SingleFlight", "AsyncSingleFlight"]
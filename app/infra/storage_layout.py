@@ -0,0 +1,131 @@
+import os
+import hashlib
+from pathlib import Path
+from threading import Lock
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+# 存储目录的布局
+# - 默认每种类型的文件都放在同一个目录中，例如 telegram/videos、<账号>/images
+# - 开启分片后按媒体 key 的哈希前缀再分 1~2 级子目录，例如 telegram/videos/3f/a2/t-123.mp4
+#   每级 256 个目录，百万级文件时单个目录只有几十个文件
+# - 已经创建过的目录会记住，不再重复调用 os.makedirs
+
+MAX_SHARD_LEVELS = 2
+
+# 存储目录中的子目录与媒体类型的对应关系
+TELEGRAM_TYPES = {"images": "photo", "videos": "video", "gifs": "animation", "audios": "audio",
+                  "documents": "document", "unknown": "unknown"}
+TWITTER_TYPES = {"images": "image", "videos": "video", "others": "other"}
+
+_created: set[str] = set()
+_created_lock = Lock()
+
+
+def ensure_dir(path: str) -> str:
+    if path not in _created:
+        os.makedirs(path, exist_ok=True)
+        with _created_lock:
+            _created.add(path)
+    return path
+
+
+def shard_dir(base: str, key: str, levels: int) -> str:
+    """media key 对应的分片目录，levels 为 0 时就是 base"""
+    levels = min(max(levels, 0), MAX_SHARD_LEVELS)
+    if levels == 0:
+        return base
+    digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return os.path.join(base, *(digest[i * 2:i * 2 + 2] for i in range(levels)))
+
+
+@dataclass(slots=True)
+class StoredFile:
+    path: Path
+    # 类型目录，例如 <storage>/telegram/videos，分片目录在它下面
+    base: Path
+    key: str
+    source: str
+    media_type: str
+    account: Optional[str] = None
+    mode: Optional[str] = None
+
+
+@dataclass(slots=True)
+class TypeDir:
+    # 类型目录，例如 <storage>/telegram/videos，分片目录在它下面
+    base: Path
+    source: str
+    media_type: str
+    account: Optional[str] = None
+
+
+def iter_type_dirs(storage: Path) -> Iterator[TypeDir]:
+    """存储目录中已存在的类型目录"""
+    for subdir, media_type in TELEGRAM_TYPES.items():
+        base = storage / "telegram" / subdir
+        if base.is_dir():
+            yield TypeDir(base=base, source="telegram", media_type=media_type)
+
+    for account in sorted(storage.iterdir()) if storage.is_dir() else []:
+        if not account.is_dir() or account.name == "telegram":
+            continue
+        for subdir, media_type in TWITTER_TYPES.items():
+            base = account / subdir
+            if base.is_dir():
+                yield TypeDir(base=base, source="twitter", media_type=media_type, account=account.name)
+
+
+def parse_stored_name(source: str, name: str) -> Optional[tuple[str, Optional[str]]]:
+    """
+    从文件名恢复缓存 key 与 twitter 的时间线，不是下载的文件时返回 None
+    - telegram/<子目录>/[分片/]t-<id>.<ext> -> t-<id>
+    - <账号>/<子目录>/[分片/]x-<mode>-<id>.<ext> -> x-<id>
+    """
+    stem = name.split(".")[0]
+    if source == "telegram":
+        return (stem, None) if stem.startswith("t-") and len(stem) > 2 else None
+    parts = stem.split("-")
+    if len(parts) != 3 or parts[0] != "x" or not parts[2]:
+        return None
+    return f"x-{parts[2]}", parts[1]
+
+
+def is_shard_dir(name: str) -> bool:
+    return len(name) == 2
+
+
+def iter_stored_files(storage: Path) -> Iterator[StoredFile]:
+    """遍历存储目录中已下载的文件，兼容分片与不分片的布局，跳过下载中的临时文件"""
+    for item in iter_type_dirs(storage):
+        for file in _walk(item.base):
+            parsed = parse_stored_name(item.source, file.name)
+            if parsed is None:
+                continue
+            key, mode = parsed
+            yield StoredFile(path=file, base=item.base, key=key, source=item.source, media_type=item.media_type,
+                             account=item.account, mode=mode)
+
+
+def _walk(directory: Path) -> Iterator[Path]:
+    for root, dirs, files in os.walk(directory):
+        # 只进入分片目录
+        dirs[:] = sorted(name for name in dirs if is_shard_dir(name))
+        for name in files:
+            if not name.endswith(".tmp"):
+                yield Path(root) / name
+
+
+__all__ = [
+    "MAX_SHARD_LEVELS",
+    "TELEGRAM_TYPES",
+    "TWITTER_TYPES",
+    "StoredFile",
+    "TypeDir",
+    "iter_type_dirs",
+    "parse_stored_name",
+    "is_shard_dir",
+    "ensure_dir",
+    "shard_dir",
+    "iter_stored_files",
+]
@@ -0,0 +1,291 @@
+import os
+import time
+import atexit
+import sqlite3
+from threading import Event, Lock, Thread
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 按时间分桶的下载吞吐量统计
+# - 每分钟一个桶，记录成功的数量、字节数、传输耗时、失败次数（按错误码）与 FloodWait / 429 等待的秒数
+# - 下载时只累加内存中的计数，后台线程每隔 flush_interval 秒合并写入 SQLite，不在下载路径上写磁盘
+# - 按小时查看时由分钟桶聚合；超过 retention_days 的分钟桶会被删除，表的大小是固定的
+# - twitter 与 telegram 共用同一个数据库，用 source 区分
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS throughput (
+    source TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    items INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    transfer_seconds REAL NOT NULL DEFAULT 0,
+    flood_wait_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, minute)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS throughput_failures (
+    source TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source, minute, code)
+) WITHOUT ROWID;
+"""
+
+MINUTE = 60
+HOUR = 3600
+
+# 删除过期数据的间隔
+_PRUNE_INTERVAL = HOUR
+
+_SPARKS = "▁▂▃▄▅▆▇█"
+
+
+@dataclass
+class ThroughputBucket:
+    # 桶的开始时间与长度（秒）
+    start: int
+    length: int
+    items: int = 0
+    bytes: int = 0
+    failures: int = 0
+    # 传输的总耗时，多个并发传输的耗时会累加
+    transfer_seconds: float = 0.0
+    flood_wait_seconds: float = 0.0
+    failure_codes: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avg_speed(self) -> float:
+        """单个传输的平均速度（字节/秒）"""
+        return self.bytes / self.transfer_seconds if self.transfer_seconds > 0 else 0.0
+
+    @property
+    def rate(self) -> float:
+        """整个桶的吞吐量（字节/秒），包含了并发的效果"""
+        return self.bytes / self.length if self.length else 0.0
+
+
+class ThroughputRecorder:
+    def __init__(self, db_file: str, flush_interval: float = 10.0, retention_days: int = 30):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._db_lock = Lock()
+
+        # 还没有写入的计数：(source, minute) -> [items, bytes, failures, transfer_seconds, flood_wait_seconds]
+        self._lock = Lock()
+        self._pending: dict[tuple[str, int], list] = {}
+        self._pending_codes: dict[tuple[str, int, str], int] = {}
+        self._pruned_at = 0.0
+
+        self._closed = Event()
+        self._thread = Thread(target=self._run, name="throughput-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _bucket(self, source: str, at: Optional[float]) -> list:
+        minute = int(at if at is not None else time.time()) // MINUTE * MINUTE
+        bucket = self._pending.get((source, minute))
+        if bucket is None:
+            bucket = self._pending[(source, minute)] = [0, 0, 0, 0.0, 0.0]
+        return bucket
+
+    def record(self, source: str, size: int = 0, seconds: float = 0.0, error_code: Optional[str] = None,
+               at: Optional[float] = None) -> None:
+        """记录一次传输，error_code 不为空时记为失败"""
+        with self._lock:
+            bucket = self._bucket(source, at)
+            if error_code is None:
+                bucket[0] += 1
+                bucket[1] += size
+                bucket[3] += seconds
+            else:
+                bucket[2] += 1
+                minute = int(at if at is not None else time.time()) // MINUTE * MINUTE
+                key = (source, minute, str(error_code))
+                self._pending_codes[key] = self._pending_codes.get(key, 0) + 1
+
+    def record_flood_wait(self, source: str, seconds: float, at: Optional[float] = None) -> None:
+        """记录服务端要求等待的秒数（Telegram FloodWait、HTTP 429 的 Retry-After 等）"""
+        with self._lock:
+            self._bucket(source, at)[4] += seconds
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            codes, self._pending_codes = self._pending_codes, {}
+        if not pending and not codes:
+            return
+
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT INTO throughput (source, minute, items, bytes, failures, transfer_seconds, flood_wait_seconds) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source, minute) DO UPDATE SET "
+                "items = items + excluded.items, bytes = bytes + excluded.bytes, "
+                "failures = failures + excluded.failures, "
+                "transfer_seconds = transfer_seconds + excluded.transfer_seconds, "
+                "flood_wait_seconds = flood_wait_seconds + excluded.flood_wait_seconds",
+                [(source, minute, *values) for (source, minute), values in pending.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO throughput_failures (source, minute, code, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (source, minute, code) DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in codes.items()],
+            )
+            self._conn.commit()
+
+            if time.time() - self._pruned_at >= _PRUNE_INTERVAL:
+                self._prune()
+
+    def _prune(self) -> None:
+        cutoff = int(time.time()) - self.retention_days * 24 * HOUR
+        self._conn.execute("DELETE FROM throughput WHERE minute < ?", (cutoff,))
+        self._conn.execute("DELETE FROM throughput_failures WHERE minute < ?", (cutoff,))
+        self._conn.commit()
+        self._pruned_at = time.time()
+
+    def query(self, since: float, until: Optional[float] = None, resolution: int = MINUTE,
+              source: Optional[str] = None) -> list[ThroughputBucket]:
+        """按 resolution（秒，60 的倍数）聚合 [since, until) 的统计，没有数据的桶也会返回"""
+        self.flush()
+        until = until if until is not None else time.time()
+        first = int(since) // resolution * resolution
+        last = int(until) // resolution * resolution
+
+        buckets = {start: ThroughputBucket(start=start, length=resolution)
+                   for start in range(first, last + resolution, resolution)}
+
+        where = "minute >= ? AND minute < ?" + (" AND source = ?" if source else "")
+        params: list = [first, last + resolution] + ([source] if source else [])
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT minute / {resolution} * {resolution} AS start, SUM(items), SUM(bytes), SUM(failures), "
+                f"SUM(transfer_seconds), SUM(flood_wait_seconds) FROM throughput WHERE {where} GROUP BY start",
+                params,
+            ).fetchall()
+            code_rows = self._conn.execute(
+                f"SELECT minute / {resolution} * {resolution} AS start, code, SUM(count) "
+                f"FROM throughput_failures WHERE {where} GROUP BY start, code",
+                params,
+            ).fetchall()
+
+        for start, items, size, failures, seconds, flood in rows:
+            bucket = buckets[start]
+            bucket.items, bucket.bytes, bucket.failures = items, size, failures
+            bucket.transfer_seconds, bucket.flood_wait_seconds = seconds, flood
+        for start, code, count in code_rows:
+            buckets[start].failure_codes[code] = count
+        return [buckets[start] for start in sorted(buckets)]
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning("写入吞吐量统计失败: %s", e)
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning("写入吞吐量统计失败: %s", e)
+        with self._db_lock:
+            self._conn.close()
+        atexit.unregister(self.close)
+
+
+def parse_window(text: str) -> tuple[int, int]:
+    """
+    解析时间范围，例如 90m、24h、7d，返回 (秒数, 聚合粒度)
+    - 3 小时以内按分钟聚合，之外按小时聚合
+    """
+    text = text.strip().lower()
+    units = {"m": MINUTE, "h": HOUR, "d": 24 * HOUR}
+    if not text or text[-1] not in units or not text[:-1].isdigit() or int(text[:-1]) <= 0:
+        raise ValueError(f"无法解析时间范围 {text}，例如 90m、24h、7d")
+    seconds = int(text[:-1]) * units[text[-1]]
+    return seconds, MINUTE if seconds <= 3 * HOUR else HOUR
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+
+def _spark(values: list[float], width: int = 72) -> str:
+    # 桶太多时合并相邻的桶，曲线不超过 width 个字符
+    if len(values) > width:
+        step = -(-len(values) // width)
+        values = [sum(values[i:i + step]) for i in range(0, len(values), step)]
+    peak = max(values, default=0)
+    if not peak:
+        return " " * len(values)
+    return "".join(" " if not value else _SPARKS[min(int(value / peak * len(_SPARKS)), len(_SPARKS) - 1)]
+                   for value in values)
+
+
+def format_trend(buckets: list[ThroughputBucket], max_rows: Optional[int] = None) -> str:
+    """以文本表格输出趋势，第一行是整个时间范围的吞吐量曲线，max_rows 限制明细的行数（保留最近的）"""
+    if not buckets:
+        return "没有统计数据"
+
+    length = buckets[0].length
+    time_format = "%m-%d %H:%M" if length >= HOUR or buckets[-1].start - buckets[0].start >= 24 * HOUR else "%H:%M"
+    items = sum(bucket.items for bucket in buckets)
+    size = sum(bucket.bytes for bucket in buckets)
+    failures = sum(bucket.failures for bucket in buckets)
+    flood = sum(bucket.flood_wait_seconds for bucket in buckets)
+    seconds = sum(bucket.transfer_seconds for bucket in buckets)
+    codes: dict[str, int] = {}
+    for bucket in buckets:
+        for code, count in bucket.failure_codes.items():
+            codes[code] = codes.get(code, 0) + count
+
+    lines = [
+        f"吞吐量 {_spark([bucket.rate for bucket in buckets])}",
+        f"合计: {items} 个，{_format_bytes(size)}，失败 {failures}，等待 {flood:.0f}秒，"
+        f"单个传输平均 {_format_bytes(size / seconds if seconds else 0)}/s",
+    ]
+    if codes:
+        lines.append("失败原因: " + "，".join(f"{code} {count}" for code, count in
+                                              sorted(codes.items(), key=lambda item: -item[1])))
+
+    rows = [bucket for bucket in buckets if bucket.items or bucket.failures or bucket.flood_wait_seconds]
+    if max_rows is not None:
+        rows = rows[-max_rows:]
+    if rows:
+        lines.append(f"{'时间':<{len(time.strftime(time_format)) - 2}} {'数量':>4} {'大小':>8} {'吞吐量':>7} {'失败':>3} {'等待':>4}")
+    for bucket in rows:
+        lines.append(
+            f"{time.strftime(time_format, time.localtime(bucket.start))} {bucket.items:>6} "
+            f"{_format_bytes(bucket.bytes):>10} {_format_bytes(bucket.rate) + '/s':>10} "
+            f"{bucket.failures:>5} {bucket.flood_wait_seconds:>5.0f}s"
+        )
+    return "\n".join(lines)
+
+
+__all__ = [
+    "MINUTE",
+    "HOUR",
+    "ThroughputBucket",
+    "ThroughputRecorder",
+    "parse_window",
+    "format_trend",
+]
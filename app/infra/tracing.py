@@ -0,0 +1,111 @@
+import json
+import time
+import threading
+import contextlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from app.infra.utils import percentile
+
+# 轻量级的阶段耗时追踪
+# - span 使用单调时钟计时，不受系统时间调整影响
+# - 同一个下载任务的各个阶段使用相同的 trace_id 关联起来
+# - 只在内存中保留最近的 span，避免长时间运行时内存无限增长
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: Optional[str] = None
+    start: float = field(default_factory=time.monotonic)
+    end: Optional[float] = None
+    error: Optional[str] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """线程安全的 span 收集器，asyncio 与线程池中都可以直接使用"""
+
+    def __init__(self, max_spans: int = 200_000):
+        self._lock = threading.Lock()
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    @contextlib.contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        span = Span(name=name, trace_id=trace_id, attributes=attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.monotonic()
+            with self._lock:
+                self._spans.append(span)
+
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """按阶段汇总耗时（秒）：count/p50/p95/p99/max"""
+        durations: dict[str, list[float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.duration)
+
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": values[-1],
+            }
+        return result
+
+    def format_summary(self) -> str:
+        lines = [f"{'stage':<12} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+        for name, s in sorted(self.summary().items()):
+            lines.append(
+                f"{name:<12} {s['count']:>7} {s['p50']:>8.3f}s {s['p95']:>8.3f}s {s['p99']:>8.3f}s {s['max']:>8.3f}s"
+            )
+        return "\n".join(lines)
+
+    def export_jsonl(self, path: str) -> int:
+        """将 span 以 JSONL 格式追加写入文件，返回写入的数量"""
+        spans = self.spans()
+        with open(path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+        return len(spans)
+
+
+# 全局单例实例
+tracer = Tracer()
+
+__all__ = ["Span", "Tracer", "tracer"]
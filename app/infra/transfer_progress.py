@@ -0,0 +1,102 @@
+import asyncio
+import itertools
+from dataclasses import dataclass
+from typing import Optional
+
+from rich.progress import TaskID
+
+from app.infra.rich_progress import create_download_progress
+
+
+@dataclass
+class _Transfer:
+    description: str
+    completed: int = 0
+    total: Optional[int] = None
+    # 对应的进度条行，没有显示时为 None
+    row: Optional[TaskID] = None
+
+
+class TransferProgress:
+    """
+    下载进度的显示
+    - 下载的回调只更新内存中的数据，按固定频率同步到 rich 的进度条
+    - 只显示最多 max_rows 个正在下载的任务和一行汇总（总字节数、速度、ETA、失败数）
+    - 完成或失败的任务立即移除，渲染开销与任务总数无关
+    """
+
+    def __init__(self, max_rows: int = 8, refresh_per_second: float = 4.0):
+        self.max_rows = max_rows
+        self.interval = 1 / refresh_per_second
+        self._ids = itertools.count()
+        self._active: dict[int, _Transfer] = {}
+        self._added = 0
+        self._finished = 0
+        self._failed = 0
+        self._finished_bytes = 0
+        # 手动刷新，不使用 rich 的刷新线程
+        self._bar = create_download_progress(auto_refresh=False)
+        self._summary = self._bar.add_task(description="总计", total=None)
+
+    def add(self, description: str) -> int:
+        key = next(self._ids)
+        self._active[key] = _Transfer(description=description)
+        self._added += 1
+        return key
+
+    def update(self, key: int, completed: int, total: Optional[int]) -> None:
+        transfer = self._active.get(key)
+        if transfer is not None:
+            transfer.completed = completed
+            transfer.total = total
+
+    def finish(self, key: int) -> None:
+        transfer = self._active.pop(key, None)
+        if transfer is not None:
+            self._finished += 1
+            self._finished_bytes += transfer.total or transfer.completed
+            self._remove_row(transfer)
+
+    def fail(self, key: int) -> None:
+        transfer = self._active.pop(key, None)
+        if transfer is not None:
+            self._failed += 1
+            self._remove_row(transfer)
+
+    def refresh(self) -> None:
+        """把当前的数据同步到进度条并重绘"""
+        visible = list(itertools.islice(self._active.values(), self.max_rows))
+        for transfer in visible:
+            if transfer.row is None:
+                transfer.row = self._bar.add_task(description=transfer.description, total=transfer.total)
+            self._bar.update(transfer.row, completed=transfer.completed, total=transfer.total)
+
+        completed = self._finished_bytes + sum(t.completed for t in self._active.values())
+        total = self._finished_bytes + sum(t.total or t.completed for t in self._active.values())
+        hidden = len(self._active) - len(visible)
+        description = f"总计 {self._finished}/{self._added} 失败 {self._failed}"
+        if hidden > 0:
+            description += f" (+{hidden} 未显示)"
+        self._bar.update(self._summary, description=description, completed=completed, total=total or None)
+        self._bar.refresh()
+
+    async def refresh_forever(self) -> None:
+        while True:
+            self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def _remove_row(self, transfer: _Transfer) -> None:
+        if transfer.row is not None:
+            self._bar.remove_task(transfer.row)
+            transfer.row = None
+
+    def __enter__(self) -> "TransferProgress":
+        self._bar.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.refresh()
+        self._bar.stop()
+
+
+__all__ = ["TransferProgress"]
@@ -1,4 +1,4 @@
-from typing import Optional, Union
+from typing import Optional, Union, Sequence
 
 
 def is_empty(value: Optional[Union[str, int]]) -> bool:
@@ -9,3 +9,11 @@ def is_empty(value: Optional[Union[str, int]]) -> bool:
     if isinstance(value, int):
         return value == 0
     return False
+
+
+# nearest-rank 百分位数，values 需要是已排序的
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
@@ -8,26 +8,25 @@ from pathlib import Path
 from telethon.tl import types
 from telethon import events, types
 
-from app.telegram.singleton import settings
+from app.telegram import singleton
+from app.telegram.configure import Settings
+from app.infra.logger import attach_handlers, file_handler_factory
+from app.infra.throughput import HOUR, format_trend, parse_window
 from app.telegram.downloader import DownloadService
+from app.telegram.job_status import JobStatusMessage
 from app.telegram.client import create_telegram_bot_client, create_telegram_client
 
 # 改进日志配置
 logger = logging.getLogger("/bot-service")
 
-_fh2 = logging.StreamHandler()
-_fh3 = logging.FileHandler(f"{settings.logs}/bot-service.log", mode='a')
 _formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
+_fh2 = logging.StreamHandler()
 _fh2.setLevel(logging.DEBUG)
-_fh3.setLevel(logging.DEBUG)
-
 _fh2.setFormatter(_formatter)
-_fh3.setFormatter(_formatter)
 
-logger.addHandler(_fh2)
-logger.addHandler(_fh3)
-logger.setLevel(logging.DEBUG)
+# 日志在后台线程写入，不阻塞事件循环
+attach_handlers(logger, lambda: _fh2, file_handler_factory(Settings.logs, "bot-service.log", formatter=_formatter))
 
 
 async def start_command(event):
@@ -40,6 +39,7 @@ async def help_command(event):
 
 class TelegramBotService:
     def __init__(self):
+        settings = singleton.settings
         self.client = create_telegram_client(settings.api_id, settings.api_hash, proxy=settings.proxy_tuple)
         self.bot = create_telegram_bot_client(settings.api_id, settings.api_hash, proxy=settings.proxy_tuple)
         # 必须使用  bot 才能下载用户转发的媒体
@@ -48,11 +48,13 @@ class TelegramBotService:
         self.media_group_lock = asyncio.Lock()
         self.media_group_timers: dict[int, asyncio.Task] = {}
         self.pending_media_groups: dict[int, list[types.Message]] = {}
+        # 每个会话正在进行的单个媒体下载的状态消息
+        self.single_media_jobs: dict[str, JobStatusMessage] = {}
 
     async def start(self):
         # 需要添加 await
-        await self.client.start(phone=settings.phone)
-        await self.bot.start(bot_token=settings.bot_token)
+        await self.client.start(phone=singleton.settings.phone)
+        await self.bot.start(bot_token=singleton.settings.bot_token)
 
         self._setup_handlers()
 
@@ -66,18 +68,43 @@ class TelegramBotService:
     async def _get_download_status(self, event):
         try:
             status = await self.downloader.status()
+            state = singleton.appState
             await event.respond(textwrap.dedent(
                 f"""
                 📊 **下载进度一览**
-                
+
                 ▶️ 正在下载: {status.running_count}
                 ⏳ 等待队列: {status.pending_count}
                 ✅ 下载成功: {status.completed_count}
                 ⚠️ 下载失败: {status.failed_count}
+
+                📈 累计下载: {state.lifetime_total_downloads}（成功 {state.lifetime_success_downloads}，失败 {state.lifetime_failed_downloads}）
                 """
             ))
         except Exception as e:
-            logger.error(f"查询服务器状态失败: {e}", exc_info=True)
+            logger.error("查询服务器状态失败: %s", e, exc_info=True)
+            await event.reply(f"❌ 服务器异常: {e}")
+
+    async def _get_throughput_stats(self, event):
+        # /stats [时间范围]，默认最近 24 小时，按小时聚合
+        window = event.pattern_match.group(1) or "24h"
+        try:
+            seconds, resolution = parse_window(window)
+        except ValueError as e:
+            await event.reply(f"❌ {e}")
+            return
+
+        try:
+            now = time.time()
+            buckets = await asyncio.to_thread(
+                singleton.throughput.query, since=now - seconds, until=now, resolution=resolution
+            )
+            unit = "小时" if resolution == HOUR else "分钟"
+            # 单条消息有长度限制，明细只保留最近的 48 行
+            text = format_trend(buckets, max_rows=48)
+            await event.respond(f"📈 **最近 {window} 的下载统计（按{unit}）**\n```\n{text}\n```")
+        except Exception as e:
+            logger.error("查询下载统计失败: %s", e, exc_info=True)
             await event.reply(f"❌ 服务器异常: {e}")
 
     async def _handle_media_message(self, event):
@@ -86,7 +113,7 @@ class TelegramBotService:
             return
         group_id = message.grouped_id
         if message.grouped_id:
-            logger.debug(f"收到媒体组 {group_id} 的一部分 (消息ID: {message.id})")
+            logger.debug("收到媒体组 %s 的一部分 (消息ID: %s)", group_id, message.id)
             # 使用异步锁保护共享数据的访问
             async with self.media_group_lock:
                 # 如果是媒体组的一部分
@@ -97,15 +124,15 @@ class TelegramBotService:
 
                 # 2. 如果该组已存在计时器，取消它（因为收到了新消息，需要重置计时）
                 if group_id in self.media_group_timers:
-                    logger.debug(f"重置媒体组 {group_id} 的计时器.")
+                    logger.debug("重置媒体组 %s 的计时器.", group_id)
                     self.media_group_timers[group_id].cancel()
 
             # 3. 安排新的延迟调度任务 (这个任务本身很快完成)
             await self._schedule_media_group_processing(group_id)
         else:
-            logger.debug(f"收到单个媒体 (消息ID: {message.id})")
+            logger.debug("收到单个媒体 (消息ID: %s)", message.id)
             asyncio.create_task(self._process_single_media(message=message))
-            logger.debug(f"已为单个媒体 {message.id} 创建后台处理任务。")
+            logger.debug("已为单个媒体 %s 创建后台处理任务。", message.id)
 
     async def _handle_link_message(self, event) -> None:
         try:
@@ -120,77 +147,31 @@ class TelegramBotService:
             await event.reply(f"❌ 链接下载失败：{e}")
 
     async def _process_telegram_links(self, message: types.Message, links: list[str]):
-        logger.info(f"开始处理 {len(links)} 个链接")
-        start_time = time.time()
+        logger.info("开始处理 %s 个链接", len(links))
+
+        # 一批链接只回复一条状态消息，下载过程中编辑这条消息
+        job = JobStatusMessage(self.bot, peer_id=message.peer_id, reply_to=message.id, title="链接下载")
+        for index, link in enumerate(links):
+            job.add(index, label=link)
+        await job.start()
 
         # 定义单个链接下载任务
         async def download_link(index, link):
             try:
-                logger.debug(f"开始下载链接 ({index}/{len(links)}): {link}")
-                result = await self.downloader.submit_async(link)
-                logger.info(f"链接 {index}/{len(links)} 下载成功: {result}")
-                return index, True, result, None, link
+                logger.debug("开始下载链接 (%s/%s): %s", index + 1, len(links), link)
+                result = await self.downloader.submit_async(
+                    link, on_progress=lambda num, total: job.progress(index, num, total)
+                )
+                logger.info("链接 %s/%s 下载成功: %s", index + 1, len(links), result)
+                job.done(index, success=True)
             except Exception as e:
                 error_msg = str(e)[:100] + "..." if len(str(e)) > 100 else str(e)
-                logger.error(f"链接 {index}/{len(links)} 下载失败: {e}", exc_info=True)
-                return index, False, None, error_msg, link
+                logger.error("链接 %s/%s 下载失败: %s", index + 1, len(links), e, exc_info=True)
+                job.done(index, success=False, error=error_msg)
 
         # 并发执行所有下载任务
-        download_tasks = [download_link(i + 1, link) for i, link in enumerate(links)]
-        download_results = await asyncio.gather(*download_tasks)
-
-        # 处理结果
-        reply_lines = []
-        failed_count = 0
-        success_count = 0
-
-        # 按原始顺序整理结果
-        sorted_results = sorted(download_results, key=lambda x: x[0])
-
-        for index, is_success, file_path, error_message, url in sorted_results:
-            if is_success:
-                success_count += 1
-                reply_lines.append(f"✅ {url}")
-            else:
-                failed_count += 1
-                reply_lines.append(f"❌ {url} \n⚠️ 错误: {error_message}")
-
-        end_time = time.time()
-        download_duration = end_time - start_time
-
-        # 添加摘要信息
-        summary = (
-            f"📊 链接处理完成: \n"
-            f"成功 {success_count}/{len(links)}\n"
-            f"失败 {failed_count}/{len(links)}\n"
-            f"耗时 {download_duration:.2f} 秒"
-        )
-        """
-        📥 批量下载完成：
-
-        ✅ 成功（3）:
-        1. https://t.me/c/xxx1
-        2. https://t.me/c/xxx2
-        3. https://t.me/c/xxx3
-
-        ❌ 失败（2）:
-        1. https://t.me/c/yyy1 - 文件已过期
-        2. https://t.me/c/yyy2 - 无法访问私有频道
-
-        ⏱️ 总耗时：12.4 秒
-        """
-        logger.info(summary)
-        reply_lines.append("\n" + summary)
-
-        await self._send_reply(message.peer_id, message.id, reply_text="\n\n".join(reply_lines))
-
-    async def _send_reply(self, peer_id, message_id: int, reply_text: str):
-        try:
-            logger.debug(f"开始发送消息回复")
-            await self.bot.send_message(entity=peer_id, message=reply_text, reply_to=message_id)
-            logger.debug(f"消息回复成功")
-        except Exception as e:
-            logger.error(f"消息回复失败: {e}", exc_info=True)
+        await asyncio.gather(*(download_link(i, link) for i, link in enumerate(links)))
+        await job.finish()
 
     async def _schedule_media_group_processing(self, group_id: int, delay: float = 1.5):
         # 创建处理任务
@@ -213,9 +194,9 @@ class TelegramBotService:
 
             except asyncio.CancelledError:
                 # 如果任务被取消（因为收到了同一组的新消息），则不执行任何操作
-                logger.debug(f"媒体组 {group_id} 的处理任务被取消/重置.")
+                logger.debug("媒体组 %s 的处理任务被取消/重置.", group_id)
             except Exception as e:
-                logger.error(f"处理媒体组 {group_id} 延迟任务时发生意外错误: {e}")
+                logger.error("处理媒体组 %s 延迟任务时发生意外错误: %s", group_id, e)
                 # 确保即使出错也尝试清理
                 async with self.media_group_lock:
                     if group_id in self.pending_media_groups:
@@ -227,105 +208,75 @@ class TelegramBotService:
         delay_task = asyncio.create_task(process_group_after_delay())
         async with self.media_group_lock:
             self.media_group_timers[group_id] = delay_task
-        logger.debug(f"已为媒体组 {group_id} 安排处理任务，延迟 {delay} 秒.")
+        logger.debug("已为媒体组 %s 安排处理任务，延迟 %s 秒.", group_id, delay)
 
     async def _process_media_group(self, group_id: int, messages: list[types.Message]):
-        logger.debug(f"--- 开始处理媒体组 (ID: {group_id}) 包含 {len(messages)} 条消息 ---")
+        logger.debug("--- 开始处理媒体组 (ID: %s) 包含 %s 条消息 ---", group_id, len(messages))
         messages.sort(key=lambda m: m.id)
         first_message = messages[0]  # 用于回复
 
-        start_time = time.time()
+        job = JobStatusMessage(self.bot, peer_id=first_message.peer_id, reply_to=first_message.id, title="相册下载")
+        for index, media_message in enumerate(messages):
+            job.add(media_message.id, label=f"媒体 {index + 1}/{len(messages)}")
+        await job.start()
 
         # 定义单个媒体下载任务
         async def download_media(index, media_message):
             try:
-                file_path = await self.downloader.submit_async(media_message)
-                logger.debug(f"媒体组 {group_id} 的第 {index}/{len(messages)} 个媒体下载成功: {file_path}")
-                return index, True, file_path, None
+                file_path = await self.downloader.submit_async(
+                    media_message, on_progress=lambda num, total: job.progress(media_message.id, num, total)
+                )
+                logger.debug("媒体组 %s 的第 %s/%s 个媒体下载成功: %s", group_id, index, len(messages), file_path)
+                job.done(media_message.id, success=True)
             except Exception as e:
-                logger.error(f"媒体组 {group_id} 的第 {index}/{len(messages)} 个媒体下载失败: {e}", exc_info=True)
-                return index, False, None, str(e)[:50] + "..."
+                logger.error("媒体组 %s 的第 %s/%s 个媒体下载失败: %s", group_id, index, len(messages), e, exc_info=True)
+                job.done(media_message.id, success=False, error=str(e)[:50] + "...")
 
         # 并发执行所有下载任务
-        download_tasks = [download_media(i + 1, msg) for i, msg in enumerate(messages)]
-        download_results = await asyncio.gather(*download_tasks)
-
-        # 处理结果
-        reply_lines = []
-        success_count = 0
-        failed_count = 0
-
-        # 按原始顺序整理结果
-        sorted_results = sorted(download_results, key=lambda x: x[0])
-
-        for index, is_success, file_path, error_message in sorted_results:
-            if is_success:
-                success_count += 1
-                reply_lines.append(f"✅ 媒体 {index}/{len(messages)} 下载成功")
-            else:
-                failed_count += 1
-                reply_lines.append(f"❌ 媒体 {index}/{len(messages)} 下载失败: {error_message}")
-
-        end_time = time.time()
-        download_duration = end_time - start_time
-
-        # 添加摘要信息
-        summary = (
-            f"📊 媒体相册处理完成: "
-            f"成功 {success_count}/{len(messages)}, "
-            f"失败 {failed_count}/{len(messages)}, "
-            f"耗时 {download_duration:.2f} 秒"
-        )
-        """
-        📷 相册下载完成：
-
-        ✅ 成功（3）:
-        1. 项目 1
-        2. 项目 2
-        3. 项目 3
-
-        ❌ 失败（1）:
-        4. 项目 4 - 文件损坏
-
-        ⏱️ 总耗时：12.4 秒
-        """
-        logger.info(summary)
-        reply_lines.append("\n" + summary)
-
-        await self._send_reply(
-            peer_id=first_message.peer_id,
-            message_id=first_message.id,
-            reply_text='\n'.join(reply_lines)
-        )
+        await asyncio.gather(*(download_media(i + 1, msg) for i, msg in enumerate(messages)))
+        await job.finish()
 
     async def _process_single_media(self, message: types.Message):
         msg_id = message.id
-        logger.debug(f"--- 开始处理单个媒体 (消息ID: {msg_id}) ---")
+        logger.debug("--- 开始处理单个媒体 (消息ID: %s) ---", msg_id)
+
+        # 同一个会话连续转发的单个媒体共用一条状态消息，全部完成后才结束
+        peer_key = str(message.peer_id)
+        job = self.single_media_jobs.get(peer_key)
+        if job is None or job.closed:
+            job = JobStatusMessage(self.bot, peer_id=message.peer_id, reply_to=msg_id, title="媒体下载")
+            self.single_media_jobs[peer_key] = job
+            job.add(msg_id, label=f"消息 {msg_id}")
+            await job.start()
+        else:
+            job.add(msg_id, label=f"消息 {msg_id}")
 
-        file_path = None
         start_time = time.time()
         try:
-            file_path = await self.downloader.submit_async(message)
-            logger.info(f"媒体 {msg_id} 下载成功，存储于: {file_path}")
+            file_path = await self.downloader.submit_async(
+                message, on_progress=lambda num, total: job.progress(msg_id, num, total)
+            )
+            logger.info("媒体 %s 下载成功，存储于: %s", msg_id, file_path)
+            job.done(msg_id, success=True)
         except Exception as e:
-            logger.error(f"媒体 {msg_id} 下载失败: {e}", exc_info=True)
+            logger.error("媒体 %s 下载失败: %s", msg_id, e, exc_info=True)
+            job.done(msg_id, success=False, error=str(e)[:100])
         finally:
-            end_time = time.time()
-            download_duration = end_time - start_time
-            logger.debug(f"--- 单个媒体 {msg_id} 处理完毕，耗时: {download_duration:.2f} 秒 ---")
-
-        if file_path:
-            reply_text = f"✅ 文件下载成功\n⏱️ 耗时: {download_duration:.2f} 秒"
-        else:
-            reply_text = f"❌ 文件下载失败\n⏱️ 耗时: {download_duration:.2f} 秒"
+            download_duration = time.time() - start_time
+            logger.debug("--- 单个媒体 %s 处理完毕，耗时: %.2f 秒 ---", msg_id, download_duration)
 
-        await self._send_reply(peer_id=message.peer_id, message_id=message.id, reply_text=reply_text)
+        if job.pending == 0 and not job.closed:
+            # 先移除再等待，之后转发的媒体会创建新的状态消息
+            if self.single_media_jobs.get(peer_key) is job:
+                del self.single_media_jobs[peer_key]
+            await job.finish()
 
     def _setup_handlers(self):
         handlers = [
             (help_command, events.NewMessage(pattern="/help")),
             (start_command, events.NewMessage(pattern="/start")),
             (self._get_download_status, events.NewMessage(pattern="/status")),
+            (self._get_throughput_stats, events.NewMessage(pattern=r"^/stats(?:\s+(\S+))?$")),
             (self._handle_media_message, events.NewMessage()),
             (self._handle_link_message, events.NewMessage(pattern=r"(https?://t\.me/\S+)")),
         ]
@@ -335,5 +286,7 @@ class TelegramBotService:
 
     async def dispose(self):
         await self.downloader.shutdown()
+        # 写入延迟的状态修改
+        singleton.appState.flush()
         await self.client.disconnect()
         await self.bot.disconnect()
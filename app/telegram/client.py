@@ -2,14 +2,13 @@ import logging
 from typing import Optional, Tuple
 from telethon import TelegramClient
 
-from app.infra.logger import getLogger
-from app.telegram.singleton import settings
+from app.infra.logger import getLogger, attach_handlers, file_handler_factory
+from app.telegram.configure import Settings
 
 logger = getLogger(__name__)
 
 telethon_logger = logging.getLogger("telethon")
-telethon_logger.setLevel(logging.INFO)
-telethon_logger.addHandler(logging.FileHandler(f"{settings.logs}/telethon.log", mode='a'))
+attach_handlers(telethon_logger, file_handler_factory(Settings.logs, "telethon.log"), level=logging.INFO)
 
 _BOT_SESSION_FILE_NAME = "bot-session"
 _CLIENT_SESSION_FILE_NAME = "client-session"
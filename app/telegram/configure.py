@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Tuple
 
+from app.infra.storage_layout import MAX_SHARD_LEVELS
 from app.infra.path import resolve_path, parse_proxy_link
 from app.infra.utils import is_empty
 from app.infra.yml import parse_from
@@ -39,6 +40,12 @@ class Settings:
     # - 如果目录不存在，会自动创建，目录的路径需要是绝对路径或者是相对于 README.md 所在目录的路径
     storage_directory: str
 
+    # 存储目录的分片层级（可选）
+    # - 默认: 0，每种类型的文件放在同一个目录中
+    # - 1 或 2: 按媒体 key 的哈希前缀再分 1~2 级子目录，每级 256 个
+    # - 修改后使用 pixi run migrate-storage 移动已有的文件
+    storage_shards: int
+
     # Telegram 需要登录的账号的手机号 国际号码形式
     phone: str
 
@@ -54,6 +61,25 @@ class Settings:
     # 存储 Telegram 链接的文件路径
     urls_path: str
 
+    # 媒体索引数据库的路径（可选）
+    # - 默认: 在当前目录下创建 catalog.db
+    # - 每个下载完成的文件都会写入一条记录，可以使用 pixi run catalog 查询
+    catalog_file: str
+
+    # 是否写入媒体索引（可选）
+    # - 默认: True
+    use_catalog: bool
+
+    # 下载前的媒体过滤规则（可选）
+    # - 默认: 不过滤
+    # - 格式见 README，由 singleton.media_filter 解析
+    filters: dict
+
+    # 下载统计等状态的存储方式（可选）
+    # - 默认: file，保存在 outputs/state.txt，修改先写入内存，每隔几秒写入一次文件
+    # - sqlite: 保存在 outputs/state.db，每次修改只写入对应的行
+    state_backend: str
+
     # 一些文件输出目录
     logs: str = resolve_path("./logs")
     outputs: str = resolve_path("./outputs")
@@ -91,5 +117,10 @@ class Settings:
             max_concurrent=data.get("max_concurrent", 8),
             use_cache=not data.get("cache_disabled", False),
             cache_file=resolve_path(data.get("cache_file", "./caches.txt").strip()),
+            catalog_file=resolve_path(data.get("catalog_file", "./catalog.db").strip()),
+            use_catalog=not data.get("catalog_disabled", False),
             storage_directory=resolve_path(data.get("storage_directory", "./downloads").strip()),
+            storage_shards=min(max(int(data.get("storage_shards", 0)), 0), MAX_SHARD_LEVELS),
+            filters=data.get("telegram", {}).get("filters", None) or {},
+            state_backend=str(data.get("telegram", {}).get("state_backend", "file")).strip().lower(),
         )
@@ -3,22 +3,32 @@ import logging
 import time
 import os
 import shutil
+import mimetypes
 import tempfile
 from enum import Enum
+from collections import deque
 from telethon.tl import types
 from asyncio.tasks import sleep
 from types import SimpleNamespace
-from telethon import TelegramClient
-from rich.progress import Progress
+from telethon import TelegramClient, utils
+from telethon.errors import FileReferenceExpiredError, FloodWaitError
 from rich.logging import RichHandler
 from dataclasses import dataclass, field
 from typing import Callable, TypeAlias, Optional, Union
 
 from app.infra.idgen import idgen
+from app.infra.tracing import tracer
+from app.infra.singleflight import AsyncSingleFlight
 from app.telegram.media_types import MediaTypes
-from app.telegram.link_parser import fetch_message_by_link
-from app.infra.rich_progress import create_download_progress
-from app.telegram.singleton import cache_manager, settings
+from app.telegram.message_ref import MessageRef
+from app.telegram.link_parser import fetch_message_by_link, normalize_telegram_link
+from app.infra.transfer_progress import TransferProgress
+from app.infra.postprocess import post_processor
+from app.infra.cache import CacheManager
+from app.infra.catalog import CatalogEntry
+from app.telegram import singleton
+from app.telegram.configure import Settings
+from app.infra.logger import attach_handlers, file_handler_factory
 
 logger = logging.getLogger("downloadService")
 
@@ -33,14 +43,10 @@ class SilentFilter(logging.Filter):
 
 
 _fh2 = RichHandler(rich_tracebacks=True)
-_fh3 = logging.FileHandler(f"{settings.logs}/download.log", mode='a')
-
 _fh2.setLevel(logging.DEBUG)
-_fh3.setLevel(logging.DEBUG)
 
-logger.addHandler(_fh2)
-logger.addHandler(_fh3)
-logger.setLevel(logging.DEBUG)
+# 日志在后台线程写入，不阻塞事件循环
+attach_handlers(logger, lambda: _fh2, file_handler_factory(Settings.logs, "download.log"))
 
 
 class TaskStatus(Enum):
@@ -62,6 +68,7 @@ class DownloadErrorCode(str, Enum):
     AuthError = "AuthError"
     FileSystemError = "FileSystemError"
     RateLimitError = "RateLimitError"
+    Filtered = "Filtered"
 
 
 class DownloadException(Exception):
@@ -91,24 +98,38 @@ class DownloadException(Exception):
             return DownloadException(DownloadErrorCode.Unknown, f"未知错误: {error_message}")
 
 
+# 没有发生下载的结果
+_NOT_DOWNLOADED = (DownloadErrorCode.ExistInCache, DownloadErrorCode.Filtered)
+
 TaskID: TypeAlias = str
 
 TaskResult: TypeAlias = str
 
 TaskCallback: TypeAlias = Callable[[Optional[DownloadException], Optional[TaskResult]], None]
 
+# 下载进度回调：已下载的字节数、总字节数
+ProgressCallback: TypeAlias = Callable[[int, Optional[int]], None]
 
-@dataclass
+
+# 排队的任务可能有很多，使用 __slots__ 减少每个任务的内存
+# source 是链接或者消息的下载坐标，不持有 Message 对象
+@dataclass(slots=True)
 class TaskDefinition:
     id: TaskID
-    source: Union[types.Message, str]
+    source: Union[MessageRef, types.Message, str]
 
     result: Optional[TaskResult] = None
     waiter: Optional[asyncio.Future] = None
     exception: Optional[DownloadException] = None
     created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    # 已下载的字节数，由下载进度回调更新
+    downloaded_bytes: int = 0
     status: TaskStatus = field(default=TaskStatus.pending)
     callback: Optional[Callable[[Optional[DownloadException], Optional[TaskResult]], None]] = None
+    on_progress: Optional[ProgressCallback] = None
+    # 共享了同时进行的相同下载的结果，成功或失败由执行下载的任务计入累计统计
+    shared: bool = False
 
 
 def _next_task_id() -> TaskID:
@@ -127,9 +148,61 @@ class ServiceStatus:
     completed_count: int = 0
 
 
+# 已完成任务的历史记录，只保留必要的字段，不持有 Message 对象
+@dataclass(frozen=True)
+class TaskRecord:
+    id: TaskID
+    source: str
+    status: TaskStatus
+    created_at: float
+    started_at: Optional[float]
+    finished_at: float
+    downloaded_bytes: int = 0
+    result: Optional[TaskResult] = None
+    error_code: Optional[DownloadErrorCode] = None
+
+    @property
+    def queue_duration(self) -> float:
+        """任务在队列中等待的时间"""
+        return (self.started_at or self.finished_at) - self.created_at
+
+    @property
+    def run_duration(self) -> float:
+        """任务实际执行的时间"""
+        return self.finished_at - self.started_at if self.started_at is not None else 0.0
+
+
+def _describe_source(source: Union[MessageRef, types.Message, str]) -> str:
+    if isinstance(source, str):
+        return source
+    if isinstance(source, MessageRef):
+        return f"Message(id={source.message_id})"
+    return f"Message(id={source.id})"
+
+
+def _compact_source(source: Union[MessageRef, types.Message, str]) -> Union[MessageRef, types.Message, str]:
+    # 消息在提交时就转换为下载坐标，之后不再引用 Message 对象
+    if isinstance(source, (str, MessageRef)):
+        return source
+    return MessageRef.from_message(source) or source
+
+
 # todo Downloader 负责调度执行，不负责实现
 class DownloadService:
-    def __init__(self, client: TelegramClient, bot: Optional[TelegramClient], max_concurrent: int = 8, silent=False):
+    # 每个任务开始传输前的等待时间（秒），用于控制下载速度
+    throttle_delay: float = 0.5
+    # 退出时是否把 span 导出到 outputs 目录，基准测试中关闭
+    export_trace: bool = True
+
+    def __init__(
+            self,
+            client: TelegramClient,
+            bot: Optional[TelegramClient],
+            max_concurrent: int = 8,
+            silent=False,
+            history_size: int = 1000,
+            cache_manager: Optional[CacheManager] = None,
+    ):
         # 任务队列锁
         self._lock = asyncio.Lock()
         # 最大并发数
@@ -145,100 +218,125 @@ class DownloadService:
         # asyncio 队列
         self._task_queue: asyncio.Queue[TaskID] = asyncio.Queue()
         # 进度条
-        self._progress: Optional[Progress] = None
-        # 文件是否下载中或下载过
-        # 这个主要是因为并发下载时 cache_manager 无法判断文件正在下载中
-        self._cache: Set[str] = set()
+        self._progress: Optional[TransferProgress] = None
+        # 已下载媒体的缓存，默认使用全局缓存器
+        self._cache_manager: CacheManager = cache_manager if cache_manager is not None else singleton.cache_manager
+        # 正在进行的下载，key 为规范化的链接或媒体的缓存 key
+        # cache_manager 只记录下载完成的媒体，同一个链接或媒体同时提交多次时由这里合并，共享同一个结果
+        self._flights: AsyncSingleFlight[TaskResult] = AsyncSingleFlight()
 
         # 统计信息
+        # 计数器在状态变化时增量维护，读取时不需要加锁也不需要遍历任务列表
+        self._pending_count: int = 0
+        self._running_count: int = 0
         self._failed_count: int = 0
         self._completed_count: int = 0
+        # 最近完成的任务（环形缓冲区）
+        self._history: deque[TaskRecord] = deque(maxlen=max(1, history_size))
 
         if silent:
             _fh2.addFilter(SilentFilter(silent=True))
 
-        logger.debug(f"下载服务初始化: 最大并发数={max_concurrent}, 静默模式={silent}")
+        logger.debug("下载服务初始化: 最大并发数=%s, 静默模式=%s", max_concurrent, silent)
 
     async def status(self) -> ServiceStatus:
-        async with self._lock:
-            pending_count = sum(1 for task in self._tasks.values() if task.status == TaskStatus.pending)
-            running_count = sum(1 for task in self._tasks.values() if task.status == TaskStatus.running)
-            return ServiceStatus(
-                pending_count=pending_count,
-                running_count=running_count,
-                failed_count=self._failed_count,
-                completed_count=self._completed_count
-            )
+        return self.snapshot()
+
+    def snapshot(self) -> ServiceStatus:
+        # 所有计数器都只在事件循环线程中修改，这里直接读取即可，不需要加锁
+        return ServiceStatus(
+            pending_count=self._pending_count,
+            running_count=self._running_count,
+            failed_count=self._failed_count,
+            completed_count=self._completed_count
+        )
+
+    def history(self, limit: Optional[int] = None) -> list[TaskRecord]:
+        """获取最近完成的任务记录，按完成时间倒序排列"""
+        records = list(reversed(self._history))
+        return records if limit is None else records[:max(0, limit)]
 
     def submit(self, source: Union[types.Message, str], callback: Optional[TaskCallback] = None) -> TaskID:
         task_id = _next_task_id()
-        asyncio.create_task(self._submit(task_id=task_id, source=source, callback=callback))
-        logger.debug(f"提交任务(异步): ID={task_id}")
+        # 直接加入队列，不为每个任务创建协程
+        self._enqueue(task_id=task_id, source=_compact_source(source), callback=callback)
+        logger.debug("提交任务(异步): ID=%s", task_id)
         return task_id
 
-    async def submit_async(self, source: Union[types.Message, str]) -> asyncio.Future[TaskResult]:
+    async def submit_async(
+            self, source: Union[types.Message, str], on_progress: Optional[ProgressCallback] = None
+    ) -> asyncio.Future[TaskResult]:
         task_id = _next_task_id()
-        logger.debug(f"提交任务(同步): ID={task_id}")
-        return await self._submit(task_id=task_id, source=source)
-
-    async def _submit(
-            self, task_id: TaskID, source: Union[types.Message, str], callback: Optional[TaskCallback] = None
+        source = _compact_source(source)
+        logger.debug("提交任务(同步): ID=%s", task_id)
+        return await self._enqueue(task_id=task_id, source=source, on_progress=on_progress)
+
+    def _enqueue(
+            self,
+            task_id: TaskID,
+            source: Union[MessageRef, types.Message, str],
+            callback: Optional[TaskCallback] = None,
+            on_progress: Optional[ProgressCallback] = None,
     ) -> asyncio.Future[TaskResult]:
+        # 同步执行，中间没有 await，不需要持有 self._lock
         if self._shutdown.is_set():
-            logger.warning(f"任务提交失败: ID={task_id}, 服务已关闭")
+            logger.warning("任务提交失败: ID=%s, 服务已关闭", task_id)
             raise RuntimeError("DownloadService is shutdown")
 
-        waiter = asyncio.Future()
-        async with self._lock:
-            self._tasks[task_id] = TaskDefinition(id=task_id, source=source, waiter=waiter, callback=callback)
+        waiter = asyncio.get_running_loop().create_future()
+        self._tasks[task_id] = TaskDefinition(
+            id=task_id, source=source, waiter=waiter, callback=callback, on_progress=on_progress
+        )
+        self._pending_count += 1
 
-        logger.debug(f"任务已加入队列: ID={task_id}, 当前队列长度={self._task_queue.qsize() + 1}")
-        await self._task_queue.put(task_id)
-        return await waiter
+        logger.debug("任务已加入队列: ID=%s, 当前队列长度=%s", task_id, self._task_queue.qsize() + 1)
+        # 队列没有长度限制，不会阻塞
+        self._task_queue.put_nowait(task_id)
+        return waiter
 
     async def wait(self, task_id: TaskID) -> TaskResult:
         async with self._lock:
             if task_id not in self._tasks:
-                logger.error(f"获取任务 waiter 失败: ID={task_id}, 任务不存在")
+                logger.error("获取任务 waiter 失败: ID=%s, 任务不存在", task_id)
                 raise ValueError(f"not found task by id {task_id}")
 
             waiter = self._tasks[task_id].waiter
 
         if waiter is None:
-            logger.error(f"获取任务 waiter 失败: ID={task_id}, waiter 为空")
+            logger.error("获取任务 waiter 失败: ID=%s, waiter 为空", task_id)
             raise ValueError(f"waiter is None for task {task_id}")
 
-        logger.debug(f"获取任务 waiter 成功: ID={task_id}")
+        logger.debug("获取任务 waiter 成功: ID=%s", task_id)
         return await waiter
 
     async def _worker(self):
         worker_id = idgen.get_next_id()
-        logger.debug(f"工作协程启动: ID={worker_id}")
+        logger.debug("工作协程启动: ID=%s", worker_id)
 
         try:
             while not self._shutdown.is_set():
                 try:
                     task_id = await asyncio.wait_for(self._task_queue.get(), timeout=1.0)
                     start_time = time.time()
-                    logger.debug(f"工作协程接收任务: 协程ID={worker_id}, 任务ID={task_id}")
+                    logger.debug("工作协程接收任务: 协程ID=%s, 任务ID=%s", worker_id, task_id)
 
                     await self._run_task(task_id)
 
                     elapsed = time.time() - start_time
-                    logger.debug(f"工作协程完成任务: 协程ID={worker_id}, 任务ID={task_id}, 耗时={elapsed:.2f}秒")
+                    logger.debug("工作协程完成任务: 协程ID=%s, 任务ID=%s, 耗时=%.2f秒", worker_id, task_id, elapsed)
                     self._task_queue.task_done()
 
                 except asyncio.TimeoutError:
                     # 超时只是为了定期检查关闭信号
                     continue
                 except Exception as e:
-                    logger.error(f"工作协程异常: 协程ID={worker_id}, 错误={str(e)}")
+                    logger.error("工作协程异常: 协程ID=%s, 错误=%s", worker_id, e)
         except asyncio.CancelledError:
-            logger.debug(f"工作协程被取消: ID={worker_id}")
+            logger.debug("工作协程被取消: ID=%s", worker_id)
         except Exception as e:
-            logger.error(f"工作协程意外终止: ID={worker_id}, 错误={str(e)}")
+            logger.error("工作协程意外终止: ID=%s, 错误=%s", worker_id, e)
         finally:
-            logger.debug(f"工作协程退出: ID={worker_id}")
+            logger.debug("工作协程退出: ID=%s", worker_id)
 
     async def _run_task(self, task_id: TaskID):
         task = None
@@ -247,38 +345,39 @@ class DownloadService:
         try:
             async with self._lock:
                 if task_id not in self._tasks:
-                    logger.warning(f"任务不存在: ID={task_id}")
+                    logger.warning("任务不存在: ID=%s", task_id)
                     return
 
                 task = self._tasks[task_id]
                 task.status = TaskStatus.running
+                task.started_at = time.time()
+                self._pending_count -= 1
+                self._running_count += 1
 
-            if isinstance(task.source, str) and task.source in self._cache:
-                logger.warning(f"同样的任务正在下载或曾经下载过: ID={task_id}, 源={task.source}")
-                error = DownloadException(DownloadErrorCode.ExistInCache, f"同样的任务正在下载或曾经下载过: {task.source}")
-                await self._handle_task_completion(task, result=None, error=error)
-                return
-
-            source_desc = task.source if isinstance(task.source, str) else f"Message(id={task.source.id})"
-            logger.debug(f"开始执行任务: ID={task_id}, 源={source_desc}")
+            logger.debug("开始执行任务: ID=%s, 源=%s", task_id, _describe_source(task.source))
 
-            result = await self._download_media(task.source)
+            result = await self._download_media(task.source, task=task)
 
             elapsed = time.time() - start_time
-            logger.debug(f"任务成功完成: ID={task_id}, 结果路径={result}, 耗时={elapsed:.2f}秒")
+            logger.debug("任务成功完成: ID=%s, 结果路径=%s, 耗时=%.2f秒", task_id, result, elapsed)
 
             await self._handle_task_completion(task, result=result, error=None)
 
         except Exception as e:
             elapsed = time.time() - start_time
             error = DownloadException.from_error(e)
-            logger.error(f"任务执行失败: ID={task_id}, 错误={error}, 耗时={elapsed:.2f}秒")
+            logger.error("任务执行失败: ID=%s, 错误=%s, 耗时=%.2f秒", task_id, error, elapsed)
 
             if task:
                 await self._handle_task_completion(task, result=None, error=error)
 
     async def _handle_task_completion(self, task: TaskDefinition, result: Optional[str], error: Optional[Exception]):
         async with self._lock:
+            if task.status == TaskStatus.running:
+                self._running_count -= 1
+            elif task.status == TaskStatus.pending:
+                self._pending_count -= 1
+
             if error is not None:
                 task.exception = error if isinstance(error, DownloadException) else DownloadException.from_error(error)
                 task.status = TaskStatus.failure
@@ -288,35 +387,52 @@ class DownloadService:
                 task.status = TaskStatus.success
                 self._completed_count += 1
 
-            elapsed = time.time() - task.created_at
+            # 已缓存与被过滤的媒体没有下载，共享结果的任务已由执行下载的任务统计，都不计入累计统计
+            if not task.shared and (task.exception is None or task.exception.error_code not in _NOT_DOWNLOADED):
+                singleton.appState.record_download(success=error is None)
+
+            finished_at = time.time()
+            elapsed = finished_at - task.created_at
             if task.id in self._tasks:
                 del self._tasks[task.id]
 
-        logger.debug(f"处理任务完成: ID={task.id}, 状态={task.status.name}, 总耗时={elapsed:.2f}秒")
+            self._history.append(TaskRecord(
+                id=task.id,
+                source=_describe_source(task.source),
+                status=task.status,
+                created_at=task.created_at,
+                started_at=task.started_at,
+                finished_at=finished_at,
+                downloaded_bytes=task.downloaded_bytes,
+                result=task.result,
+                error_code=task.exception.error_code if task.exception else None,
+            ))
+
+        logger.debug("处理任务完成: ID=%s, 状态=%s, 总耗时=%.2f秒", task.id, task.status.name, elapsed)
 
         if task.waiter is not None:
             if error is not None:
                 task.waiter.set_exception(error)
-                logger.debug(f"设置任务异常结果: ID={task.id}, 异常={error}")
+                logger.debug("设置任务异常结果: ID=%s, 异常=%s", task.id, error)
             else:
                 task.waiter.set_result(result)
-                logger.debug(f"设置任务成功结果: ID={task.id}, 结果={result}")
+                logger.debug("设置任务成功结果: ID=%s, 结果=%s", task.id, result)
 
         if task.callback is not None:
             try:
                 task.callback(error, result)
-                logger.debug(f"执行任务回调: ID={task.id}")
+                logger.debug("执行任务回调: ID=%s", task.id)
             except Exception as e:
-                logger.error(f"回调执行错误: ID={task.id}, 错误={e}")
+                logger.error("回调执行错误: ID=%s, 错误=%s", task.id, e)
 
     async def start(self):
-        logger.info(f"下载服务启动: 最大并发数={self._max_concurrent}")
+        logger.info("下载服务启动: 最大并发数=%s", self._max_concurrent)
         # 重新打开标记
         self._shutdown.clear()
 
         # 创建协程工作者
         workers = [asyncio.create_task(self._worker()) for _ in range(self._max_concurrent)]
-        logger.debug(f"已创建{len(workers)}个工作线程")
+        logger.debug("已创建%s个工作线程", len(workers))
 
         # 等待关机信号
         await self._shutdown.wait()
@@ -324,7 +440,7 @@ class DownloadService:
 
         # 等待剩余任务完成
         if not self._task_queue.empty():
-            logger.info(f"等待剩余{self._task_queue.qsize()}个任务完成")
+            logger.info("等待剩余%s个任务完成", self._task_queue.qsize())
             try:
                 # 设置超时，防止永久阻塞
                 await asyncio.wait_for(self._task_queue.join(), timeout=300)  # 5分钟超时
@@ -339,10 +455,25 @@ class DownloadService:
 
         # 等待所有 worker 退出
         await asyncio.gather(*workers, return_exceptions=True)
+        self._report_trace()
         logger.info("下载服务已关闭")
 
+    def _report_trace(self):
+        """输出本次运行各阶段的耗时分布，并导出 span 到 outputs 目录"""
+        if not tracer.spans():
+            return
+        logger.info("各阶段耗时统计:\n%s", tracer.format_summary())
+        if not self.export_trace:
+            return
+        trace_file = os.path.join(singleton.settings.outputs, f"trace-download-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        try:
+            count = tracer.export_jsonl(trace_file)
+            logger.info("已导出 %d 个 span 至 %s", count, trace_file)
+        except OSError as e:
+            logger.warning("导出 span 失败: %s", e)
+
     async def shutdown(self, wait_for_tasks=True, timeout=300):
-        logger.info(f"下载服务关闭中... 等待任务完成: {wait_for_tasks}, 超时: {timeout}秒")
+        logger.info("下载服务关闭中... 等待任务完成: %s, 超时: %s秒", wait_for_tasks, timeout)
 
         # 设置关闭标志，阻止新任务提交
         self._shutdown.set()
@@ -351,107 +482,253 @@ class DownloadService:
             # 如果不等待任务完成，清空队列
             while not self._task_queue.empty():
                 try:
-                    self._task_queue.get_nowait()
+                    task_id = self._task_queue.get_nowait()
                     self._task_queue.task_done()
                 except asyncio.QueueEmpty:
                     break
+                # 被丢弃的任务不再计入等待数量
+                if self._tasks.pop(task_id, None) is not None:
+                    self._pending_count -= 1
             logger.info("已清空任务队列，不等待任务完成")
 
     async def start_with_progress(self):
         logger.info("下载服务启动(带进度条)")
-        self._progress = create_download_progress()
+        self._progress = TransferProgress()
         with self._progress:
-            await self.start()
+            # 进度条按固定频率刷新，下载回调只更新数据
+            refresher = asyncio.create_task(self._progress.refresh_forever())
+            try:
+                await self.start()
+            finally:
+                refresher.cancel()
+
+    @staticmethod
+    def _catalog_entry(
+            source: Union[MessageRef, types.Message, str],
+            ref: Optional[MessageRef],
+            message: Optional[types.Message],
+            cache_key: str,
+            media_type: MediaTypes,
+            file_path: str,
+    ) -> CatalogEntry:
+        if ref is not None:
+            chat_id, message_id = ref.peer, ref.message_id
+        else:
+            chat_id, message_id = utils.get_peer_id(message.peer_id), message.id
+        return CatalogEntry(
+            key=cache_key,
+            source="telegram",
+            path=file_path,
+            size=os.path.getsize(file_path),
+            media_type=media_type.name.lower(),
+            mime=mimetypes.guess_type(file_path)[0],
+            origin=source if isinstance(source, str) else None,
+            chat_id=chat_id,
+            message_id=message_id,
+        )
+
+    async def _download_ref(self, ref: MessageRef, directory: str, progress_callback: Callable[[int, int], None]) -> str:
+        """按下载坐标下载转发给 bot 的媒体，坐标不可用时重新获取消息"""
+        location = ref.location
+        if location is not None:
+            path = os.path.join(directory, f"{ref.media_id}{ref.extension}")
+            try:
+                await self._bot.download_file(
+                    location, path, file_size=ref.size or None, dc_id=ref.dc_id, progress_callback=progress_callback
+                )
+                return path
+            except FileReferenceExpiredError:
+                logger.info("文件引用已过期，重新获取消息: ID=%s", ref.message_id)
+
+        message = await self._bot.get_messages(ref.peer, ids=ref.message_id)
+        if message is None or not message.media:
+            raise DownloadException(DownloadErrorCode.NotExistMedia, f"消息不包含媒体: {ref.message_id}")
+        return await self._bot.download_media(message, directory, progress_callback=progress_callback)
 
     # 底层的下载方法
-    async def _download_media(self, source: Union[types.Message, str]) -> TaskResult:
+    async def _download_media(
+            self, source: Union[MessageRef, types.Message, str], task: Optional[TaskDefinition] = None
+    ) -> TaskResult:
         """下载媒体文件并返回保存路径"""
+        if isinstance(source, str):
+            # 同一个链接同时只解析一次，媒体 id 在解析之后才知道
+            key = f"link:{normalize_telegram_link(source)}"
+            if task is not None and key in self._flights:
+                task.shared = True
+            result, shared = await self._flights.run(key, lambda: self._download_source(source, task))
+            if shared:
+                logger.info("同样的链接已由其他任务下载: %s -> %s", source, result)
+            return result
+        return await self._download_source(source, task)
+
+    async def _download_source(
+            self, source: Union[MessageRef, types.Message, str], task: Optional[TaskDefinition]
+    ) -> TaskResult:
         start_time = time.time()
         message = source
+        trace_id = task.id if task is not None else None
+        if task is not None:
+            # 执行者被取消后，等待的任务会重新执行，这时不再是共享的结果
+            task.shared = False
 
         if isinstance(source, str):
-            logger.info(f"解析Telegram链接: {source}")
-            message: types.Message = await fetch_message_by_link(client=self._client, link=source)
-            logger.debug(f"链接解析完成: {source} -> Message(id={message.id if message else 'None'})")
-
-        if message is None or not message.media:
+            logger.info("解析Telegram链接: %s", source)
+            with tracer.span("resolve", trace_id=trace_id, link=source):
+                try:
+                    message: types.Message = await fetch_message_by_link(client=self._client, link=source)
+                except FloodWaitError as e:
+                    singleton.throughput.record_flood_wait("telegram", e.seconds)
+                    raise
+            logger.debug("链接解析完成: %s -> Message(id=%s)", source, message.id if message else 'None')
+
+        if isinstance(source, MessageRef):
+            ref = source
+        elif message is None or not message.media:
             error_msg = f"消息不包含媒体或链接无效: {source}"
             logger.warning(error_msg)
             raise DownloadException(DownloadErrorCode.NotExistMedia, error_msg)
+        else:
+            ref = None
 
-        media_type = MediaTypes.from_message(message)
-        media_id = MediaTypes.get_media_if(message) or message.id
+        media_type = ref.media_type if ref else MediaTypes.from_message(message)
+        media_id = ref.media_id if ref else MediaTypes.get_media_if(message) or message.id
         cache_key = f"t-{media_id}"
 
-        logger.info(f"处理媒体: ID={media_id}, 类型={media_type}, 缓存键={cache_key}")
+        logger.info("处理媒体: ID=%s, 类型=%s, 缓存键=%s", media_id, media_type, cache_key)
 
         if not media_type.is_supported():
             error_msg = f"不支持的媒体类型: ID={media_id}, 类型={media_type}"
             logger.warning(error_msg)
             raise DownloadException(DownloadErrorCode.Unsupported, error_msg)
 
-        if message.media and getattr(message.media, "ttl_seconds", None):
+        if ref.ttl if ref else getattr(message.media, "ttl_seconds", None):
             error_msg = "这是阅后即焚媒体，不能下载"
             logger.warning(error_msg)
             raise DownloadException(DownloadErrorCode.Unsupported, error_msg)
 
-        if settings.use_cache and cache_manager.contains(cache_key):
-            logger.info(f"媒体已存在于缓存中: {cache_key}")
-            raise DownloadException(DownloadErrorCode.ExistInCache, f"媒体已存在于缓存中: {cache_key}")
-
-        # 控制下载速度
-        await sleep(0.5)
-
-        storage_dir = media_type.storage_dir()
-        logger.info(f"开始下载媒体: ID={media_id}, 存储目录={storage_dir}")
+        media_filter = singleton.media_filter
+        if media_filter.enabled:
+            # 链接与消息在这里才有元数据，转换为下载坐标后统一判断
+            meta = ref or MessageRef.from_message(message)
+            reason = media_filter.check(meta)
+            if reason is not None:
+                logger.info("媒体被过滤: ID=%s, %s", media_id, reason)
+                singleton.rejection_log.add(meta, reason, source=source if isinstance(source, str) else None)
+                raise DownloadException(DownloadErrorCode.Filtered, reason)
+
+        # 同一个媒体（例如转发了两次的图片）同时只下载一次，其他任务共享同一个文件路径
+        if task is not None and cache_key in self._flights:
+            task.shared = True
+        result, shared = await self._flights.run(
+            cache_key,
+            lambda: self._transfer_media(source, ref, message, media_type, media_id, cache_key, task, start_time),
+        )
+        if shared:
+            logger.info("同样的媒体已由其他任务下载: ID=%s, 文件路径=%s", media_id, result)
+        return result
+
+    async def _transfer_media(
+            self,
+            source: Union[MessageRef, types.Message, str],
+            ref: Optional[MessageRef],
+            message: Optional[types.Message],
+            media_type: MediaTypes,
+            media_id: int,
+            cache_key: str,
+            task: Optional[TaskDefinition],
+            start_time: float,
+    ) -> TaskResult:
+        trace_id = task.id if task is not None else None
+        if task is not None:
+            task.shared = False
+
+        with tracer.span("admission", trace_id=trace_id, media_id=media_id):
+            if singleton.settings.use_cache and self._cache_manager.contains(cache_key):
+                logger.info("媒体已存在于缓存中: %s", cache_key)
+                raise DownloadException(DownloadErrorCode.ExistInCache, f"媒体已存在于缓存中: {cache_key}")
+
+        # 控制下载速度，人为的等待单独计时，不计入 admission
+        with tracer.span("throttle", trace_id=trace_id, media_id=media_id):
+            await sleep(self.throttle_delay)
+
+        storage_dir = media_type.storage_dir(key=cache_key)
+        logger.info("开始下载媒体: ID=%s, 存储目录=%s", media_id, storage_dir)
 
         state = SimpleNamespace(total_bytes=0, downloaded_bytes=0, pid=None, last_log_time=time.time())
 
         if self._progress:
-            state.pid = self._progress.add_task(description=f"{media_type.name}_{media_id}", total=None)
-            logger.debug(f"创建进度条任务: ID={state.pid}, 描述={media_type.name}_{media_id}")
+            state.pid = self._progress.add(description=f"{media_type.name}_{media_id}")
 
         def progress_callback(num: int, total: int):
             state.total_bytes = total
             state.downloaded_bytes = num
+            if task is not None:
+                task.downloaded_bytes = num
+                if task.on_progress is not None:
+                    task.on_progress(num, total)
 
             if self._progress:
                 self._progress.update(state.pid, completed=num, total=total)
 
         try:
             with tempfile.TemporaryDirectory() as tempdir:
-                fn = self._client.download_media if isinstance(source, str) else self._bot.download_media
+                transfer_start = time.time()
+                with tracer.span("transfer", trace_id=trace_id, media_id=media_id) as span:
+                    if ref is not None:
+                        downloaded_path = await self._download_ref(ref, tempdir, progress_callback=progress_callback)
+                    else:
+                        fn = self._client.download_media if isinstance(source, str) else self._bot.download_media
+                        downloaded_path = await fn(message, tempdir, progress_callback=progress_callback)
+                    span.set(bytes=state.total_bytes)
+                transfer_seconds = time.time() - transfer_start
+
+                with tracer.span("finalize", trace_id=trace_id, media_id=media_id):
+                    if not downloaded_path or not os.path.exists(downloaded_path) or os.path.getsize(downloaded_path) == 0:
+                        raise DownloadException(DownloadErrorCode.Unknown, "Download failed or created empty file")
+
+                    # fix: 修复媒体文件覆盖的问题（同一组或同一个相册的媒体其文件名可能是相同的）
+                    # 原始文件路径可能重复，需加唯一标识
+                    _, file_extension = os.path.splitext(downloaded_path)
 
-                downloaded_path = await fn(message, tempdir, progress_callback=progress_callback)
-                if not downloaded_path or not os.path.exists(downloaded_path) or os.path.getsize(downloaded_path) == 0:
-                    raise DownloadException(DownloadErrorCode.Unknown, "Download failed or created empty file")
+                    # 使用媒体 ID 构造唯一的缓存 key
+                    new_filename = f"{cache_key}{file_extension}"
 
-                # fix: 修复媒体文件覆盖的问题（同一组或同一个相册的媒体其文件名可能是相同的）
-                # 原始文件路径可能重复，需加唯一标识
-                _, file_extension = os.path.splitext(downloaded_path)
+                    # 最终文件路径避免覆盖
+                    file_path = os.path.join(storage_dir, new_filename)
 
-                # 使用媒体 ID 构造唯一的缓存 key
-                new_filename = f"{cache_key}{file_extension}"
+                    # 拷贝或移动文件
+                    shutil.move(downloaded_path, file_path)
 
-                # 最终文件路径避免覆盖
-                file_path = os.path.join(storage_dir, new_filename)
+                    self._cache_manager.set(cache_key)
 
-                # 拷贝或移动文件
-                shutil.move(downloaded_path, file_path)
+                    catalog = singleton.catalog
+                    if catalog is not None:
+                        catalog.record(self._catalog_entry(source, ref, message, cache_key, media_type, file_path))
+
+                # 文件保存成功后才记为成功的传输，空文件等失败只记一次失败
+                singleton.throughput.record("telegram", size=state.total_bytes, seconds=transfer_seconds)
+
+            pipeline = post_processor()
+            if pipeline is not None:
+                try:
+                    with tracer.span("postprocess", trace_id=trace_id, media_id=media_id):
+                        await pipeline.submit_async(file_path, key=cache_key)
+                except Exception as e:
+                    # 文件已经保存并计入成功，提交后处理失败不影响下载结果
+                    logger.warning("提交后处理失败: %s, %s", file_path, e)
 
             elapsed = time.time() - start_time
 
             if self._progress:
-                self._progress.update(state.pid, completed=state.total_bytes, total=state.total_bytes)
+                self._progress.finish(state.pid)
 
-            cache_manager.set(cache_key)
+            if task is not None:
+                task.downloaded_bytes = state.total_bytes
 
             speed = state.total_bytes / elapsed / 1024 if elapsed > 0 else 0
             logger.info(
-                f"媒体下载成功: ID={media_id}, 文件路径={file_path}, "
-                f"大小={state.total_bytes / 1024 / 1024:.2f}MB, "
-                f"耗时={elapsed:.2f}秒, "
-                f"平均速度={speed:.2f}KB/s"
+                "媒体下载成功: ID=%s, 文件路径=%s, 大小=%.2fMB, 耗时=%.2f秒, 平均速度=%.2fKB/s",
+                media_id, file_path, state.total_bytes / 1024 / 1024, elapsed, speed,
             )
             return file_path
 
@@ -459,11 +736,15 @@ class DownloadService:
             logger.info(e)
             elapsed = time.time() - start_time
             if self._progress:
-                self._progress.update(state.pid, failed=True)
+                self._progress.fail(state.pid)
+
+            error = DownloadException.from_error(e)
+            singleton.throughput.record("telegram", error_code=error.error_code.value)
+            if isinstance(e, FloodWaitError):
+                singleton.throughput.record_flood_wait("telegram", e.seconds)
 
             logger.error(
-                f"媒体下载失败: ID={media_id}, 错误={str(e)}, "
-                f"已下载={state.downloaded_bytes / 1024 / 1024:.2f}MB, "
-                f"耗时={elapsed:.2f}秒",
+                "媒体下载失败: ID=%s, 错误=%s, 已下载=%.2fMB, 耗时=%.2f秒",
+                media_id, e, state.downloaded_bytes / 1024 / 1024, elapsed,
             )
-            raise DownloadException.from_error(e)
+            raise error
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import fnmatch
+from threading import Lock
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    # singleton 导入本模块，media_types 又导入 singleton，这里不能在运行时导入
+    from app.telegram.message_ref import MessageRef
+
+# 下载前的媒体过滤
+# - 在传输之前按消息元数据判断：媒体类型、mime、文件大小、时长、文件名、来源会话
+# - 满足任意一条 exclude 规则的媒体不下载；配置了 include 时，只下载满足任意一条 include 规则的媒体
+# - 同一条规则内的条件需要同时满足；元数据缺失时（例如图片没有文件名）对应的条件视为不满足
+# - 被过滤的媒体以 JSON Lines 记录原因
+
+_MB = 1024 * 1024
+
+
+@dataclass
+class FilterRule:
+    # 媒体类型，小写的 MediaTypes 名称，例如 audio、voice、document
+    types: list[str] = field(default_factory=list)
+    # mime 的通配符，例如 application/x-rar*、audio/*
+    mime: list[str] = field(default_factory=list)
+    # 文件名的通配符，不区分大小写，例如 *.iso
+    names: list[str] = field(default_factory=list)
+    # 来源会话的 id（与媒体索引中的 chat_id 相同，频道为 -100 开头）
+    chats: list[int] = field(default_factory=list)
+    # 文件大小（字节）
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    # 音视频时长（秒）
+    min_duration: Optional[float] = None
+    max_duration: Optional[float] = None
+
+    def matches(self, ref: "MessageRef") -> bool:
+        if self.types and ref.media_type.name.lower() not in self.types:
+            return False
+        if self.mime and not (ref.mime_type and any(fnmatch.fnmatch(ref.mime_type.lower(), p) for p in self.mime)):
+            return False
+        if self.names and not (ref.file_name and any(fnmatch.fnmatch(ref.file_name.lower(), p) for p in self.names)):
+            return False
+        if self.chats and ref.peer not in self.chats:
+            return False
+        if self.min_size is not None and not (ref.size and ref.size >= self.min_size):
+            return False
+        if self.max_size is not None and not (ref.size and ref.size <= self.max_size):
+            return False
+        if self.min_duration is not None and not (ref.duration is not None and ref.duration >= self.min_duration):
+            return False
+        if self.max_duration is not None and not (ref.duration is not None and ref.duration <= self.max_duration):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.types:
+            parts.append(f"类型={','.join(self.types)}")
+        if self.mime:
+            parts.append(f"mime={','.join(self.mime)}")
+        if self.names:
+            parts.append(f"文件名={','.join(self.names)}")
+        if self.chats:
+            parts.append(f"会话={','.join(str(chat) for chat in self.chats)}")
+        if self.min_size is not None:
+            parts.append(f"大小>={self.min_size / _MB:g}MB")
+        if self.max_size is not None:
+            parts.append(f"大小<={self.max_size / _MB:g}MB")
+        if self.min_duration is not None:
+            parts.append(f"时长>={self.min_duration:g}秒")
+        if self.max_duration is not None:
+            parts.append(f"时长<={self.max_duration:g}秒")
+        return ", ".join(parts) or "全部"
+
+    @staticmethod
+    def parse(data: dict) -> "FilterRule":
+        def as_list(value) -> list:
+            if value is None:
+                return []
+            return list(value) if isinstance(value, (list, tuple)) else [value]
+
+        def size(key: str) -> Optional[int]:
+            value = data.get(key, None)
+            return int(float(value) * _MB) if value is not None else None
+
+        def seconds(key: str) -> Optional[float]:
+            value = data.get(key, None)
+            return float(value) if value is not None else None
+
+        from app.telegram.media_types import MediaTypes
+
+        names = {media_type.name.lower() for media_type in MediaTypes}
+        types = [str(item).lower() for item in as_list(data.get("types", None))]
+        for item in types:
+            if item not in names:
+                raise ValueError(f"不支持的媒体类型 {item}，可选值: {', '.join(sorted(names))}")
+
+        return FilterRule(
+            types=types,
+            mime=[str(item).lower() for item in as_list(data.get("mime", None))],
+            names=[str(item).lower() for item in as_list(data.get("names", None))],
+            chats=[int(item) for item in as_list(data.get("chats", None))],
+            min_size=size("min_size_mb"),
+            max_size=size("max_size_mb"),
+            min_duration=seconds("min_duration"),
+            max_duration=seconds("max_duration"),
+        )
+
+
+@dataclass
+class MediaFilter:
+    include: list[FilterRule] = field(default_factory=list)
+    exclude: list[FilterRule] = field(default_factory=list)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def check(self, ref: "MessageRef") -> Optional[str]:
+        """返回过滤的原因，允许下载时返回 None"""
+        for index, rule in enumerate(self.exclude, start=1):
+            if rule.matches(ref):
+                return f"命中排除规则 #{index}（{rule.describe()}）"
+        if self.include and not any(rule.matches(ref) for rule in self.include):
+            return "不满足任何包含规则"
+        return None
+
+    @staticmethod
+    def parse(data: Optional[dict]) -> "MediaFilter":
+        data = data or {}
+        return MediaFilter(
+            include=[FilterRule.parse(item or {}) for item in data.get("include", None) or []],
+            exclude=[FilterRule.parse(item or {}) for item in data.get("exclude", None) or []],
+        )
+
+
+class RejectionLog:
+    """被过滤的媒体，以 JSON Lines 追加写入"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+
+    def add(self, ref: "MessageRef", reason: str, source: Optional[str] = None) -> None:
+        record: dict[str, Any] = {
+            "time": time.time(),
+            "key": f"t-{ref.media_id}",
+            "chat_id": ref.peer,
+            "message_id": ref.message_id,
+            "media_type": ref.media_type.name.lower(),
+            "mime": ref.mime_type,
+            "file_name": ref.file_name,
+            "size": ref.size,
+            "duration": ref.duration,
+            "source": source,
+            "reason": reason,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+__all__ = ["FilterRule", "MediaFilter", "RejectionLog"]
@@ -1,7 +1,7 @@
 from typing import Set
 from urllib.parse import urlparse
 
-from app.telegram.singleton import settings
+from app.telegram import singleton
 
 
 def is_valid_url(url: str) -> bool:
@@ -12,7 +12,7 @@ def is_valid_url(url: str) -> bool:
 def get_links_for_configure_or_raise() -> Set[str]:
     urls: Set[str] = set()
 
-    with open(settings.urls_path, 'r') as file:
+    with open(singleton.settings.urls_path, 'r') as file:
         for line in file.readlines():
             line = line.strip()
             if not line:
@@ -0,0 +1,195 @@
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Hashable
+
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError, MessageNotModifiedError
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 单条消息的长度上限
+_MAX_MESSAGE_LENGTH = 4096
+# 最终消息中最多列出的失败项
+_MAX_FAILED_LINES = 20
+
+
+@dataclass
+class _Item:
+    label: str
+    downloaded: int = 0
+    total: Optional[int] = None
+    # None 表示还在下载
+    success: Optional[bool] = None
+    error: Optional[str] = None
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}分{seconds}秒" if minutes else f"{seconds}秒"
+
+
+class JobStatusMessage:
+    """
+    一个下载任务（一批链接、一个相册或连续转发的媒体）对应的状态消息
+    - 开始时回复一条消息，之后只编辑这条消息显示进度
+    - 进度变化按 min_interval 合并成一次编辑，避免触发 Telegram 的编辑频率限制
+    - 所有项完成后写入最终结果
+    """
+
+    # 两次编辑之间的最小间隔（秒）
+    min_interval: float = 3.0
+
+    def __init__(self, bot: TelegramClient, peer_id, reply_to: int, title: str):
+        self.bot = bot
+        self.peer_id = peer_id
+        self.reply_to = reply_to
+        self.title = title
+        self.started_at = time.time()
+        self._items: dict[Hashable, _Item] = {}
+        self._message = None
+        self._last_text: Optional[str] = None
+        self._last_edit = 0.0
+        self._dirty = asyncio.Event()
+        self._updater: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for item in self._items.values() if item.success is None)
+
+    def add(self, key: Hashable, label: str) -> None:
+        self._items[key] = _Item(label=label)
+        self._dirty.set()
+
+    def progress(self, key: Hashable, downloaded: int, total: Optional[int]) -> None:
+        # 下载回调里调用，只更新数据
+        item = self._items.get(key)
+        if item is not None:
+            item.downloaded = downloaded
+            item.total = total
+            self._dirty.set()
+
+    def done(self, key: Hashable, success: bool, error: Optional[str] = None) -> None:
+        item = self._items.get(key)
+        if item is not None:
+            item.success = success
+            item.error = error
+            if success and item.total:
+                item.downloaded = item.total
+            self._dirty.set()
+
+    async def start(self) -> None:
+        text = self._render()
+        try:
+            self._message = await self.bot.send_message(entity=self.peer_id, message=text, reply_to=self.reply_to)
+            self._last_text = text
+            self._last_edit = time.monotonic()
+        except Exception as e:
+            logger.error("发送状态消息失败: %s", e, exc_info=True)
+        self._dirty.clear()
+        self._updater = asyncio.create_task(self._update_forever())
+
+    async def finish(self) -> None:
+        self._closed = True
+        if self._updater is not None:
+            self._updater.cancel()
+            try:
+                await self._updater
+            except asyncio.CancelledError:
+                pass
+
+        text = self._render(final=True)
+        if self._message is None:
+            # 开始时发送失败，最后再尝试发送一次结果
+            try:
+                await self.bot.send_message(entity=self.peer_id, message=text, reply_to=self.reply_to)
+            except Exception as e:
+                logger.error("发送状态消息失败: %s", e, exc_info=True)
+            return
+
+        # 最终结果必须写入，不受编辑间隔限制，但仍然遵守 FloodWait
+        await self._edit(text)
+
+    async def _update_forever(self) -> None:
+        while True:
+            await self._dirty.wait()
+            wait = self.min_interval - (time.monotonic() - self._last_edit)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # 等待期间的所有变化合并成一次编辑
+            self._dirty.clear()
+            if self._message is not None:
+                await self._edit(self._render())
+
+    async def _edit(self, text: str) -> None:
+        if text == self._last_text:
+            return
+        while True:
+            try:
+                await self.bot.edit_message(entity=self.peer_id, message=self._message.id, text=text)
+                break
+            except MessageNotModifiedError:
+                break
+            except FloodWaitError as e:
+                logger.warning("编辑状态消息触发 FloodWait，等待 %s 秒", e.seconds)
+                await asyncio.sleep(e.seconds)
+            except Exception as e:
+                logger.error("编辑状态消息失败: %s", e)
+                break
+        self._last_text = text
+        self._last_edit = time.monotonic()
+
+    def _render(self, final: bool = False) -> str:
+        items = list(self._items.values())
+        total = len(items)
+        succeeded = sum(1 for item in items if item.success is True)
+        failed = sum(1 for item in items if item.success is False)
+        finished = succeeded + failed
+        downloaded = sum(item.downloaded for item in items)
+        known_total = sum(item.total or item.downloaded for item in items)
+        elapsed = time.time() - self.started_at
+
+        header = "📊" if final else "📥"
+        lines = [f"{header} {self.title}{'完成' if final else '中'} ({finished}/{total})"]
+        lines.append(f"✅ 成功 {succeeded}  ❌ 失败 {failed}")
+        if known_total:
+            lines.append(f"📦 {_format_size(downloaded)} / {_format_size(known_total)}")
+
+        if final:
+            lines.append(f"⏱️ 耗时 {_format_seconds(elapsed)}")
+        elif finished:
+            remaining = elapsed / finished * (total - finished)
+            lines.append(f"⏱️ 已用 {_format_seconds(elapsed)} · 预计剩余 {_format_seconds(remaining)}")
+        else:
+            lines.append(f"⏱️ 已用 {_format_seconds(elapsed)}")
+
+        if final and failed:
+            lines.append("")
+            failures = [item for item in items if item.success is False]
+            for item in failures[:_MAX_FAILED_LINES]:
+                lines.append(f"❌ {item.label}\n⚠️ {item.error}")
+            if len(failures) > _MAX_FAILED_LINES:
+                lines.append(f"... 另有 {len(failures) - _MAX_FAILED_LINES} 项失败")
+
+        text = "\n".join(lines)
+        if len(text) > _MAX_MESSAGE_LENGTH:
+            text = text[:_MAX_MESSAGE_LENGTH - 3] + "..."
+        return text
+
+
+__all__ = ["JobStatusMessage"]
@@ -123,6 +123,21 @@ def parse_telegram_link(link: str) -> TelegramLinkInfo:
         raise InvalidTelegramLinkError(f"Error parsing Telegram link '{link}': {e}")
 
 
+def normalize_telegram_link(link: str) -> str:
+    """
+    同一条消息的不同写法规范化为同一个字符串，用于合并重复的链接
+    - 忽略协议、大小写的域名、www.、telegram.me 别名与末尾的 /
+    - 只保留 thread、comment 参数，按名称排序
+    """
+    parsed = urlparse(link.strip())
+    host = parsed.netloc.lower().removeprefix("www.")
+    if host == "telegram.me":
+        host = "t.me"
+    query = parse_qs(parsed.query)
+    params = "&".join(f"{name}={query[name][0]}" for name in ("comment", "thread") if name in query)
+    return f"{host}{parsed.path.rstrip('/').lower()}" + (f"?{params}" if params else "")
+
+
 async def fetch_message_by_link(client: TelegramClient, link: str) -> types.Message:
     link_info = parse_telegram_link(link=link)
     message = await link_info.resolve_message(client)
@@ -135,5 +150,6 @@ __all__ = [
     "TelegramLinkInfo",
     "InvalidTelegramLinkError",
     "parse_telegram_link",
+    "normalize_telegram_link",
     "fetch_message_by_link",
 ]
@@ -1,10 +1,10 @@
-import os
 from typing import  Optional
 from pathlib import Path
 from enum import Enum, auto
 from telethon.tl.custom.message import Message
 
-from app.twitter.singleton import settings
+from app.infra.storage_layout import ensure_dir, shard_dir
+from app.telegram import singleton
 
 
 class MediaTypes(Enum):
@@ -26,7 +26,9 @@ class MediaTypes(Enum):
     def is_supported(self) -> bool:
         return self != MediaTypes.UNKNOWN
 
-    def storage_dir(self) -> str:
+    def storage_dir(self, key: Optional[str] = None) -> str:
+        """指定 key 时返回分片后的目录"""
+        settings = singleton.settings
         base = Path(settings.storage_directory) / "telegram"
         match self:
             case MediaTypes.PHOTO:
@@ -42,9 +44,10 @@ class MediaTypes(Enum):
             case _:
                 subdir = "documents"
 
-        full_path = base / subdir
-        os.makedirs(full_path, exist_ok=True)
-        return str(full_path)
+        full_path = str(base / subdir)
+        if key is not None:
+            full_path = shard_dir(full_path, key, settings.storage_shards)
+        return ensure_dir(full_path)
 
     @staticmethod
     def get_media_if(message: Message) -> Optional[str]:
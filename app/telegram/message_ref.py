@@ -0,0 +1,131 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from telethon import utils
+from telethon.tl import types
+
+from app.telegram.media_types import MediaTypes
+
+InputLocation = Union[types.InputDocumentFileLocation, types.InputPhotoFileLocation]
+
+
+@dataclass(slots=True, frozen=True)
+class MessageRef:
+    """
+    转发给 bot 的媒体消息的下载坐标
+    - 排队时只保存下载需要的几个字段，不持有 Message 对象（实体、转发信息、缩略图等）
+    - 下载时直接使用文件位置，file_reference 过期时再通过 peer 与 message_id 重新获取消息
+    """
+    # utils.get_peer_id 得到的整数 id
+    peer: int
+    message_id: int
+    media_id: int
+    media_type: MediaTypes
+    # 阅后即焚媒体
+    ttl: bool = False
+    size: int = 0
+    extension: str = ""
+    # 文件位置，dc_id 为 None 时表示没有可直接下载的文件
+    dc_id: Optional[int] = None
+    access_hash: int = 0
+    file_reference: bytes = b""
+    # 图片的尺寸类型，None 表示文档
+    thumb_size: Optional[str] = None
+    # 下载前过滤使用的元数据
+    mime_type: Optional[str] = None
+    file_name: Optional[str] = None
+    # 音视频的时长（秒）
+    duration: Optional[float] = None
+
+    @property
+    def location(self) -> Optional[InputLocation]:
+        if self.dc_id is None:
+            return None
+        if self.thumb_size is None:
+            return types.InputDocumentFileLocation(
+                id=self.media_id, access_hash=self.access_hash, file_reference=self.file_reference, thumb_size=""
+            )
+        return types.InputPhotoFileLocation(
+            id=self.media_id, access_hash=self.access_hash, file_reference=self.file_reference,
+            thumb_size=self.thumb_size,
+        )
+
+    @staticmethod
+    def from_message(message: types.Message) -> Optional["MessageRef"]:
+        """没有媒体时返回 None"""
+        media = message.media
+        if not media:
+            return None
+
+        ref = MessageRef(
+            peer=utils.get_peer_id(message.peer_id),
+            message_id=message.id,
+            media_id=MediaTypes.get_media_if(message) or message.id,
+            media_type=MediaTypes.from_message(message),
+            ttl=bool(getattr(media, "ttl_seconds", None)),
+            extension=_extension(media),
+        )
+        # 与 TelegramClient.download_media 选择的文件保持一致：文档下载原文件，图片下载最大的尺寸
+        if isinstance(media, types.MessageMediaDocument) and isinstance(media.document, types.Document):
+            document = media.document
+            file_name = duration = None
+            for attribute in document.attributes:
+                if isinstance(attribute, types.DocumentAttributeFilename):
+                    file_name = attribute.file_name
+                elif isinstance(attribute, (types.DocumentAttributeVideo, types.DocumentAttributeAudio)):
+                    duration = attribute.duration
+            # 与 telethon 下载时一样优先使用原文件名的扩展名，application/octet-stream 等类型按 MIME 得不到扩展名
+            extension = os.path.splitext(file_name)[1] if file_name else ""
+            return _with_file(ref, document, size=document.size, thumb_size=None, mime_type=document.mime_type,
+                              file_name=file_name, duration=duration, extension=extension or ref.extension)
+
+        if isinstance(media, types.MessageMediaPhoto) and isinstance(media.photo, types.Photo):
+            photo = media.photo
+            sizes = [size for size in photo.sizes if isinstance(size, (types.PhotoSize, types.PhotoSizeProgressive))]
+            if sizes:
+                largest = max(sizes, key=_photo_size_bytes)
+                return _with_file(ref, photo, size=_photo_size_bytes(largest), thumb_size=largest.type,
+                                  mime_type="image/jpeg")
+
+        # 其他媒体（网页预览、联系人等）下载时再获取消息
+        return ref
+
+
+def _with_file(ref: MessageRef, file: Union[types.Document, types.Photo], size: int, thumb_size: Optional[str],
+               mime_type: Optional[str] = None, file_name: Optional[str] = None,
+               duration: Optional[float] = None, extension: Optional[str] = None) -> MessageRef:
+    return MessageRef(
+        peer=ref.peer,
+        message_id=ref.message_id,
+        media_id=file.id,
+        media_type=ref.media_type,
+        ttl=ref.ttl,
+        size=size,
+        extension=ref.extension if extension is None else extension,
+        dc_id=file.dc_id,
+        access_hash=file.access_hash,
+        file_reference=file.file_reference,
+        thumb_size=thumb_size,
+        mime_type=mime_type,
+        file_name=file_name,
+        duration=duration,
+    )
+
+
+def _photo_size_bytes(size) -> int:
+    if isinstance(size, types.PhotoSizeProgressive):
+        return max(size.sizes)
+    if isinstance(size, types.PhotoSize):
+        return size.size
+    return 0
+
+
+def _extension(media) -> str:
+    try:
+        return utils.get_extension(media)
+    except Exception:
+        return ""
+
+
+__all__ = ["MessageRef"]
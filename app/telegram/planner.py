@@ -0,0 +1,65 @@
+import asyncio
+from typing import Optional
+from telethon import TelegramClient
+
+from app.infra.cache import CacheManager
+from app.infra.logger import getLogger
+from app.infra.planning import PlanSummary
+from app.telegram.link_parser import fetch_message_by_link
+from app.telegram.message_ref import MessageRef
+from app.telegram import singleton
+
+logger = getLogger(__name__)
+
+
+class TelegramPlanner:
+    """
+    不下载文件，估算一次运行的下载量
+    - 并发解析链接，大小取自消息元数据（document.size 或图片最大尺寸的大小），与下载时选择的文件一致
+    - 不支持的媒体、阅后即焚媒体与无法解析的链接计入无法下载，下载前的过滤规则同样生效
+    """
+
+    def __init__(self, client: TelegramClient, cache_manager: Optional[CacheManager] = None,
+                 max_concurrent: Optional[int] = None):
+        self.client = client
+        self.cache_manager = cache_manager if cache_manager is not None else singleton.cache_manager
+        self.max_concurrent = max_concurrent or singleton.settings.max_concurrent
+
+    async def run(self, links: list[str]) -> PlanSummary:
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def resolve(link: str) -> Optional[MessageRef]:
+            async with semaphore:
+                try:
+                    message = await fetch_message_by_link(client=self.client, link=link)
+                except Exception as e:
+                    logger.warning("解析链接失败: %s, %s", link, e)
+                    return None
+            return MessageRef.from_message(message) if message is not None else None
+
+        refs = await asyncio.gather(*(resolve(link) for link in links))
+
+        summary = PlanSummary(source="telegram")
+        use_cache = singleton.settings.use_cache
+        media_filter = singleton.media_filter
+        seen: set[str] = set()
+        for link, ref in zip(links, refs):
+            if ref is None or not ref.media_type.is_supported() or ref.ttl:
+                logger.debug("无法下载: %s", link)
+                summary.skipped += 1
+                continue
+            if media_filter.enabled and media_filter.check(ref) is not None:
+                summary.filtered += 1
+                continue
+            key = f"t-{ref.media_id}"
+            if use_cache and self.cache_manager.contains(key):
+                summary.cache_hits += 1
+            elif key in seen:
+                summary.duplicates += 1
+            else:
+                seen.add(key)
+                summary.add(ref.media_type.name.lower(), ref.size)
+        return summary
+
+
+__all__ = ["TelegramPlanner"]
@@ -1,12 +1,64 @@
+from typing import Optional
+
 from app.infra.cache import CacheManager
+from app.infra.catalog import MediaCatalog
+from app.infra.persistent import open_storage
+from app.infra.registry import LazyRegistry
+from app.infra.throughput import ThroughputRecorder
 from app.telegram.configure import Settings
+from app.telegram.filters import MediaFilter, RejectionLog
 from app.telegram.state import AppState
 
+# 全局对象在第一次访问时才创建，导入本模块不会解析配置或者加载缓存
+# 使用方式：
+#   from app.telegram import singleton
+#   singleton.settings.api_id
+registry = LazyRegistry()
+
 # 这里是全局公用的配置
-settings = Settings.create()
+settings: Settings
+registry.register("settings", Settings.create)
 
 # 全局状态
-appState = AppState(persistent_path=settings.outputs+'/state.txt')
+appState: AppState
+
+
+def _create_app_state() -> AppState:
+    settings = registry.get("settings")
+    legacy = settings.outputs + "/state.txt"
+    if settings.state_backend != "sqlite":
+        return AppState(open_storage(legacy, backend=settings.state_backend))
+    storage = open_storage(settings.outputs + "/state.db", backend="sqlite")
+    # 从 file 切换到 sqlite 时，第一次打开导入 state.txt 中的累计统计
+    storage.import_json(legacy)
+    return AppState(storage)
+
+
+registry.register("appState", _create_app_state)
+
+# 全局缓存器-只加载 telegram 的缓存
+cache_manager: CacheManager
+registry.register("cache_manager", lambda: CacheManager(cache_file=registry.get("settings").cache_file, prefix="t-"))
+
+# 全局媒体索引-没有开启时为 None
+catalog: Optional[MediaCatalog]
+registry.register(
+    "catalog",
+    lambda: MediaCatalog(registry.get("settings").catalog_file) if registry.get("settings").use_catalog else None,
+)
+
+# 按分钟统计的下载吞吐量，twitter 与 telegram 共用同一个数据库
+throughput: ThroughputRecorder
+registry.register("throughput", lambda: ThroughputRecorder(registry.get("settings").outputs + "/throughput.db"))
+
+# 下载前的媒体过滤
+media_filter: MediaFilter
+registry.register("media_filter", lambda: MediaFilter.parse(registry.get("settings").filters))
+
+# 被过滤的媒体记录
+rejection_log: RejectionLog
+registry.register("rejection_log", lambda: RejectionLog(registry.get("settings").outputs + "/telegram-filtered.jsonl"))
+
 
-# 全局缓存器
-cache_manager = CacheManager(cache_file=settings.cache_file)
+def __getattr__(name: str):
+    return registry.getattr(__name__, name)
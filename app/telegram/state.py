@@ -1,10 +1,9 @@
-import pickledb
-
-from app.infra.persistent import DefaultStorage, BasePersistent, persisted
+from app.infra.persistent import BasePersistentStorage, BasePersistent, persisted
 
 
 # 不是线程安全的
 # 因为内部都是同步方法，加同步锁会影响性能，异步锁会导致都是异步的
+# 持久化的计数器通过存储的 incr 累加，本身是原子的
 class AppState(BasePersistent):
     # 持久化的属性
     # 自程序上线以来的数据统计
@@ -17,5 +16,16 @@ class AppState(BasePersistent):
     session_failed_downloads: int = 0
     session_success_downloads: int = 0
 
-    def __init__(self, persistent_path: str):
-        super().__init__(DefaultStorage(pickledb.load(persistent_path, False)))
+    def __init__(self, storage: BasePersistentStorage):
+        super().__init__(storage)
+
+    def record_download(self, success: bool):
+        """记录一次下载结果，只修改内存与存储中对应的计数，不会重写整个状态文件"""
+        self.session_total_downloads += 1
+        self._incr("lifetime_total_downloads")
+        if success:
+            self.session_success_downloads += 1
+            self._incr("lifetime_success_downloads")
+        else:
+            self.session_failed_downloads += 1
+            self._incr("lifetime_failed_downloads")
@@ -1,9 +1,47 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Optional, Tuple
 
 from app.infra.yml import parse_from
 from app.infra.utils import is_empty
+from app.infra.storage_layout import MAX_SHARD_LEVELS
+from app.infra.http_pool import TransportSettings
 from app.infra.path import resolve_path, parse_proxy_link
+from app.twitter.pagination import MAX_PAGE_SIZE
+from app.twitter.variants import PhotoPolicySettings, VideoPolicySettings
+
+# 支持的时间线
+# - likes: 点赞
+# - media: 用户发布的媒体
+TIMELINE_MODES = ("likes", "media")
+
+
+@dataclass
+class CrawlAccount:
+    # twitter 的账号 - @符号后面的部分
+    screen_name: str
+    # 需要下载的时间线
+    modes: list[str] = field(default_factory=lambda: ["likes"])
+
+    @staticmethod
+    def parse(item) -> "CrawlAccount":
+        # 只写账号时默认下载点赞
+        if isinstance(item, str):
+            item = {"screen_name": item}
+
+        screen_name = (item.get("screen_name") or "").strip().lstrip("@")
+        if is_empty(screen_name):
+            raise ValueError(f"accounts 中存在没有 screen_name 的账号: {item}")
+
+        modes = item.get("modes") or ["likes"]
+        if isinstance(modes, str):
+            modes = [modes]
+        for mode in modes:
+            if mode not in TIMELINE_MODES:
+                raise ValueError(f"不支持的时间线 {mode}，可选值: {', '.join(TIMELINE_MODES)}")
+
+        # 去重并保持顺序
+        return CrawlAccount(screen_name=screen_name, modes=list(dict.fromkeys(modes)))
 
 
 @dataclass
@@ -37,6 +75,12 @@ class Settings:
     # - 如果目录不存在，会自动创建，目录的路径需要是绝对路径或者是相对于 README.md 所在目录的路径
     storage_directory: str
 
+    # 存储目录的分片层级（可选）
+    # - 默认: 0，每种类型的文件放在同一个目录中
+    # - 1 或 2: 按媒体 key 的哈希前缀再分 1~2 级子目录，每级 256 个
+    # - 修改后使用 pixi run migrate-storage 移动已有的文件
+    storage_shards: int
+
     # cookie 中的字段 - 必填
     ct0: str
 
@@ -52,10 +96,58 @@ class Settings:
     # 只下载视频（可选）
     only_video: bool
 
+    # 直接解析时间线的原始 JSON（可选）
+    # - 默认: False
+    # - 跳过 twitter-openapi 的模型构造，大页面时可以减少解析的 CPU 开销
+    fast_path: bool
+
+    # 时间线每页请求的推文数量（可选）
+    # - 默认: 20
+    # - 最大: 100
+    page_size: int
+
+    # 是否自适应调整页大小（可选）
+    # - 默认: False
+    # - 请求又快又成功时逐步增大到最大值，超时或限流时减小
+    adaptive_page_size: bool
+
+    # 媒体索引数据库的路径（可选）
+    # - 默认: 在当前目录下创建 catalog.db
+    # - 每个下载完成的文件都会写入一条记录，可以使用 pixi run catalog 查询
+    catalog_file: str
+
+    # 是否写入媒体索引（可选）
+    # - 默认: True
+    use_catalog: bool
+
+    # 需要下载的账号与时间线（可选）
+    # - 默认: 只下载 screen_name 的点赞
+    # - 多个账号会共享下载线程池，按账号轮流调度
+    accounts: list[CrawlAccount]
+
+    # 视频清晰度的选择策略（可选）
+    # - 默认: 下载码率最高的版本
+    # - 可以限制码率与预估大小，按账号覆盖，降级下载的视频可以之后再升级
+    video_policy: VideoPolicySettings
+
+    # 图片尺寸与格式的选择策略（可选）
+    # - 默认: 下载原图
+    # - 可以指定尺寸名称与格式，按原图尺寸与账号选择，非原图可以之后再升级
+    photo_policy: PhotoPolicySettings
+
+    # 下载媒体的 HTTP 连接池（可选）
+    # - 默认: 每个 host 的连接数与 max_concurrent 相同，缓存 DNS 5 分钟，启动时预先建立到 CDN 的连接
+    transport: TransportSettings
+
+    # 一些文件输出目录
+    outputs: str = resolve_path("./outputs")
+
     @staticmethod
     def create() -> "Settings":
         data = parse_from(path=resolve_path("./configure.yml"))
 
+        Path(Settings.outputs).mkdir(parents=True, exist_ok=True)
+
         proxy_tuple = None
         proxy = data.get("proxy", None)
         if not is_empty(proxy):
@@ -69,6 +161,10 @@ class Settings:
         if is_empty(ct0) or is_empty(auth_token) or is_empty(screen_name):
             raise ValueError("ct0 or auth_token or screen_name 存在 None 值")
 
+        accounts = [CrawlAccount.parse(item) for item in data.get("twitter", {}).get("accounts", None) or []]
+        if not accounts:
+            accounts = [CrawlAccount(screen_name=screen_name.strip())]
+
         return Settings(
             proxy=proxy,
             ct0=ct0.strip(),
@@ -79,6 +175,16 @@ class Settings:
             use_cache=not data.get("cache_disabled", False),
             only_image=data.get("twitter", {}).get("only_image", False),
             only_video=data.get("twitter", {}).get("only_video", False),
+            fast_path=data.get("twitter", {}).get("fast_path", False),
+            page_size=min(max(1, int(data.get("twitter", {}).get("page_size", 20))), MAX_PAGE_SIZE),
+            adaptive_page_size=data.get("twitter", {}).get("adaptive_page_size", False),
+            accounts=accounts,
+            video_policy=VideoPolicySettings.parse(data.get("twitter", {}).get("video_policy", None)),
+            photo_policy=PhotoPolicySettings.parse(data.get("twitter", {}).get("photo_policy", None)),
+            transport=TransportSettings.parse(data.get("twitter", {}).get("http", None)),
             cache_file=resolve_path(data.get("cache_file", "./caches.txt").strip()),
+            catalog_file=resolve_path(data.get("catalog_file", "./catalog.db").strip()),
+            use_catalog=not data.get("catalog_disabled", False),
             storage_directory=resolve_path(data.get("storage_directory", "./downloads").strip()),
+            storage_shards=min(max(int(data.get("storage_shards", 0)), 0), MAX_SHARD_LEVELS),
         )
@@ -0,0 +1,225 @@
+import time
+from collections import deque
+from threading import Condition
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.api.twitter import TwitterAPI
+from app.infra.cache import CacheManager
+from app.infra.logger import getLogger
+from app.twitter.configure import CrawlAccount
+from app.twitter.executor import ThreadedExecutor
+from app.twitter.models import UserInfo, MediaInfo
+from app.twitter.progress import ProgressManager
+from app.twitter.downloader import TwitterLikesMediaDownloader
+from app.twitter import singleton
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class CrawlTask:
+    """一个账号的一条时间线"""
+    screen_name: str
+    mode: str
+    downloader: Optional[TwitterLikesMediaDownloader] = None
+    # 已获取但还没有开始下载的媒体
+    queue: deque[MediaInfo] = field(default_factory=deque)
+    # 正在获取下一页
+    fetching: bool = False
+    # 正在下载的媒体数量
+    running: int = 0
+    pages: int = 0
+    # 连续获取失败的次数
+    failures: int = 0
+    # 下次允许获取下一页的时间（monotonic）
+    next_fetch_at: float = 0.0
+    # 没有下一页了
+    exhausted: bool = False
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"@{self.screen_name}/{self.mode}"
+
+    @property
+    def finished(self) -> bool:
+        return self.exhausted and not self.fetching and not self.queue and self.running == 0
+
+
+class CrawlOrchestrator:
+    """
+    多账号、多时间线的下载调度
+    - 所有账号的用户信息并发获取
+    - 翻页在独立的小线程池中进行，某个账号限流或变慢时不会占用下载线程
+    - 下载线程池空闲时按账号轮流分配，大量积压的账号不会挤占其他账号
+    """
+
+    # 同时获取时间线的线程数，所有账号共用同一个 cookie 的限流额度，不宜过大
+    fetch_workers: int = 4
+    # 获取时间线连续失败的次数上限，超过后放弃这条时间线
+    max_page_failures: int = 5
+    # 获取失败后的退避时间（秒），每次失败翻倍
+    retry_delay: float = 5.0
+    max_retry_delay: float = 300.0
+
+    def __init__(
+            self,
+            accounts: list[CrawlAccount],
+            executor: ThreadedExecutor,
+            api: Optional[TwitterAPI] = None,
+            cache_manager: Optional[CacheManager] = None,
+    ):
+        self.accounts = accounts
+        self.executor = executor
+        settings = singleton.settings
+        self.api = api if api is not None else TwitterAPI.create(
+            auth_token=settings.auth_token, ct0=settings.ct0, fast_path=settings.fast_path
+        )
+        self.cache_manager = cache_manager if cache_manager is not None else singleton.cache_manager
+        self.progress = ProgressManager()
+        # 条件变量的锁是可重入的，下载完成的回调可能在提交时直接执行
+        self._cond = Condition()
+        self._running = 0
+
+    def run(self) -> list[CrawlTask]:
+        fetcher = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="crawl-fetch")
+        self.progress.start()
+        try:
+            tasks = self._resolve(fetcher)
+            if tasks:
+                self._schedule(fetcher, tasks)
+        finally:
+            fetcher.shutdown(wait=True)
+            self.progress.close()
+
+        self._report(tasks)
+        return tasks
+
+    def _resolve(self, fetcher: ThreadPoolExecutor) -> list[CrawlTask]:
+        # 同一个账号的多条时间线只获取一次用户信息
+        screen_names = list(dict.fromkeys(account.screen_name for account in self.accounts))
+        futures = {name: fetcher.submit(self.api.get_user_info, screen_name=name) for name in screen_names}
+
+        users: dict[str, UserInfo] = {}
+        for name, future in futures.items():
+            try:
+                users[name] = future.result()
+            except Exception as e:
+                logger.error("获取 @%s 的用户信息失败，跳过该账号: %s", name, e)
+
+        tasks = []
+        for account in self.accounts:
+            user_info = users.get(account.screen_name)
+            if user_info is None:
+                continue
+            for mode in account.modes:
+                downloader = TwitterLikesMediaDownloader(
+                    api=self.api,
+                    cache_manager=self.cache_manager,
+                    screen_name=account.screen_name,
+                    mode=mode,
+                    progress=self.progress,
+                )
+                downloader.user_info = user_info
+                tasks.append(CrawlTask(screen_name=account.screen_name, mode=mode, downloader=downloader))
+
+        logger.info("共 %s 条时间线: %s", len(tasks), ', '.join(task.name for task in tasks))
+        return tasks
+
+    def _schedule(self, fetcher: ThreadPoolExecutor, tasks: list[CrawlTask]) -> None:
+        order = deque(tasks)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for task in tasks:
+                    if self._should_fetch(task, now):
+                        task.fetching = True
+                        fetcher.submit(self._fetch, task)
+
+                self._dispatch(order)
+
+                if all(task.finished for task in tasks):
+                    break
+
+                # 等待下载或翻页完成，或者等到最近一条时间线可以翻页
+                waiting = [task.next_fetch_at - now for task in tasks
+                           if not task.exhausted and not task.fetching and task.next_fetch_at > now]
+                self._cond.wait(timeout=min(waiting) if waiting else None)
+
+    def _should_fetch(self, task: CrawlTask, now: float) -> bool:
+        if task.exhausted or task.fetching or now < task.next_fetch_at:
+            return False
+        # 队列里的媒体够下载线程用时不急着翻页，避免积压过多
+        return len(task.queue) < self.executor.max_workers
+
+    def _dispatch(self, order: deque[CrawlTask]) -> None:
+        # 轮流从每条时间线取一个媒体，直到线程池占满或没有待下载的媒体
+        idle = 0
+        while self._running < self.executor.max_workers and idle < len(order):
+            task = order[0]
+            order.rotate(-1)
+            if not task.queue:
+                idle += 1
+                continue
+
+            idle = 0
+            media = task.queue.popleft()
+            task.running += 1
+            self._running += 1
+            future = self.executor.executor.submit(task.downloader.download_media, media)
+            future.add_done_callback(lambda _, t=task: self._on_download_done(t))
+
+    def _on_download_done(self, task: CrawlTask) -> None:
+        with self._cond:
+            task.running -= 1
+            self._running -= 1
+            self._cond.notify_all()
+
+    def _fetch(self, task: CrawlTask) -> None:
+        try:
+            items = task.downloader.get_medias(count=task.downloader.limit)
+        except Exception as e:
+            # get_medias 约定不抛出错误，这里兜底避免调度卡住
+            logger.debug("[ERROR] %s get_medias: %s", task.name, e)
+            items = None
+
+        with self._cond:
+            task.fetching = False
+            if items is None:
+                task.failures += 1
+                if task.failures > self.max_page_failures:
+                    task.exhausted = True
+                    task.error = f"连续 {task.failures} 次获取时间线失败"
+                    logger.error("%s %s，放弃该时间线", task.name, task.error)
+                else:
+                    delay = min(self.retry_delay * 2 ** (task.failures - 1), self.max_retry_delay)
+                    task.next_fetch_at = time.monotonic() + delay
+                    logger.debug("%s 获取时间线失败，%.0f 秒后重试", task.name, delay)
+            else:
+                task.failures = 0
+                task.pages += 1
+                task.queue.extend(items)
+                # 与 ThreadedExecutor 一致，没有数据时结束
+                if not items or task.downloader.cursor is None:
+                    task.exhausted = True
+                task.next_fetch_at = time.monotonic() + self.executor.page_delay
+            self._cond.notify_all()
+
+    @staticmethod
+    def _report(tasks: list[CrawlTask]) -> None:
+        logger.info("<<<<<下载完成>>>>>")
+        for task in tasks:
+            downloader = task.downloader
+            logger.info(
+                "%s: 页数: %s, 图片: %s, 视频: %s, 降级: %s, 失败: %s%s",
+                task.name, task.pages, downloader.image_download_count, downloader.video_download_count,
+                downloader.downgraded_count, len(downloader.failed_list), f", 错误: {task.error}" if task.error else "",
+            )
+        for line in singleton.transport.report():
+            logger.info("连接池 %s", line)
+        TwitterLikesMediaDownloader._report_trace()
+
+
+__all__ = ["CrawlTask", "CrawlOrchestrator"]
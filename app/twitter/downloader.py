@@ -1,80 +1,145 @@
 import os
 import logging
+import time
 import mimetypes
 import requests
 import rich.logging
 from pathlib import Path
-from time import sleep
 from threading import Lock
 from typing import Optional
 
 from app.api.twitter import TwitterAPI
+from app.api.ratelimit import RateLimitExceeded
+from app.infra.cache import CacheManager
+from app.infra.catalog import CatalogEntry
+from app.infra.tracing import tracer
+from app.infra.logger import attach_handlers
+from app.infra.postprocess import post_processor
 from app.twitter.executor import Downloader
 from app.twitter.progress import ProgressManager
+from app.twitter.configure import TIMELINE_MODES
+from app.twitter.pagination import PageSizer
+from app.twitter.upgrades import UpgradeEntry
 from app.twitter.models import UserInfo, MediaInfo, MediaTypes
-from app.twitter.singleton import threaded_pool, settings, cache_manager
+from app.twitter import singleton
 
 logger = logging.getLogger(__name__)
-fh = rich.logging.RichHandler()
-fh.setLevel(logging.DEBUG)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(fh)
+# 日志在后台线程输出，不阻塞下载线程
+attach_handlers(logger, rich.logging.RichHandler)
 
 
-class FakeResponse:
-    def __init__(self, total_size, chunk_size):
-        self.total_size = total_size
-        self.chunk_size = chunk_size
-        self._pos = 0
-
-    def iter_content(self, chunk_size=1024):
-        while self._pos < self.total_size:
-            sleep(0.5)
-            chunk = b"x" * min(chunk_size, self.total_size - self._pos)
-            self._pos += len(chunk)
-            yield chunk
+def _record_failure(error: Exception) -> None:
+    """按错误码记录失败的传输，429 时同时记录 Retry-After 要求等待的秒数"""
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        code = f"HTTP {response.status_code}"
+        retry_after = response.headers.get("Retry-After", "")
+        if response.status_code == 429 and retry_after.isdigit():
+            singleton.throughput.record_flood_wait("twitter", int(retry_after))
+    else:
+        code = type(error).__name__
+    singleton.throughput.record("twitter", error_code=code)
 
 
 class TwitterLikesMediaDownloader(Downloader):
     # 目前使用的是线程池下载
-    lock = Lock()
     api: TwitterAPI
     user_info: UserInfo
 
     limit: int = 20
     timeout: float = 120.0
     chunk_size: int = 8192
+    # 获取时间线失败后，减小页大小重试的次数（仅自适应模式）
+    page_retries: int = 3
+    # 连续收到 429 的次数上限，等到重置后仍然被限流说明不是额度的问题
+    rate_limit_retries: int = 3
 
     # 上面的属性都是常量不会修改的
     api_request_count: int = 0
     image_download_count: int = 0
     video_download_count: int = 0
-
-    def __init__(self):
+    # 按策略下载了非最高清晰度版本的媒体数量
+    downgraded_count: int = 0
+
+    def __init__(
+            self,
+            api: Optional[TwitterAPI] = None,
+            cache_manager: Optional[CacheManager] = None,
+            screen_name: Optional[str] = None,
+            mode: str = "likes",
+            progress: Optional[ProgressManager] = None,
+    ):
+        if mode not in TIMELINE_MODES:
+            raise ValueError(f"不支持的时间线: {mode}")
+
+        settings = singleton.settings
+
+        self.lock = Lock()
+        # 下载的账号与时间线，默认是配置中账号的点赞
+        self.screen_name = screen_name or settings.username
+        self.mode = mode
         # 获取下一页数据的 token
         self.cursor: Optional[str] = None
         # 下载失败的数据-目前暂时没有重试机制
         self.failed_list: list[MediaInfo] = []
-        self.progress = ProgressManager()
-        self.session: requests.Session = requests.Session()
-        self.api = TwitterAPI.create(auth_token=settings.auth_token, ct0=settings.ct0)
+        # 多个账号同时下载时共用一个进度条
+        self.progress = progress if progress is not None else ProgressManager()
+        # 所有下载器共用连接池，连接可以在账号与时间线之间复用
+        self.session: requests.Session = singleton.transport.session
+        # 基准测试时可以注入回放的 api 与独立的缓存
+        self.api = api if api is not None else TwitterAPI.create(
+            auth_token=settings.auth_token, ct0=settings.ct0, fast_path=settings.fast_path
+        )
+        self.cache_manager = cache_manager if cache_manager is not None else singleton.cache_manager
+        # 时间线的页大小
+        self.limit = settings.page_size
+        self.page_sizer = PageSizer(initial=settings.page_size, adaptive=settings.adaptive_page_size)
+        self.video_policy = settings.video_policy.for_account(self.screen_name)
+        self.photo_policy = settings.photo_policy.for_account(self.screen_name)
         logger.debug("TwitterLikesMediaDownloader 初始化完成")
 
     # 私有方法-暂时使用继承实现导致公开了
+    # 页大小由 page_sizer 决定，执行器传入的 count 不再使用
     def get_medias(self, count: int) -> Optional[list[MediaInfo]]:
         try:
             with self.lock:
                 cursor = self.cursor
                 rest_id = self.user_info.rest_id
 
-            logger.debug(f"开始获取媒体数据，count={count}, cursor={cursor[:20] if cursor else None}...")
-
-            count = min(max(1, count), 2)
-            result, next_cursor = self.api.get_user_likes_medias(rest_id=rest_id, count=count, cursor=cursor)
+            attempts = 0
+            limited = 0
+            while True:
+                count = self.page_sizer.size
+                logger.debug("开始获取媒体数据，count=%s, cursor=%s...", count, cursor[:20] if cursor else None)
+
+                started = time.monotonic()
+                try:
+                    with tracer.span("resolve", count=count) as span:
+                        result, next_cursor = self._fetch_timeline(rest_id=rest_id, count=count, cursor=cursor)
+                        span.set(items=len(result))
+                except RateLimitExceeded as e:
+                    # 额度用完不算失败，也不减小页大小：下一次请求会等到重置后再发出
+                    limited += 1
+                    if limited > self.rate_limit_retries:
+                        raise
+                    logger.warning("%s，等待 %.0f 秒后继续", e, e.wait)
+                    singleton.throughput.record_flood_wait("twitter", e.wait)
+                    continue
+                except Exception as e:
+                    attempts += 1
+                    # 超时或限流时减小页大小重试
+                    if attempts <= self.page_retries and self.page_sizer.record_failure():
+                        logger.debug("获取媒体数据失败，减小页大小后重试: %s", e)
+                        time.sleep(attempts)
+                        continue
+                    raise
+
+                self.page_sizer.record_success(time.monotonic() - started)
+                break
 
             if result:
                 self.progress.add_total(len(result))
-                logger.debug(f"成功获取 {len(result)} 个媒体数据")
+                logger.debug("成功获取 %s 个媒体数据", len(result))
             else:
                 logger.debug("未获取到媒体数据")
 
@@ -84,93 +149,184 @@ class TwitterLikesMediaDownloader(Downloader):
 
             return result
         except Exception as e:
-            logger.debug(f"[ERROR] get_medias: {e}")
+            logger.debug("[ERROR] get_medias: %s", e)
             return None
 
+    def _fetch_timeline(self, rest_id: str, count: int, cursor: Optional[str]) -> tuple[list[MediaInfo], Optional[str]]:
+        if self.mode == "media":
+            return self.api.get_user_medias(rest_id=rest_id, count=count, cursor=cursor)
+        return self.api.get_user_likes_medias(rest_id=rest_id, count=count, cursor=cursor)
+
     # 私有方法-暂时使用继承实现导致公开了
     def download_media(self, media: MediaInfo) -> None:
         media_id = media.id
-        logger.debug(f"开始下载媒体 {media_id}, URL: {media.url}")
+        key = f"x-{media.id}"
+        logger.debug("开始下载媒体 %s, URL: %s", media_id, media.url)
         try:
-            if not MediaTypes.allow_download(media):
-                raise ValueError(f"[SKIP] 媒体类型不匹配: {media.original_type}")
+            with tracer.span("admission", trace_id=key):
+                if not MediaTypes.allow_download(media):
+                    raise ValueError(f"[SKIP] 媒体类型不匹配: {media.original_type}")
 
-            key = f"x-{media.id}"
+                # 如果曾经下载过了
+                if self.cache_manager and self.cache_manager.contains(key):
+                    raise ValueError(f"[SKIP] 已缓存: {key}")
 
-            # 如果曾经下载过了
-            if cache_manager and cache_manager.contains(key):
-                raise ValueError(f"[SKIP] 已缓存: {key}")
+            # 同一个媒体出现在多条推文中时只下载一次，其他任务等待并共享结果
+            final, shared = singleton.inflight.run(key, lambda: self._fetch(media, key))
+            if shared:
+                logger.debug("[SKIP] 媒体 %s 已由其他任务下载: %s", media_id, final)
 
-            save_dir = Path(media.type.storage_dir())
-            # 确保目录存在
-            save_dir.mkdir(parents=True, exist_ok=True)
+            self.progress.update()
+            logger.debug("媒体 %s 下载成功", media_id)
 
-            temp = save_dir / f"x-likes-{media.id}{media.extension()}.tmp"
+        except Exception as e:
+            with self.lock:
+                self.failed_list.append(media)
+            logger.debug("[FAIL] %s: %s", media.id, e)
+            self.progress.update(failures=True)
 
-            # 删除下载失败的残余文件
-            if temp.exists():
-                temp.unlink()
-                logger.debug(f"删除残余临时文件: {temp}")
+    def _fetch(self, media: MediaInfo, key: str) -> Path:
+        """下载、重命名并登记媒体，返回最终的文件路径"""
+        # 检查缓存之后、成为执行者之前，上一个执行者可能刚好下载完成
+        if self.cache_manager and self.cache_manager.contains(key):
+            raise ValueError(f"[SKIP] 已缓存: {key}")
 
-            # 发送请求并获取文件大小
-            res = self.session.get(media.url, stream=True, timeout=self.timeout)
-            res.raise_for_status()
+        url, bitrate, rendition, upgrade_later = self._select_rendition(media)
+        downgraded = url != media.url
 
-            # 获取文件总大小
-            total_size = int(res.headers.get('content-length', 0))
-            if total_size > 0:
-                logger.debug(f"媒体 {media_id} 大小: {total_size / 1024:.2f} KB")
+        save_dir = Path(media.type.storage_dir(self.screen_name, key=key))
 
-            # 下载文件并更新进度
-            with open(temp, "wb") as f:
-                for chunk in res.iter_content(chunk_size=self.chunk_size):
-                    if chunk:
-                        f.write(chunk)
+        temp = save_dir / f"x-{self.mode}-{media.id}{media.extension()}.tmp"
+
+        # 删除下载失败的残余文件
+        if temp.exists():
+            temp.unlink()
+            logger.debug("删除残余临时文件: %s", temp)
+
+        transfer_start = time.time()
+        try:
+            with tracer.span("transfer", trace_id=key) as span:
+                # 发送请求并获取文件大小
+                res = self.session.get(url, stream=True, timeout=self.timeout)
+                res.raise_for_status()
+
+                # 获取文件总大小
+                total_size = int(res.headers.get('content-length', 0))
+                if total_size > 0:
+                    logger.debug("媒体 %s 大小: %.2f KB", media.id, total_size / 1024)
+
+                # 下载文件并更新进度
+                written = 0
+                with open(temp, "wb") as f:
+                    for chunk in res.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                span.set(bytes=written)
+        except Exception as e:
+            _record_failure(e)
+            raise
+        transfer_seconds = time.time() - transfer_start
 
+        with tracer.span("finalize", trace_id=key):
             # 处理文件扩展名
             ctype = res.headers.get("Content-Type", "").split(";")[0]
             ext = mimetypes.guess_extension(ctype) or media.extension()
             if ext == ".jpe":
                 ext = ".jpg"
 
-            final = save_dir / f"x-likes-{media.id}{ext}"
-            logger.debug(f"下载完成，重命名文件: {temp} -> {final}")
+            final = save_dir / f"x-{self.mode}-{media.id}{ext}"
+            logger.debug("下载完成，重命名文件: %s -> %s", temp, final)
 
             # 下载完成修改文件名
             os.replace(temp, final)
-            cache_manager.set(key)
-
-            with self.lock:
-                if media.type == MediaTypes.image:
-                    self.image_download_count += 1
-                elif media.type == MediaTypes.video:
-                    self.video_download_count += 1
-
-            self.progress.update()
-            logger.debug(f"媒体 {media_id} 下载成功")
-
-        except Exception as e:
-            with self.lock:
-                self.failed_list.append(media)
-            logger.debug(f"[FAIL] {media.id}: {e}")
-            self.progress.update(failures=True)
+            self.cache_manager.set(key)
+
+            catalog = singleton.catalog
+            if catalog is not None:
+                catalog.record(CatalogEntry(
+                    key=key,
+                    source="twitter",
+                    path=str(final),
+                    size=written,
+                    media_type=media.type.value,
+                    mime=ctype or media.mimetype,
+                    account=self.screen_name,
+                    mode=self.mode,
+                    duration=media.duration,
+                    bitrate=bitrate,
+                    origin=url,
+                    rendition=rendition,
+                ))
+
+            if downgraded and upgrade_later:
+                singleton.upgrade_queue.add(UpgradeEntry(
+                    key=key,
+                    screen_name=self.screen_name,
+                    mode=self.mode,
+                    path=str(final),
+                    url=media.url,
+                    bitrate=media.bitrate,
+                    downloaded_bitrate=bitrate,
+                    rendition=rendition,
+                ))
+
+        # 文件保存成功后才记为成功的传输
+        singleton.throughput.record("twitter", size=written, seconds=transfer_seconds)
+
+        pipeline = post_processor()
+        if pipeline is not None:
+            try:
+                # 队列满时在这里等待，时间计入 postprocess 阶段
+                with tracer.span("postprocess", trace_id=key):
+                    pipeline.submit(str(final), key=key)
+            except Exception as e:
+                # 文件已经保存并计入成功，提交后处理失败不影响下载结果
+                logger.warning("提交后处理失败: %s, %s", final, e)
+
+        with self.lock:
+            if media.type == MediaTypes.image:
+                self.image_download_count += 1
+            elif media.type == MediaTypes.video:
+                self.video_download_count += 1
+            if downgraded:
+                self.downgraded_count += 1
+
+        return final
+
+    def _select_rendition(self, media: MediaInfo) -> tuple[str, Optional[int], Optional[str], bool]:
+        """按策略选择下载的版本，返回 (url, 码率, 图片版本, 是否之后升级)"""
+        if media.type == MediaTypes.video:
+            variant = self.video_policy.select(media.variants, media.duration)
+            if variant is not None:
+                logger.debug("媒体 %s 按策略降级下载: %s -> %s bps", media.id, media.bitrate, variant.bitrate)
+                return variant.url, variant.bitrate, None, self.video_policy.upgrade_later
+
+        elif media.type == MediaTypes.image:
+            photo = self.photo_policy.select(media.url, media.width, media.height)
+            if photo is not None:
+                logger.debug("媒体 %s 按策略下载图片版本: %s", media.id, photo.label)
+                return photo.url, None, photo.label, self.photo_policy.upgrade_later
+            return media.url, None, "orig", False
+
+        return media.url, media.bitrate, None, False
 
     # 入口方法
     # todo 目前进度条失效-后面再改
     def start(self):
-        logger.debug("开始下载Twitter点赞媒体...")
-        user_info = self.api.get_user_info(screen_name=settings.username)
+        logger.debug("开始下载Twitter媒体 @%s/%s...", self.screen_name, self.mode)
+        user_info = self.api.get_user_info(screen_name=self.screen_name)
         self.user_info = user_info
         self.api_request_count += 1
 
-        logger.debug(f"用户信息: {user_info.name} (@{user_info.screen_name}), ID: {user_info.rest_id}")
-        logger.debug(f"下载的文件将存储在：{settings.storage_directory}/{settings.username}")
+        logger.debug("用户信息: %s (@%s), ID: %s", user_info.name, user_info.screen_name, user_info.rest_id)
+        logger.debug("下载的文件将存储在：%s/%s", singleton.settings.storage_directory, self.screen_name)
 
         self.progress.start()
 
         # 开始下载
-        logger.debug(f"开始下载，限制数量: {self.limit}")
-        threaded_pool.start_download(downloader=self, count=self.limit)
+        logger.debug("开始下载，页大小: %s, 自适应: %s", self.limit, self.page_sizer.adaptive)
+        singleton.threaded_pool.start_download(downloader=self, count=self.limit)
 
         # 停止进度条
         self.progress.close()
@@ -178,13 +334,26 @@ class TwitterLikesMediaDownloader(Downloader):
         # 线程池生命周期由调用者负责维护
         logger.debug("<<<<<下载完成>>>>>")
         logger.debug(
-            f"API请求: {self.api_request_count}, "
-            f"图片: {self.image_download_count}, "
-            f"视频: {self.video_download_count}, "
-            f"失败: {len(self.failed_list)}"
+            "API请求: %s, 图片: %s, 视频: %s, 失败: %s",
+            self.api_request_count, self.image_download_count, self.video_download_count, len(self.failed_list),
         )
 
         # 输出失败的媒体ID列表
         if self.failed_list:
             failed_ids = [media.id for media in self.failed_list]
-            logger.debug(f"失败的媒体ID: {failed_ids}")
+            logger.debug("失败的媒体ID: %s", failed_ids)
+
+        self._report_trace()
+
+    @staticmethod
+    def _report_trace():
+        # 输出各阶段耗时分布，并导出 span 到 outputs 目录
+        if not tracer.spans():
+            return
+        logger.debug("各阶段耗时统计:\n%s", tracer.format_summary())
+        trace_file = os.path.join(singleton.settings.outputs, f"trace-twitter-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        try:
+            count = tracer.export_jsonl(trace_file)
+            logger.debug("已导出 %d 个 span 至 %s", count, trace_file)
+        except OSError as e:
+            logger.debug("导出 span 失败: %s", e)
@@ -22,13 +22,16 @@ class Downloader:
 
 
 class ThreadedExecutor:
+    # 每页下载完成后的等待时间（秒）
+    page_delay: float = 0.5
 
     def __init__(self, max_workers: int):
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
 
     def start_download(self, downloader: Downloader, count: int):
-        count = min(max(count, 1), 50)
+        # 页大小的上限由 downloader 自己控制
+        count = max(count, 1)
 
         while True:
             # 这个方法不能抛出错误，只能返回 None，这里不做捕获，需要实现方自己注意
@@ -44,7 +47,7 @@ class ThreadedExecutor:
             wait(futures)
 
             # 稍微等待一下
-            time.sleep(0.5)
+            time.sleep(self.page_delay)
 
     # 提交一批任务并等待执行完毕
     def submit_tasks(self, handler: Callable[[Any], None], args: list[Any]) -> None:
@@ -55,7 +58,7 @@ class ThreadedExecutor:
         wait(futures)
 
         # 稍微等待一下
-        time.sleep(0.5)
+        time.sleep(self.page_delay)
 
     # 清理资源
     def shutdown(self) -> None:
@@ -1,12 +1,13 @@
-import os
 import mimetypes
 from enum import Enum
 from typing import Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import PurePosixPath, Path
 from urllib.parse import urlparse, unquote
 
-from app.twitter.singleton import settings
+from app.infra.storage_layout import ensure_dir, shard_dir
+from app.twitter.variants import VideoVariant
+from app.twitter import singleton
 
 
 @dataclass
@@ -27,6 +28,11 @@ class MediaInfo:
     bitrate: Optional[int] = None
     duration: Optional[int] = None
     mimetype: Optional[str] = None
+    # 视频的所有 mp4 版本，url 与 bitrate 是其中码率最高的
+    variants: list[VideoVariant] = field(default_factory=list)
+    # 原图的尺寸（original_info）
+    width: Optional[int] = None
+    height: Optional[int] = None
 
     def extension(self) -> Optional[str]:
         if self.mimetype is not None:
@@ -38,7 +44,7 @@ class MediaInfo:
 
         suffix = PurePosixPath(path).suffix
 
-        return suffix if not suffix else None
+        return suffix or None
 
 
 class MediaTypes(str, Enum):
@@ -46,8 +52,10 @@ class MediaTypes(str, Enum):
     video = "video"
     other = "other"
 
-    def storage_dir(self):
-        base = Path(settings.storage_directory) / settings.username
+    def storage_dir(self, username: Optional[str] = None, key: Optional[str] = None):
+        """指定 key 时返回分片后的目录"""
+        settings = singleton.settings
+        base = Path(settings.storage_directory) / (username or settings.username)
         match self:
             case MediaTypes.image:
                 subdir = 'images'
@@ -56,12 +64,14 @@ class MediaTypes(str, Enum):
             case _:
                 subdir = "others"
 
-        full_path = base / subdir
-        os.makedirs(full_path, exist_ok=True)
-        return str(full_path)
+        full_path = str(base / subdir)
+        if key is not None:
+            full_path = shard_dir(full_path, key, settings.storage_shards)
+        return ensure_dir(full_path)
 
     @staticmethod
     def allow_download(media: MediaInfo) -> bool:
+        settings = singleton.settings
         if media.type == MediaTypes.image and not settings.only_video:
             return True
 
@@ -0,0 +1,57 @@
+from threading import Lock
+
+from app.infra.logger import getLogger
+
+logger = getLogger(__name__)
+
+# 时间线接口单页最多返回的推文数量
+MAX_PAGE_SIZE = 100
+
+
+class PageSizer:
+    """
+    时间线的页大小
+    - 非自适应模式下始终使用配置的页大小
+    - 自适应模式下请求又快又成功时翻倍，直到 maximum；请求变慢时减小一档；超时、限流等失败时减半
+    """
+
+    def __init__(self, initial: int, adaptive: bool = False, minimum: int = 5, maximum: int = MAX_PAGE_SIZE,
+                 fast_seconds: float = 2.0, slow_seconds: float = 8.0):
+        self._lock = Lock()
+        self.adaptive = adaptive
+        self.maximum = max(1, min(maximum, MAX_PAGE_SIZE))
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.fast_seconds = fast_seconds
+        self.slow_seconds = slow_seconds
+        self._size = max(self.minimum, min(initial, self.maximum)) if adaptive else max(1, min(initial, MAX_PAGE_SIZE))
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def record_success(self, elapsed: float) -> None:
+        if not self.adaptive:
+            return
+        with self._lock:
+            previous = self._size
+            if elapsed <= self.fast_seconds:
+                self._size = min(self.maximum, self._size * 2)
+            elif elapsed >= self.slow_seconds:
+                self._size = max(self.minimum, self._size * 3 // 4)
+            if self._size != previous:
+                logger.debug("页大小调整: %d -> %d, 耗时=%.2f秒", previous, self._size, elapsed)
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回页大小是否被减小（减小后值得用更小的页重试）"""
+        if not self.adaptive:
+            return False
+        with self._lock:
+            previous = self._size
+            self._size = max(self.minimum, self._size // 2)
+            if self._size != previous:
+                logger.debug("请求失败，页大小调整: %d -> %d", previous, self._size)
+            return self._size != previous
+
+
+__all__ = ["MAX_PAGE_SIZE", "PageSizer"]
@@ -0,0 +1,124 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from app.api.twitter import TwitterAPI
+from app.infra.cache import CacheManager
+from app.infra.logger import getLogger
+from app.infra.planning import PlanSummary
+from app.twitter.configure import CrawlAccount
+from app.twitter.downloader import TwitterLikesMediaDownloader
+from app.twitter.models import MediaInfo, MediaTypes
+from app.twitter import singleton
+
+logger = getLogger(__name__)
+
+
+class TwitterPlanner:
+    """
+    不下载文件，估算一次运行的下载量
+    - 与 CrawlOrchestrator 一样按账号与时间线翻页，用下载器的清晰度策略选出实际会下载的版本
+    - 没有缓存的媒体在线程池中并发发送 HEAD 请求获取 Content-Length，与翻页同时进行
+    """
+
+    # 获取时间线连续失败的次数上限，超过后放弃这条时间线
+    max_page_failures: int = 5
+    retry_delay: float = 5.0
+    timeout: float = 30.0
+
+    def __init__(
+            self,
+            accounts: list[CrawlAccount],
+            api: Optional[TwitterAPI] = None,
+            cache_manager: Optional[CacheManager] = None,
+            workers: Optional[int] = None,
+            max_pages: Optional[int] = None,
+            page_delay: float = 0.5,
+    ):
+        settings = singleton.settings
+        self.accounts = accounts
+        self.api = api if api is not None else TwitterAPI.create(
+            auth_token=settings.auth_token, ct0=settings.ct0, fast_path=settings.fast_path
+        )
+        self.cache_manager = cache_manager if cache_manager is not None else singleton.cache_manager
+        self.workers = workers or settings.max_concurrent
+        # 每条时间线最多获取的页数，None 表示全部
+        self.max_pages = max_pages
+        self.page_delay = page_delay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def run(self) -> PlanSummary:
+        summary = PlanSummary(source="twitter")
+        seen: set[str] = set()
+        heads: list[tuple[MediaInfo, Future]] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="plan-head") as pool:
+            for account in self.accounts:
+                try:
+                    user_info = self.api.get_user_info(screen_name=account.screen_name)
+                except Exception as e:
+                    logger.error("获取 @%s 的用户信息失败，跳过该账号: %s", account.screen_name, e)
+                    continue
+
+                for mode in account.modes:
+                    downloader = TwitterLikesMediaDownloader(
+                        api=self.api, cache_manager=self.cache_manager, screen_name=account.screen_name, mode=mode
+                    )
+                    downloader.user_info = user_info
+                    for media in self._paginate(downloader):
+                        key = f"x-{media.id}"
+                        # 与下载时一样，只下载图片或视频时另一种媒体计为被过滤
+                        if not MediaTypes.allow_download(media):
+                            summary.filtered += 1
+                        elif self.cache_manager.contains(key):
+                            summary.cache_hits += 1
+                        elif key in seen:
+                            summary.duplicates += 1
+                        else:
+                            seen.add(key)
+                            url = downloader._select_rendition(media)[0]
+                            heads.append((media, pool.submit(self._content_length, url)))
+
+            for media, future in heads:
+                summary.add(media.type.value, future.result())
+
+        return summary
+
+    def _paginate(self, downloader: TwitterLikesMediaDownloader):
+        name = f"@{downloader.screen_name}/{downloader.mode}"
+        pages = failures = 0
+        while self.max_pages is None or pages < self.max_pages:
+            items = downloader.get_medias(count=downloader.limit)
+            if items is None:
+                failures += 1
+                if failures > self.max_page_failures:
+                    logger.error("%s 连续 %s 次获取时间线失败，计划中只包含已获取的 %s 页", name, failures, pages)
+                    return
+                time.sleep(self.retry_delay * 2 ** (failures - 1))
+                continue
+
+            failures = 0
+            pages += 1
+            yield from items
+            logger.info("%s 已获取 %s 页", name, pages)
+            if not items or downloader.cursor is None:
+                return
+            time.sleep(self.page_delay)
+
+    def _content_length(self, url: str) -> Optional[int]:
+        try:
+            res = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            res.raise_for_status()
+            length = int(res.headers.get("Content-Length", 0))
+            return length or None
+        except Exception as e:
+            logger.debug("HEAD %s 失败: %s", url, e)
+            return None
+
+
+__all__ = ["TwitterPlanner"]
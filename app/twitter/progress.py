@@ -12,13 +12,15 @@ class ProgressManager:
         self._task_id = self._bar.add_task(description="Downloading...", total=None, failures=0)
 
     def add_total(self, total: int):
-        self._total += total
-        self._bar.update(self._task_id, total=self._total)
+        with self._lock:
+            self._total += total
+            self._bar.update(self._task_id, total=self._total)
 
     def update(self, advance: int = 1, failures: bool = False):
-        if failures:
-            self._failures += 1
-        self._bar.update(self._task_id, advance=advance, failures=self._failures)
+        with self._lock:
+            if failures:
+                self._failures += 1
+            self._bar.update(self._task_id, advance=advance, failures=self._failures)
 
     def start(self):
         self._bar.start()
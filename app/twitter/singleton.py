@@ -1,12 +1,72 @@
+import os
+from typing import Optional
+
 from app.infra.cache import CacheManager
+from app.infra.catalog import MediaCatalog
+from app.infra.registry import LazyRegistry
+from app.infra.http_pool import PooledTransport
+from app.infra.throughput import ThroughputRecorder
+from app.infra.singleflight import SingleFlight
 from app.twitter.configure import Settings
 from app.twitter.executor import ThreadedExecutor
+from app.twitter.upgrades import UpgradeQueue
+
+# 全局对象在第一次访问时才创建，导入本模块不会解析配置、加载缓存或者创建线程池
+# 使用方式：
+#   from app.twitter import singleton
+#   singleton.settings.username
+registry = LazyRegistry()
 
 # 这里是全局公用的配置
-settings = Settings.create()
+settings: Settings
+registry.register("settings", Settings.create)
+
+# 全局缓存器-只加载 twitter 的缓存
+cache_manager: CacheManager
+registry.register("cache_manager", lambda: CacheManager(cache_file=registry.get("settings").cache_file, prefix="x-"))
+
+# 正在下载的媒体，所有账号与时间线共用，同一个媒体同时只下载一次
+inflight: SingleFlight
+registry.register("inflight", SingleFlight)
 
-# 全局缓存器
-cache_manager = CacheManager(cache_file=settings.cache_file)
+# 下载媒体的 HTTP 连接池，所有下载器共用，每个 host 的连接数按下载线程数设置
+transport: PooledTransport
+registry.register(
+    "transport",
+    lambda: PooledTransport(registry.get("settings").transport, workers=registry.get("settings").max_concurrent),
+)
 
 # 全局线程池
-threaded_pool = ThreadedExecutor(max_workers=settings.max_concurrent)
+threaded_pool: ThreadedExecutor
+registry.register("threaded_pool", lambda: ThreadedExecutor(max_workers=registry.get("settings").max_concurrent))
+
+# 降级下载的视频与图片的升级队列
+upgrade_queue: UpgradeQueue
+
+
+def _create_upgrade_queue() -> UpgradeQueue:
+    outputs = registry.get("settings").outputs
+    path = os.path.join(outputs, "upgrades.jsonl")
+    # 队列以前只有视频，文件名是 video-upgrades.jsonl
+    legacy = os.path.join(outputs, "video-upgrades.jsonl")
+    if os.path.exists(legacy) and not os.path.exists(path):
+        os.replace(legacy, path)
+    return UpgradeQueue(path)
+
+
+registry.register("upgrade_queue", _create_upgrade_queue)
+
+# 按分钟统计的下载吞吐量，twitter 与 telegram 共用同一个数据库
+throughput: ThroughputRecorder
+registry.register("throughput", lambda: ThroughputRecorder(registry.get("settings").outputs + "/throughput.db"))
+
+# 全局媒体索引-没有开启时为 None
+catalog: Optional[MediaCatalog]
+registry.register(
+    "catalog",
+    lambda: MediaCatalog(registry.get("settings").catalog_file) if registry.get("settings").use_catalog else None,
+)
+
+
+def __getattr__(name: str):
+    return registry.getattr(__name__, name)
@@ -0,0 +1,89 @@
+import os
+import json
+import fcntl
+from threading import Lock
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+
+@dataclass
+class UpgradeEntry:
+    # 缓存 key，例如 x-123
+    key: str
+    screen_name: str
+    mode: str
+    # 已下载的文件
+    path: str
+    # 最高码率版本
+    url: str
+    bitrate: Optional[int] = None
+    # 已下载版本的码率
+    downloaded_bitrate: Optional[int] = None
+    # 已下载的图片版本，例如 large.webp
+    rendition: Optional[str] = None
+
+
+class UpgradeQueue:
+    """
+    降级下载的视频与非原图的图片，等待空闲时段下载最高清晰度
+    - 以 JSON Lines 追加写入，下载线程中可以直接调用 add
+    - 升级完成后用 remove 删除已升级的条目
+    - 升级脚本与下载可能在两个进程中同时运行，读写都持有文件锁
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+
+    @contextmanager
+    def _locked(self):
+        # flock 只在进程之间互斥，同一进程的线程之间还需要线程锁
+        # 锁加在单独的文件上，remove 替换队列文件后其他进程持有的锁仍然有效
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, entry: UpgradeEntry) -> None:
+        line = json.dumps(asdict(entry), ensure_ascii=False) + "\n"
+        with self._locked():
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def load(self) -> list[UpgradeEntry]:
+        with self._locked():
+            return list(self._read().values())
+
+    def remove(self, keys: set[str]) -> None:
+        """删除已经升级（或不再需要升级）的条目，重新读取文件，保留期间新加入的条目"""
+        if not keys:
+            return
+        with self._locked():
+            entries = [entry for key, entry in self._read().items() if key not in keys]
+            # 先写临时文件再替换，中断时不会丢失队列
+            temp = self.path + ".tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+            os.replace(temp, self.path)
+
+    def _read(self) -> dict[str, UpgradeEntry]:
+        if not os.path.exists(self.path):
+            return {}
+        # 同一个 key 多次降级时只保留最后一条
+        entries: dict[str, UpgradeEntry] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = UpgradeEntry(**json.loads(line))
+                    entries[entry.key] = entry
+        return entries
+
+
+__all__ = ["UpgradeEntry", "UpgradeQueue"]
@@ -0,0 +1,227 @@
+from datetime import datetime, time as dtime
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse, urlunparse, urlencode
+
+# 视频清晰度的选择策略
+# - 默认下载码率最高的 mp4，与之前的行为一致
+# - 可以限制码率与预估大小（码率 × 时长），选择满足条件的最高码率，都不满足时选择最低码率
+# - 可以按账号覆盖默认策略，没有配置的字段使用默认策略的值
+# - 开启 upgrade_later 后，降级下载的视频会记录到升级队列，在空闲时段用 pixi run twitter-upgrade 下载最高码率替换
+#
+# 图片尺寸与格式的选择策略
+# - 默认下载原图（name=orig），格式与原图相同
+# - 可以指定尺寸名称（orig、4096x4096、large、medium、small）与格式（jpg、png、webp）
+# - 原图长边超过 max_dimension 时使用 oversize_name，尺寸来自推文的 original_info
+# - 同样可以按账号覆盖，非原图也可以记录到升级队列
+
+PHOTO_NAMES = ("orig", "4096x4096", "large", "medium", "small")
+PHOTO_FORMATS = ("jpg", "png", "webp")
+
+
+@dataclass
+class VideoVariant:
+    url: str
+    bitrate: Optional[int] = None
+
+
+def _limit(data: dict, name: str, default, convert):
+    """读取上限：没有写时使用 default，写了 0 或 null 表示不限制（可以覆盖默认的上限）"""
+    if name not in data:
+        return default
+    return convert(data[name]) if data[name] else None
+
+
+@dataclass
+class VideoPolicy:
+    # 码率上限（bit/s）
+    max_bitrate: Optional[int] = None
+    # 预估大小上限（字节）
+    max_size: Optional[int] = None
+    # 降级下载的视频之后再下载最高码率
+    upgrade_later: bool = False
+
+    @property
+    def limited(self) -> bool:
+        return self.max_bitrate is not None or self.max_size is not None
+
+    def select(self, variants: list[VideoVariant], duration: Optional[int]) -> Optional[VideoVariant]:
+        """返回需要降级下载的版本，最高码率就满足条件时返回 None"""
+        if not self.limited or len(variants) < 2:
+            return None
+
+        ordered = sorted(variants, key=lambda v: v.bitrate or 0, reverse=True)
+        chosen = next((v for v in ordered if self._fits(v, duration)), ordered[-1])
+        return None if chosen is ordered[0] else chosen
+
+    def _fits(self, variant: VideoVariant, duration: Optional[int]) -> bool:
+        bitrate = variant.bitrate or 0
+        if self.max_bitrate is not None and bitrate > self.max_bitrate:
+            return False
+        # 没有时长时无法预估大小，只按码率判断
+        if self.max_size is not None and duration and estimate_size(bitrate, duration) > self.max_size:
+            return False
+        return True
+
+    @staticmethod
+    def parse(data: dict, base: Optional["VideoPolicy"] = None) -> "VideoPolicy":
+        base = base or VideoPolicy()
+        return VideoPolicy(
+            max_bitrate=_limit(data, "max_bitrate", base.max_bitrate, int),
+            max_size=_limit(data, "max_size_mb", base.max_size, lambda mb: int(float(mb) * 1024 * 1024)),
+            upgrade_later=bool(data.get("upgrade_later", base.upgrade_later)),
+        )
+
+
+@dataclass
+class PhotoRendition:
+    url: str
+    # 记录到媒体索引，例如 large.webp
+    label: str
+
+
+@dataclass
+class PhotoPolicy:
+    name: str = "orig"
+    # None 表示与原图相同
+    format: Optional[str] = None
+    # 原图长边超过这个值时使用 oversize_name
+    max_dimension: Optional[int] = None
+    oversize_name: str = "4096x4096"
+    # 非原图之后再下载原图
+    upgrade_later: bool = False
+
+    def select(self, url: str, width: Optional[int], height: Optional[int]) -> Optional[PhotoRendition]:
+        """返回需要下载的版本，下载原图时返回 None"""
+        name = self.name
+        if self.max_dimension is not None and width and height and max(width, height) > self.max_dimension:
+            name = self.oversize_name
+        if name == "orig" and self.format is None:
+            return None
+        rendition = photo_rendition(url, name, self.format)
+        # 指定的格式与原图相同
+        return None if rendition.label == "orig" else rendition
+
+    @staticmethod
+    def parse(data: dict, base: Optional["PhotoPolicy"] = None) -> "PhotoPolicy":
+        base = base or PhotoPolicy()
+        policy = PhotoPolicy(
+            name=str(data.get("name", base.name)),
+            format=data.get("format", base.format),
+            max_dimension=_limit(data, "max_dimension", base.max_dimension, int),
+            oversize_name=str(data.get("oversize_name", base.oversize_name)),
+            upgrade_later=bool(data.get("upgrade_later", base.upgrade_later)),
+        )
+        for name in (policy.name, policy.oversize_name):
+            if name not in PHOTO_NAMES:
+                raise ValueError(f"不支持的图片尺寸 {name}，可选值: {', '.join(PHOTO_NAMES)}")
+        if policy.format is not None and policy.format not in PHOTO_FORMATS:
+            raise ValueError(f"不支持的图片格式 {policy.format}，可选值: {', '.join(PHOTO_FORMATS)}")
+        return policy
+
+
+@dataclass
+class PhotoPolicySettings:
+    default: PhotoPolicy = field(default_factory=PhotoPolicy)
+    # 按账号覆盖的策略，key 为 screen_name
+    accounts: dict[str, PhotoPolicy] = field(default_factory=dict)
+    # 图片升级的执行时段，与视频的 upgrade_window 相互独立
+    upgrade_window: Optional[str] = None
+
+    def for_account(self, screen_name: str) -> PhotoPolicy:
+        return self.accounts.get(screen_name, self.default)
+
+    @staticmethod
+    def parse(data: Optional[dict]) -> "PhotoPolicySettings":
+        data = data or {}
+        default = PhotoPolicy.parse(data)
+        accounts = {
+            name.lstrip("@"): PhotoPolicy.parse(item or {}, base=default)
+            for name, item in (data.get("accounts", None) or {}).items()
+        }
+        window = data.get("upgrade_window", None)
+        if window:
+            parse_window(window)
+        return PhotoPolicySettings(default=default, accounts=accounts, upgrade_window=window)
+
+
+def photo_rendition(url: str, name: str, format: Optional[str] = None) -> PhotoRendition:
+    """
+    构造 pbs.twimg.com 的图片地址：/media/<id>?format=<格式>&name=<尺寸>
+    url 可以是 /media/<id>.jpg 或者已经带有 format、name 参数的地址
+    """
+    parsed = urlparse(url)
+    path = parsed.path
+    stem, dot, extension = path.rpartition(".")
+    if dot and "/" not in extension:
+        path = stem
+    else:
+        extension = dict(pair.split("=", 1) for pair in parsed.query.split("&") if "=" in pair).get("format", "jpg")
+    format = format or extension
+    query = urlencode({"format": format, "name": name})
+    label = name if format == extension else f"{name}.{format}"
+    return PhotoRendition(url=urlunparse(parsed._replace(path=path, query=query)), label=label)
+
+
+@dataclass
+class VideoPolicySettings:
+    default: VideoPolicy = field(default_factory=VideoPolicy)
+    # 按账号覆盖的策略，key 为 screen_name
+    accounts: dict[str, VideoPolicy] = field(default_factory=dict)
+    # 升级队列的执行时段，格式 HH:MM-HH:MM，可以跨越午夜，为空时不限制
+    upgrade_window: Optional[str] = None
+
+    def for_account(self, screen_name: str) -> VideoPolicy:
+        return self.accounts.get(screen_name, self.default)
+
+    @staticmethod
+    def parse(data: Optional[dict]) -> "VideoPolicySettings":
+        data = data or {}
+        default = VideoPolicy.parse(data)
+        accounts = {
+            name.lstrip("@"): VideoPolicy.parse(item or {}, base=default)
+            for name, item in (data.get("accounts", None) or {}).items()
+        }
+        window = data.get("upgrade_window", None)
+        if window:
+            parse_window(window)
+        return VideoPolicySettings(default=default, accounts=accounts, upgrade_window=window)
+
+
+def estimate_size(bitrate: int, duration: int) -> int:
+    """bitrate 为 bit/s，duration 为毫秒"""
+    return bitrate * duration // 8000
+
+
+def parse_window(window: str) -> tuple[dtime, dtime]:
+    try:
+        start, end = (dtime.fromisoformat(part.strip()) for part in window.split("-"))
+    except ValueError:
+        raise ValueError(f"upgrade_window 格式应为 HH:MM-HH:MM: {window}")
+    return start, end
+
+
+def in_window(window: Optional[str], now: Optional[datetime] = None) -> bool:
+    if not window:
+        return True
+    start, end = parse_window(window)
+    current = (now or datetime.now()).time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+__all__ = [
+    "PHOTO_NAMES",
+    "PHOTO_FORMATS",
+    "PhotoRendition",
+    "PhotoPolicy",
+    "PhotoPolicySettings",
+    "photo_rendition",
+    "VideoVariant",
+    "VideoPolicy",
+    "VideoPolicySettings",
+    "estimate_size",
+    "parse_window",
+    "in_window",
+]